@@ -1,14 +1,77 @@
 import uvicorn
 from fastapi import FastAPI, WebSocket, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from main import run_chatbot, build_app
-from tools import transcribe_audio, generate_speech_base64, is_valid_customer
-import base64
-import tempfile
+from main import BUSY_MESSAGE, run_chatbot, stream_chatbot, build_app, session_config
+from graph import INTENT_ROUTER
+from streaming import AudioTicketStore, SentenceChunker, synthesize_in_order
+from ws_session import VoiceSession
+from streaming_stt import StreamingTranscriber
+from orchestrator import STAGE_TIMEOUTS, ClientDisconnected, RequestContext, request_stats, run_until_disconnect
+from tools import (
+    MAX_UTTERANCE_BYTES, transcribe_audio, generate_speech_base64, stream_speech,
+    is_valid_customer, prewarm_speech_cache, synthesize_speech, TTS_FORMAT, TTS_MODEL, TTS_VOICE
+)
+from tts_cache import prewarm_phrases, tts_cache
+from metrics import registry as metrics_registry
+from prompts import load_tokenizer, prompt_report
+from response_cache import response_cache
+from openai_clients import OPENAI_LIMIT_SHARE, limiter_stats
+from speculation import speculation_stats
+from batch import BATCH_CONCURRENCY, BATCH_MAX_ITEMS, build_batch_app, parse_jsonl, run_batch
+from checkpointer import CHECKPOINTER_BACKEND
+from data_store import get_store
+import asyncio
+import json
+import logging
+import openai
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# ✅ Sunucu modu ayarları (python app.py)
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # uvicorn worker (süreç) sayısı
+# 1 ise /ready, TTS önbelleği ısınana kadar 503 döner
+READY_REQUIRES_WARM_CACHE = os.getenv("READY_REQUIRES_WARM_CACHE", "1") == "1"
+
+logger = logging.getLogger("app")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Her worker'ın kendi sürecinde: açılışta graph'ları derler ve TTS önbelleğini ısıtır."""
+    await build_graphs()
+    await warm_tts_cache()
+    yield
+    for task in list(background_tasks):
+        task.cancel()  # Kapanışta yarım kalan arka plan işleri (ör. önceden ses üretimi) beklenmez
+
+
+app = FastAPI(lifespan=lifespan)
+# Graph'lar her worker'da, süreç başladıktan sonra (lifespan) bir kez derlenir
+chatbot_app = None
+batch_app = None
+audio_tickets = AudioTicketStore()
+# Sonucu beklenmeyen arka plan görevlerine güçlü referans: yarıda çöp toplanmasınlar
+background_tasks: set = set()
+readiness = {"graph": False, "customer_data": False, "tts_cache": "pending", "graph_build_seconds": None}
+
+def run_in_background(coro, label: str) -> asyncio.Task:
+    """Görevi başlatır ve bitene kadar referansını tutar; kimse beklemese de hatası loglanır."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(lambda done: _background_done(done, label))
+    return task
+
+
+def _background_done(task: asyncio.Task, label: str) -> None:
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ {label} başarısız: {task.exception()!r}")
 
-app = FastAPI()
-chatbot_app = build_app()
 
 # CORS ayarları (frontend erişimi için gerekli)
 app.add_middleware(
@@ -19,28 +82,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def build_graphs():
+    global chatbot_app, batch_app
+    started = time.monotonic()
+    chatbot_app = build_app()
+    batch_app = build_batch_app()  # Toplu sorgular etkileşimli oturumların checkpointer'ını doldurmasın
+    await load_tokenizer()  # Geçmiş kısaltma ilk turda kodlama dosyası indirmesin
+    readiness["graph"] = True
+    try:
+        readiness["customer_data"] = bool(get_store().customers)  # İlk istekte dosya okunmasın
+    except Exception as e:
+        print(f"⚠️ Müşteri verisi yüklenemedi: {e}")
+    readiness["graph_build_seconds"] = round(time.monotonic() - started, 3)
+
+
+async def warm_tts_cache():
+    # Sabit cümlelerin sesleri arka planda hazırlanır, sunucunun açılışını bekletmez
+    if os.getenv("TTS_PREWARM", "1") != "1":
+        readiness["tts_cache"] = "disabled"
+        return
+
+    async def prewarm():
+        readiness["tts_cache"] = "warming"
+        try:
+            await prewarm_speech_cache(prewarm_phrases())
+        finally:
+            readiness["tts_cache"] = "warm"  # Üretilemeyen cümleler ilk istekte üretilir
+
+    run_in_background(prewarm(), "TTS önbellek ısıtma")
+
+
+@app.get("/ready")
+async def ready_endpoint():
+    """Worker trafik almaya hazırsa 200, değilse 503 (autoscaler / load balancer readiness probe'u için)."""
+    caches_warm = readiness["tts_cache"] in ("warm", "disabled") or not READY_REQUIRES_WARM_CACHE
+    ready = readiness["graph"] and readiness["customer_data"] and caches_warm
+    content = {"ready": ready, "pid": os.getpid(), "checkpointer": CHECKPOINTER_BACKEND, **readiness}
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+
 @app.post("/chat")
 async def chatbot_endpoint(request: Request):
     data = await request.json()
     query = data.get("query", "")
     customer_id = data.get("customer_id", "")
+    # "base64": ses JSON içinde (eski davranış), "url": ses /audio/{id} üzerinden istendiğinde üretilir,
+    # "prefetch": "url" gibi ama ses arka planda hemen üretilmeye başlar, "none": ses yok
+    audio_mode = data.get("audio_mode", "base64")
 
     if not is_valid_customer(customer_id):
         return JSONResponse(content={"response": "❌ Geçersiz müşteri ID."}, status_code=400)
 
-    config = {
-        "configurable": {
-            "thread_id": customer_id,
-            "checkpoint_ns": "banking_session",
-            "checkpoint_id": f"webchat_{customer_id}"
-        }
-    }
+    config = session_config(customer_id, "webchat")
 
-    # AI cevabı
-    response = await run_chatbot(chatbot_app, query, customer_id, config)
+    ctx = RequestContext("chat")
+    try:
+        # AI cevabı (istemci koparsa LLM çağrısı iptal edilir)
+        response = await run_until_disconnect(
+            request, ctx.run_stage("llm", run_chatbot(chatbot_app, query, customer_id, config))
+        )
+
+        if audio_mode in ("url", "prefetch"):
+            # Metin hemen döner; "prefetch" modunda ses aynı anda arka planda üretilir
+            audio_task = None
+            if audio_mode == "prefetch":
+                audio_task = run_in_background(
+                    asyncio.wait_for(synthesize_speech(response), STAGE_TIMEOUTS["tts"]), "Önceden ses üretimi"
+                )
+            return JSONResponse(content={
+                "response": response,
+                "audio_url": f"/audio/{await audio_tickets.register(response, audio_task)}"
+            })
+        if audio_mode == "none":
+            return JSONResponse(content={"response": response})
 
-    # TTS ile base64 ses
-    audio_base64 = await generate_speech_base64(response)
+        # TTS ile base64 ses
+        audio_base64 = await run_until_disconnect(
+            request, ctx.run_stage("tts", generate_speech_base64(response))
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse(content={"response": "⚠️ İşlem zaman aşımına uğradı."}, status_code=504)
+    except ClientDisconnected:
+        return Response(status_code=499)
+    finally:
+        ctx.finish()
 
     return JSONResponse(content={
         "response": response,
@@ -48,57 +173,272 @@ async def chatbot_endpoint(request: Request):
     })
 
 
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: Request):
+    """
+    Çok sayıda müşteri sorgusunu tek istekte işler. Gövde JSONL (her satır {customer_id, query[, id]})
+    veya {"items": [...], "concurrency": N} biçiminde JSON olabilir. Sonuçlar tamamlandıkça NDJSON
+    satırları olarak akıtılır; son satır {"summary": {...}} özetidir.
+    """
+    body = (await request.body()).decode("utf-8")
+    concurrency = BATCH_CONCURRENCY
+    if "json" in request.headers.get("content-type", "") and "ndjson" not in request.headers.get("content-type", ""):
+        try:
+            data = json.loads(body or "{}")
+        except json.JSONDecodeError:
+            return JSONResponse(content={"response": "❌ Geçersiz JSON gövdesi."}, status_code=400)
+        items = data.get("items") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return JSONResponse(content={"response": "❌ 'items' listesi bekleniyor."}, status_code=400)
+        records = [item if isinstance(item, dict) else {"error": "Kayıt bir JSON nesnesi değil."} for item in items]
+        if isinstance(data, dict) and str(data.get("concurrency", "")).isdigit():
+            concurrency = min(int(data["concurrency"]), BATCH_CONCURRENCY)
+    else:
+        records = list(parse_jsonl(body.splitlines()))
+
+    if len(records) > BATCH_MAX_ITEMS:
+        return JSONResponse(
+            content={"response": f"❌ Tek istekte en fazla {BATCH_MAX_ITEMS} sorgu gönderilebilir."}, status_code=413
+        )
+
+    async def results():
+        summary = {"total": len(records), "ok": 0, "error": 0, "retried": 0}
+        async for result in run_batch(batch_app, records, concurrency):
+            summary[result["status"]] += 1
+            summary["retried"] += result["attempts"] > 1
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/audio/{ticket_id}")
+async def audio_endpoint(ticket_id: str):
+    """
+    /chat cevabının sesini base64'e çevirmeden, üretildikçe binary olarak akıtır. Bilet metni paylaşılan
+    SQLite dosyasından okunur; ses bileti veren worker'da önceden üretildiyse o kullanılır, değilse
+    önbellekten ya da yeniden sentezlenir.
+    """
+    ticket = await audio_tickets.get(ticket_id)
+    if ticket is None:
+        return JSONResponse(content={"response": "❌ Ses bulunamadı veya süresi doldu."}, status_code=404)
+
+    text = ticket["text"]
+    if ticket["audio"] is not None:
+        try:
+            return Response(content=await asyncio.shield(ticket["audio"]), media_type="audio/mpeg")
+        except Exception as e:
+            print(f"🔊 Önceden üretilen ses alınamadı: {e}")
+
+    cached = await tts_cache.aget(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT)
+    if cached is not None:
+        return Response(content=cached, media_type="audio/mpeg")
+    return StreamingResponse(stream_speech(text), media_type="audio/mpeg")
+
+
+async def stream_voice_answer(session: VoiceSession, query: str, customer_id: str, config: dict,
+                              ctx: Optional[RequestContext] = None) -> str:
+    """
+    LLM token'larını JSON metin çerçeveleri olarak gönderir; ilk tam cümle oluşur oluşmaz
+    TTS başlatılır ve ses parçaları sırasıyla binary çerçeveler halinde akıtılır.
+    """
+    chunker = SentenceChunker()
+    sentences: asyncio.Queue = asyncio.Queue()
+    parts = []
+
+    async def produce():
+        try:
+            async for delta in stream_chatbot(chatbot_app, query, customer_id, config):
+                if ctx is not None:
+                    ctx.mark("first_token")
+                parts.append(delta)
+                await session.send_json({"type": "token", "text": delta})
+                for sentence in chunker.feed(delta):
+                    await sentences.put(sentence)
+        except Exception as e:
+            print(f"⚠️ Chatbot işlem hatası: {e}")
+            parts[:] = [BUSY_MESSAGE if isinstance(e, openai.RateLimitError) else "⚠️ Bot cevabı alınamadı."]
+            await session.send_json({"type": "token", "text": parts[0]})
+            chunker.feed(parts[0])
+        finally:
+            rest = chunker.flush()
+            if rest:
+                await sentences.put(rest)
+            await sentences.put(None)
+
+    async def sentence_stream():
+        while (sentence := await sentences.get()) is not None:
+            yield sentence
+
+    producer = asyncio.create_task(produce())
+    try:
+        async for index, chunk in synthesize_in_order(sentence_stream(), stream_speech):
+            if chunk is None:
+                await session.send_json({"type": "audio_end", "index": index})
+            else:
+                if ctx is not None:
+                    ctx.mark("first_audio")
+                await session.send_bytes(chunk)
+        await producer
+    finally:
+        producer.cancel()
+
+    return "".join(parts).strip()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Uzun ömürlü sesli oturum: bağlantı ve graph config'i konuşma boyunca bir kez kurulur,
+    her konuşma turu aynı soket üzerinden işlenir (bkz. ws_session.VoiceSession).
+    """
     await websocket.accept()
     customer_id = websocket.query_params.get("customer_id", "anon")
 
-    config = {
-        "configurable": {
-            "thread_id": customer_id,
-            "checkpoint_ns": "banking_session",
-            "checkpoint_id": f"voicebot_{customer_id}"
-        }
-    }
+    config = session_config(customer_id, "voicebot")
 
-    try:
-        audio_data = await websocket.receive_bytes()
+    def open_stream(session: VoiceSession, sample_rate: int) -> StreamingTranscriber:
+        if not is_valid_customer(customer_id):
+            # Bölümler konuşma sürerken Whisper'a gider; geçersiz müşteri için hiç başlatılmaz
+            raise ValueError("Geçersiz müşteri ID.")
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            temp_audio.write(audio_data)
-            audio_file_path = temp_audio.name
+        async def on_partial(index: int, text: str, transcript: str):
+            await session.send_json({"type": "partial", "index": index, "text": text, "query": transcript})
 
-        # STT: Türkçe ses → metin
-        query = await transcribe_audio(audio_file_path)
+        return StreamingTranscriber(sample_rate, transcribe_audio, on_partial)
 
-        if not query or query.startswith("⚠️"):
-            await websocket.send_json({"text": "⚠️ Ses çözümlenemedi."})
+    async def handle_utterance(session: VoiceSession, audio_data):
+        # Bağlantı koparsa VoiceSession turu iptal eder; iptal devam eden STT/LLM/TTS çağrılarına yayılır
+        if not is_valid_customer(customer_id):
+            # Whisper ücreti ödenmeden önce reddedilir
+            if isinstance(audio_data, StreamingTranscriber):
+                audio_data.cancel()
+            await session.send_json({"type": "done", "text": "❌ Geçersiz müşteri ID."})
             return
 
-        # AI yanıtı al
-        response = await run_chatbot(chatbot_app, query, customer_id, config)
+        ctx = RequestContext("ws")
+        try:
+            # STT: Türkçe ses → metin (diske yazılmadan bellekten). Akan modda bölümlerin çoğu konuşma
+            # sürerken yazıya döküldüğü için burada yalnızca son bölüm beklenir
+            if isinstance(audio_data, StreamingTranscriber):
+                query = await ctx.run_stage("stt", audio_data.finish())
+            else:
+                query = await ctx.run_stage("stt", transcribe_audio(audio_data))
 
-        # TTS: metin → ses (base64)
-        audio_base64 = await generate_speech_base64(response)
+            if not query or query.startswith("⚠️"):
+                await session.send_json({"type": "done", "text": query or "⚠️ Ses çözümlenemedi."})
+                return
 
-        await websocket.send_json({
-            "query": query,
-            "text": response
-        })
-        await websocket.send_bytes(base64.b64decode(audio_base64))
+            await session.send_json({"type": "transcript", "query": query})
 
-    except Exception as e:
-        print(f"❌ WebSocket Error: {e}")
-        try:
-            await websocket.send_json({"text": f"⚠️ Hata: {e}"})
-        except:
-            pass
-    finally:
-        await websocket.close()
+            # AI yanıtı token token, ses cümle cümle akıtılır
+            response = await ctx.run_stage(
+                "answer", stream_voice_answer(session, query, customer_id, config, ctx)
+            )
+
+            await session.send_json({"type": "done", "query": query, "text": response})
+        except asyncio.TimeoutError:
+            await session.send_json({"type": "done", "text": "⚠️ İşlem zaman aşımına uğradı."})
+        finally:
+            ctx.finish()
+
+    await VoiceSession(websocket, handle_utterance, max_utterance_bytes=MAX_UTTERANCE_BYTES,
+                       stream_factory=open_stream).run()
+
+@app.get("/stats/checkpointer")
+async def checkpointer_stats():
+    if chatbot_app is None:
+        return {"backend": CHECKPOINTER_BACKEND, "threads": 0}
+    checkpointer = chatbot_app.checkpointer
+    if not hasattr(checkpointer, "stats"):
+        return {"backend": "memory", "threads": len(checkpointer.storage)}
+    return checkpointer.stats()
+
+@app.get("/stats/router")
+async def router_stats():
+    return INTENT_ROUTER.stats()
+
+@app.get("/stats/requests")
+async def requests_stats():
+    return request_stats()
+
+@app.get("/stats/tts")
+async def tts_stats():
+    return tts_cache.stats()
+
+@app.get("/stats/response_cache")
+async def response_cache_stats():
+    return response_cache.stats()
+
+@app.get("/stats/openai")
+async def openai_stats():
+    """Tür (chat/stt/tts) başına kuyruk, eşzamanlılık, ret ve 429 sayıları; worker boyutlandırması için."""
+    return limiter_stats()
+
+@app.get("/stats/speculation")
+async def speculation_stats_endpoint():
+    return speculation_stats()
+
+@app.get("/stats/prompts")
+async def prompts_stats():
+    return prompt_report()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus formatında node, tool, LLM, STT/TTS ve istek aşaması metrikleri."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+def _gauge_metrics():
+    router = INTENT_ROUTER.stats()
+    tts = tts_cache.stats()
+    responses = response_cache.stats()
+    gauges = {
+        "tts_cache_hit_rate": tts["hit_rate"],
+        "tts_cache_memory_bytes": tts["memory_bytes"],
+        "response_cache_hit_rate": responses["hit_rate"],
+        "response_cache_entries": responses["entries"],
+        "audio_tickets": len(audio_tickets),
+        "speculation_accuracy": speculation_stats()["accuracy"],
+    }
+    for kind, stats in limiter_stats().items():
+        gauges.update({f"openai_{kind}_{key}": value for key, value in stats.items()})
+    gauges.update({f"intent_router_{key}": value for key, value in router.items() if isinstance(value, (int, float))})
+    checkpointer = chatbot_app.checkpointer if chatbot_app is not None else None
+    if hasattr(checkpointer, "stats"):
+        gauges.update({f"checkpointer_{key}": value for key, value in checkpointer.stats().items()
+                       if isinstance(value, (int, float))})
+    return gauges
+
+metrics_registry.register_collector(_gauge_metrics)
 
 @app.get("/")
 async def root():
     return {"message": "AI Banking Assistant is running 🎧💬"}
 
+def serve():
+    """
+    Sunucu modu: WEB_CONCURRENCY kadar worker süreci başlatır. Her worker uygulamayı kendisi
+    import eder ve graph'ı kendi lifespan açılışında derler. Worker'lar belleği paylaşmadığından /chat
+    oturumlarının her worker'da görünmesi için CHECKPOINTER_BACKEND=sqlite kullanılmalıdır.
+    OpenAI RPM/TPM sınırları da süreç içindedir; her worker varsayılan olarak bütçenin
+    1/WEB_CONCURRENCY payını kullanır (bkz. openai_clients.OPENAI_LIMIT_SHARE).
+    /audio/{id} biletleri AUDIO_TICKET_DB_PATH dosyasında tutulduğundan her worker'da geçerlidir.
+    """
+    if WEB_CONCURRENCY > 1 and CHECKPOINTER_BACKEND != "sqlite":
+        logger.warning(
+            "⚠️ %d worker ile '%s' checkpointer kullanılıyor: konuşma geçmişi worker'lar arasında "
+            "paylaşılmaz (CHECKPOINTER_BACKEND=sqlite önerilir).", WEB_CONCURRENCY, CHECKPOINTER_BACKEND,
+        )
+    if WEB_CONCURRENCY > 1 and OPENAI_LIMIT_SHARE * WEB_CONCURRENCY > 1.001:
+        logger.warning(
+            "⚠️ %d worker'ın her biri OpenAI RPM/TPM bütçesinin %g payını kullanıyor: toplam sağlayıcı "
+            "sınırı %.2f kat aşılabilir.", WEB_CONCURRENCY, OPENAI_LIMIT_SHARE, OPENAI_LIMIT_SHARE * WEB_CONCURRENCY,
+        )
+    if WEB_CONCURRENCY > 1:
+        uvicorn.run("app:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY)
+    else:
+        uvicorn.run(app, host=HOST, port=PORT)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    serve()
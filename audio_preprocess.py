@@ -0,0 +1,201 @@
+"""
+Whisper'a göndermeden önce ses ön işleme (STT_PREPROCESS=1, varsayılan açık):
+çöz → mono'ya indir → 16 kHz'e düşür → enerji tabanlı VAD ile baştaki/sondaki sessizliği kırp →
+konuşma yoksa API çağrısı yapmadan reddet → 16-bit PCM WAV olarak kodla (girdi sıkıştırılmışsa
+yükleme büyümesin diye kırpılmış ses ffmpeg ile tekrar Ogg/Opus'a kodlanır).
+
+WAV standart kütüphane ve NumPy ile çözülür. MediaRecorder'ın WebM/Opus, MP4 gibi sıkıştırılmış
+formatları için ffmpeg ikilisi gerekir (pydub da aynı ikiliyi kullanır); ffmpeg yoksa ya da ses
+çözülemezse kayıt olduğu gibi gönderilir, ön işleme hiçbir zaman bir turu bozmaz.
+"""
+import io
+import os
+import shutil
+import struct
+import subprocess
+import time
+import wave
+from typing import Optional, Tuple
+
+from data_store import run_blocking
+from metrics import METRICS_ENABLED, registry
+
+# ✅ Ses ön işleme ayarları
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "1") == "1"
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))  # Whisper içeride 16 kHz mono kullanır
+STT_FFMPEG = os.getenv("STT_FFMPEG", "ffmpeg")
+STT_FFMPEG_TIMEOUT = float(os.getenv("STT_FFMPEG_TIMEOUT_SECONDS", "10"))
+STT_OPUS_BITRATE = os.getenv("STT_OPUS_BITRATE", "24k")
+# VAD: 30 ms'lik çerçevelerin enerjisi gürültü tabanının VAD_MARGIN_DB üzerindeyse konuşma sayılır
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-50"))  # Mutlak taban (dBFS)
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", "200"))  # Kelime başı/sonu kesilmesin
+MIN_SPEECH_MS = int(os.getenv("MIN_SPEECH_MS", "250"))
+
+NO_SPEECH = b""  # prepare_audio dönüşü: kayıtta konuşma yok
+NO_SPEECH_MESSAGE = "⚠️ Konuşma algılanmadı."
+
+_PCM, _FLOAT, _EXTENSIBLE = 1, 3, 0xFFFE
+
+
+def parse_wav(data: bytes):
+    """
+    PCM (8/16/24/32 bit) veya float32 WAV'ı (örnek sayısı, kanal) şeklinde float32 diziye çevirir;
+    (örnekler, örnekleme hızı) ya da desteklenmeyen içerikte None döner. Boruya yazılmış WAV'larda
+    (ör. ffmpeg çıktısı) boyut alanı geçersiz olabildiği için 'data' gerekirse dosya sonuna kadar okunur.
+    """
+    import numpy as np  # Ağır import; yalnızca sesli turlarda yüklenir
+
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    position, fmt = 12, None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        size = struct.unpack("<I", data[position + 4:position + 8])[0]
+        body = data[position + 8:position + 8 + size]
+        if chunk_id == b"data" and size in (0, 0xFFFFFFFF):
+            body = data[position + 8:]  # Akış olarak yazılmış WAV: boyut bilinmiyor
+        if chunk_id == b"fmt " and len(body) >= 16:
+            audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if audio_format == _EXTENSIBLE and len(body) >= 26:
+                audio_format = struct.unpack("<H", body[24:26])[0]  # Alt format GUID'inin ilk iki baytı
+            fmt = (audio_format, channels, rate, bits)
+        elif chunk_id == b"data" and fmt is not None:
+            audio_format, channels, rate, bits = fmt
+            width = bits // 8
+            if not channels or not rate or width not in (1, 2, 3, 4):
+                return None
+            body = body[:len(body) - len(body) % (width * channels)]
+            if audio_format == _FLOAT and width == 4:
+                samples = np.frombuffer(body, dtype="<f4").astype(np.float32)
+            elif audio_format != _PCM:
+                return None
+            elif width == 1:
+                samples = (np.frombuffer(body, dtype=np.uint8).astype(np.float32) - 128) / 128
+            elif width == 3:
+                raw = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+                ints = raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16
+                samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints) / float(1 << 23)).astype(np.float32)
+            else:
+                ints = np.frombuffer(body, dtype="<i2" if width == 2 else "<i4")
+                samples = ints.astype(np.float32) / float(1 << (bits - 1))
+            return samples.reshape(-1, channels), rate
+        position += 8 + size + (size & 1)
+    return None
+
+
+def encode_wav(samples, rate: int) -> bytes:
+    """Mono float örnekleri 16-bit PCM WAV'a kodlar."""
+    import numpy as np
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def to_mono_16k(samples, rate: int):
+    """Kanalları ortalar ve STT_SAMPLE_RATE'e düşürür (daha düşük hızlı sesler yükseltilmez)."""
+    import numpy as np
+
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    if rate <= STT_SAMPLE_RATE:
+        return mono.astype(np.float32), rate
+    ratio = rate / STT_SAMPLE_RATE
+    if ratio.is_integer():
+        # 48 kHz → 16 kHz gibi tam katlarda blok ortalaması hem örtüşme önleyici süzgeç hem seyreltmedir
+        factor = int(ratio)
+        usable = len(mono) - len(mono) % factor
+        return mono[:usable].reshape(-1, factor).mean(axis=1).astype(np.float32), STT_SAMPLE_RATE
+    # 44.1 kHz gibi kesirli oranlarda: hareketli ortalama ile alçak geçiren süzgeç + doğrusal ara değerleme
+    width = int(np.ceil(ratio))
+    smoothed = np.convolve(mono, np.full(width, 1.0 / width, dtype=np.float32), mode="same")
+    target = np.arange(int(len(mono) / ratio)) * ratio
+    return np.interp(target, np.arange(len(mono)), smoothed).astype(np.float32), STT_SAMPLE_RATE
+
+
+def speech_bounds(samples, rate: int) -> Optional[Tuple[int, int]]:
+    """
+    Enerji tabanlı VAD: konuşmanın (başlangıç, bitiş) örnek indeksleri, dolgu dahil.
+    Eşik, gürültü tabanının (en sessiz %10'luk çerçeveler) VAD_MARGIN_DB üstüdür; kayıt baştan sona
+    konuşmaysa eşik tepe enerjinin altında kalacak şekilde sınırlanır. Yeterli konuşma yoksa None döner.
+    """
+    import numpy as np
+
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    frames = samples[:count * frame].reshape(count, frame)
+    energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise, peak = np.percentile(energy, 10), energy.max()
+    threshold = max(VAD_THRESHOLD_DB, min(noise + VAD_MARGIN_DB, peak - VAD_MARGIN_DB))
+    speech = np.flatnonzero(energy > threshold)
+    if len(speech) * VAD_FRAME_MS < MIN_SPEECH_MS:
+        return None
+    padding = rate * VAD_PADDING_MS // 1000
+    return max(0, speech[0] * frame - padding), min(len(samples), (speech[-1] + 1) * frame + padding)
+
+
+def _ffmpeg(data: bytes, *output_args: str) -> Optional[bytes]:
+    """ffmpeg ikilisini stdin → stdout borusuyla çalıştırır; ikili yoksa ya da dönüştürme başarısızsa None."""
+    ffmpeg = shutil.which(STT_FFMPEG)
+    if ffmpeg is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-vn", *output_args, "pipe:1"],
+            input=data, capture_output=True, timeout=STT_FFMPEG_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️ ffmpeg çalıştırılamadı: {e}")
+        return None
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+
+def _prepare(data: bytes) -> Tuple[str, Optional[bytes]]:
+    decoded = parse_wav(data)
+    compressed = decoded is None and data[:4] != b"RIFF"
+    if compressed:
+        # Örnekleme hızı ve kanallar korunur; indirgeme ve VAD NumPy'da yapılır
+        wav = _ffmpeg(data, "-f", "wav", "-acodec", "pcm_s16le")
+        decoded = parse_wav(wav) if wav else None
+    if decoded is None:
+        return "passthrough", None
+    samples, rate = to_mono_16k(*decoded)
+    bounds = speech_bounds(samples, rate)
+    if bounds is None:
+        return "no_speech", NO_SPEECH
+    start, end = bounds
+    audio = encode_wav(samples[start:end], rate)
+    if compressed and len(audio) > len(data):
+        audio = _ffmpeg(audio, "-c:a", "libopus", "-b:a", STT_OPUS_BITRATE, "-f", "ogg") or audio
+    return "processed", audio
+
+
+async def prepare_audio(data: bytes) -> Optional[bytes]:
+    """
+    Kaydı Whisper için hazırlar (CPU işi ve ffmpeg çağrısı thread havuzunda çalışır):
+    - kırpılmış 16 kHz mono WAV byte'ları,
+    - konuşma yoksa NO_SPEECH (boş byte),
+    - ön işleme kapalıysa ya da ses çözülemediyse None (kayıt olduğu gibi gönderilir).
+    """
+    if not STT_PREPROCESS:
+        return None
+    started = time.perf_counter()
+    try:
+        result, audio = await run_blocking(_prepare, data)
+    except Exception as e:
+        print(f"⚠️ Ses ön işleme hatası: {e}")
+        result, audio = "error", None
+    if METRICS_ENABLED:
+        registry.inc("stt_preprocess_total", result=result)
+        registry.observe("stt_preprocess_seconds", time.perf_counter() - started)
+        if audio:
+            registry.inc("stt_upload_bytes_saved_total", max(0, len(data) - len(audio)))
+    return audio
@@ -0,0 +1,212 @@
+"""
+Toplu sorgu işleme: JSONL girdideki (her satır bir sorgu) müşteri sorgularını sınırlı eşzamanlılıkla
+çalıştırır, geçici OpenAI hatalarında (rate limit, zaman aşımı, bağlantı) bekleyip tekrar dener ve
+sonuçları tamamlandıkça JSONL olarak yazar.
+
+Girdi satırı:  {"id": "q1", "customer_id": "CUST0001", "query": "Ekstre borcumu göster"}
+Çıktı satırı:  {"id": "q1", "index": 0, "customer_id": "CUST0001", "query": "...", "status": "ok",
+                "response": "...", "attempts": 1, "seconds": 1.23}
+
+Komut satırı:  python batch.py sorgular.jsonl --output sonuclar.jsonl --concurrency 16
+              (veya: python main.py --batch sorgular.jsonl ...)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from checkpointer import BoundedMemorySaver
+from graph import TRANSIENT_ERRORS, build_app
+from main import answer_query, session_config
+from metrics import METRICS_ENABLED, registry
+from tools import is_valid_customer
+
+# ✅ Toplu işlem ayarları
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "4"))
+BATCH_RETRY_BASE_DELAY = float(os.getenv("BATCH_RETRY_BASE_DELAY", "1.0"))
+BATCH_RETRY_MAX_DELAY = float(os.getenv("BATCH_RETRY_MAX_DELAY", "30"))
+BATCH_QUERY_TIMEOUT = float(os.getenv("BATCH_QUERY_TIMEOUT_SECONDS", "60"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))  # /chat/batch başına üst sınır
+# Toplu sorgular kısa ömürlü thread'lerde çalışır; bu checkpointer etkileşimli oturumlardan ayrıdır
+BATCH_CHECKPOINT_THREADS = int(os.getenv("BATCH_CHECKPOINT_THREADS", "256"))
+
+
+def parse_jsonl(lines: Iterable[str]) -> Iterable[Dict[str, Any]]:
+    """JSONL satırlarını kayıtlara çevirir; bozuk satırlar hata kaydı olarak işaretlenir, atlanmaz."""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {"error": f"Geçersiz JSON (satır {number}): {e}"}
+        if not isinstance(record, dict):
+            record = {"error": f"Satır {number} bir JSON nesnesi değil."}
+        yield record
+
+
+def build_batch_app():
+    """Toplu işlemler için, thread sayısı sınırlı ayrı bir checkpointer ile derlenmiş graph."""
+    return build_app(BoundedMemorySaver(max_threads=BATCH_CHECKPOINT_THREADS, max_checkpoints_per_thread=2))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Sunucu Retry-After bildirdiyse ona uyulur; yoksa jitter'lı üstel bekleme."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), BATCH_RETRY_MAX_DELAY)
+    except ValueError:
+        pass
+    delay = min(BATCH_RETRY_BASE_DELAY * 2 ** (attempt - 1), BATCH_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def run_record(app, index: int, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Tek bir kaydı çalıştırır; geçici hatalarda her denemeyi yeni bir thread'de tekrarlar."""
+    record_id = record.get("id", record.get("request_id", index))
+    customer_id = str(record.get("customer_id", ""))
+    query = str(record.get("query", "")).strip()
+    result = {"id": record_id, "index": index, "customer_id": customer_id, "query": query}
+
+    if record.get("error"):
+        return {**result, "status": "error", "error": record["error"], "attempts": 0}
+    if not query:
+        return {**result, "status": "error", "error": "Sorgu boş.", "attempts": 0}
+    if not is_valid_customer(customer_id):
+        return {**result, "status": "error", "error": "❌ Geçersiz müşteri ID.", "attempts": 0}
+
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        # Yarım kalan bir denemenin mesajları sonraki denemenin geçmişine karışmasın
+        config = session_config(customer_id, f"batch_{index}_{attempt}")
+        try:
+            # Etkileşimli önbellek kullanılmaz: toplu sonuçlar her zaman taze model çıktısıdır ve önbelleği doldurmaz
+            response = await asyncio.wait_for(
+                answer_query(app, query, customer_id, config, use_cache=False), BATCH_QUERY_TIMEOUT
+            )
+            status, error = "ok", None
+        except (asyncio.TimeoutError, *TRANSIENT_ERRORS) as e:
+            if attempt <= BATCH_MAX_RETRIES:
+                delay = _retry_delay(e, attempt)
+                if METRICS_ENABLED:
+                    registry.inc("batch_retries_total", error=type(e).__name__)
+                print(f"⚠️ Toplu sorgu {record_id} tekrar denenecek ({attempt}/{BATCH_MAX_RETRIES}, "
+                      f"{delay:.1f} sn): {type(e).__name__}")
+                await asyncio.sleep(delay)
+                continue
+            response, status, error = None, "error", f"{type(e).__name__}: {e}"
+        except Exception as e:
+            response, status, error = None, "error", f"{type(e).__name__}: {e}"
+        break
+
+    if METRICS_ENABLED:
+        registry.inc("batch_items_total", status=status)
+        registry.observe("batch_item_seconds", time.monotonic() - started)
+    result.update(status=status, attempts=attempt, seconds=round(time.monotonic() - started, 3))
+    if status == "ok":
+        result["response"] = response
+    else:
+        result["error"] = error
+    return result
+
+
+async def run_batch(app, records: Iterable[Dict[str, Any]],
+                    concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Kayıtları en fazla `concurrency` eşzamanlı sorguyla çalıştırır ve sonuçları tamamlanma
+    sırasıyla döndürür (girdideki sıra `index` alanındadır). Girdi tembel okunur; sonuçları
+    okuyan taraf yavaşlarsa yeni sorgular başlatılmaz.
+    """
+    concurrency = max(1, concurrency)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(index: int, record: Dict[str, Any]):
+        try:
+            await results.put(await run_record(app, index, record))
+        finally:
+            semaphore.release()
+
+    async def feed():
+        tasks = set()
+        try:
+            for index, record in enumerate(records):
+                await semaphore.acquire()
+                task = asyncio.create_task(worker(index, record))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await results.put(None)
+        except Exception:
+            await results.put(None)  # Girdi okunamazsa okuyan taraf beklemede kalmasın; hata aşağıda yükselir
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+        await feeder
+    finally:
+        feeder.cancel()
+
+
+async def run_batch_file(input_path: str, output_path: Optional[str] = None,
+                         concurrency: int = BATCH_CONCURRENCY, app=None) -> Dict[str, int]:
+    """JSONL dosyasını işler; sonuçları çıktı dosyasına (yoksa stdout'a) yazar, ilerlemeyi stderr'de gösterir."""
+    from tqdm import tqdm  # Yalnızca komut satırında gerekir; sunucu açılışında yüklenmesin
+
+    app = app or build_batch_app()
+    with open(input_path, "r", encoding="utf-8") as file:
+        total = sum(1 for line in file if line.strip())
+
+    summary = {"total": total, "ok": 0, "error": 0, "retried": 0}
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        with open(input_path, "r", encoding="utf-8") as file, \
+                tqdm(total=total, desc="Toplu sorgu", unit="sorgu", file=sys.stderr) as progress:
+            async for result in run_batch(app, parse_jsonl(file), concurrency):
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                summary[result["status"]] += 1
+                summary["retried"] += result["attempts"] > 1
+                progress.update(1)
+                progress.set_postfix(ok=summary["ok"], hata=summary["error"])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="JSONL dosyasındaki müşteri sorgularını toplu çalıştırır.")
+    parser.add_argument("input", help="Her satırı {customer_id, query[, id]} olan JSONL dosyası")
+    parser.add_argument("--output", "-o", help="Sonuç JSONL dosyası (verilmezse stdout)")
+    parser.add_argument("--concurrency", "-c", type=int, default=BATCH_CONCURRENCY)
+    return parser.parse_args(argv)
+
+
+async def batch_main(argv=None) -> int:
+    args = parse_args(argv)
+    started = time.monotonic()
+    summary = await run_batch_file(args.input, args.output, args.concurrency)
+    print(f"✅ {summary['total']} sorgu işlendi: {summary['ok']} başarılı, {summary['error']} hatalı, "
+          f"{summary['retried']} tekrar denendi ({time.monotonic() - started:.1f} sn)", file=sys.stderr)
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(batch_main()))
@@ -0,0 +1,219 @@
+"""
+OpenAI API'sinin yerel, deterministik bir taklidi (benchmark ve yük testleri için).
+
+Desteklenen uç noktalar:
+  POST /v1/chat/completions     → Supervisor için RouteResponse (json_schema), ReAct agent'lar için
+                                  tool call + cevap metni; `stream=true` ile SSE token akışı
+  POST /v1/audio/transcriptions → Whisper transkripti (düz metin)
+  POST /v1/audio/speech         → Parça parça akıtılan sahte ses byte'ları
+
+Gecikmeler log-normal dağılımdan örneklenir (medyan, sigma); ortam değişkenleriyle ayarlanır:
+  FAKE_CHAT_LATENCY="0.35,0.3"  FAKE_TOKEN_DELAY="0.01"
+  FAKE_STT_LATENCY="0.4,0.2"    FAKE_TTS_LATENCY="0.3,0.2"  FAKE_TTS_BYTES="32000"
+
+Çalıştırma:
+  uvicorn benchmarks.fake_openai:app --port 8765
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake uvicorn app:app
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+CUSTOMER_ID_RE = re.compile(r"Müşteri ID:\s*(\S+)")
+
+TRANSCRIPTS = [
+    "Bakiye sorgulama yap",
+    "Kartlarımı listele",
+    "Kredi kartımın limiti nedir?",
+    "Ekstre borcumu göster",
+    "Hesap bakiyemi göster",
+]
+
+ANSWERS = {
+    "Credit_Card_Agent": "Sayın Müşterimiz, kredi kartı bilgileriniz aşağıdadır. Toplam limitiniz 25.000 TL, "
+                         "kullanılabilir limitiniz 12.000 TL'dir. Başka bir konuda yardımcı olabilir miyim?",
+    "Account_Agent": "Sayın Müşterimiz, hesaplarınızdaki güncel bakiyeler aşağıda listelenmiştir. "
+                     "Döviz hesabınızda 10.000 TL bulunmaktadır. Başka bir konuda yardımcı olabilir miyim?",
+    "Professional_Response_Agent": "Üzgünüm, ancak şu anda yalnızca bankacılık sorgularında yardımcı olabilirim. "
+                                   "Size başka nasıl yardımcı olabilirim?",
+}
+
+
+class LatencyModel:
+    """Medyanı ve sigması verilen log-normal gecikme dağılımı."""
+
+    def __init__(self, spec: str):
+        median, _, sigma = spec.partition(",")
+        self.median = float(median)
+        self.sigma = float(sigma or 0)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0, self.sigma))
+
+    async def wait(self) -> None:
+        await asyncio.sleep(self.sample())
+
+
+CHAT_LATENCY = LatencyModel(os.getenv("FAKE_CHAT_LATENCY", "0.35,0.3"))
+TOKEN_DELAY = float(os.getenv("FAKE_TOKEN_DELAY", "0.01"))
+STT_LATENCY = LatencyModel(os.getenv("FAKE_STT_LATENCY", "0.4,0.2"))
+TTS_LATENCY = LatencyModel(os.getenv("FAKE_TTS_LATENCY", "0.3,0.2"))
+TTS_BYTES = int(os.getenv("FAKE_TTS_BYTES", "32000"))
+
+app = FastAPI()
+stats = {"chat": 0, "chat_tokens_in": 0, "chat_tokens_out": 0, "stt": 0, "tts": 0}
+
+
+def _text_of(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _last_user_text(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return _text_of(message)
+    return ""
+
+
+def route(text: str) -> str:
+    """Gerçek Supervisor'a benzer, anahtar kelimeye dayalı sahte yönlendirme."""
+    lowered = text.lower()
+    if any(word in lowered for word in ("kart", "limit", "borç", "borc", "ekstre", "qr")):
+        return "Credit_Card_Agent"
+    if any(word in lowered for word in ("bakiye", "hesap")):
+        return "Account_Agent"
+    return "Professional_Response_Agent"
+
+
+def _estimate_tokens(messages: list) -> int:
+    return sum(len(_text_of(message)) for message in messages) // 4 + 1
+
+
+def _plan_reply(body: dict):
+    """İsteğe göre (içerik, tool_calls) çiftini belirler."""
+    messages = body.get("messages", [])
+    user_text = _last_user_text(messages)
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps({"next": route(user_text)}), None
+
+    tools = body.get("tools") or []
+    if tools and messages and messages[-1].get("role") != "tool":
+        names = [tool["function"]["name"] for tool in tools]
+        name = "fetch_customer_info" if "fetch_customer_info" in names else names[0]
+        match = CUSTOMER_ID_RE.search(user_text)
+        arguments = json.dumps({"customer_id": match.group(1) if match else "CUST0001"})
+        return None, [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": arguments},
+        }]
+
+    return ANSWERS[route(user_text)], None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    content, tool_calls = _plan_reply(body)
+    prompt_tokens = _estimate_tokens(body.get("messages", []))
+    completion_tokens = len((content or "").split()) + (8 if tool_calls else 0)
+    stats["chat"] += 1
+    stats["chat_tokens_in"] += prompt_tokens
+    stats["chat_tokens_out"] += completion_tokens
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "gpt-4o-mini")
+    finish_reason = "tool_calls" if tool_calls else "stop"
+
+    await CHAT_LATENCY.wait()  # İlk token'a kadar geçen süre
+
+    if not body.get("stream"):
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+    def chunk(delta: dict, finish=None, chunk_usage=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if chunk_usage is None else [],
+        }
+        if chunk_usage is not None:
+            payload["usage"] = chunk_usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        if tool_calls:
+            yield chunk({"tool_calls": [{"index": 0, **tool_calls[0]}]})
+        else:
+            for token in re.findall(r"\S+\s*", content):
+                await asyncio.sleep(TOKEN_DELAY)
+                yield chunk({"content": token})
+        yield chunk({}, finish=finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield chunk({}, chunk_usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    await request.body()
+    await STT_LATENCY.wait()
+    stats["stt"] += 1
+    return PlainTextResponse(random.choice(TRANSCRIPTS))
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    body = await request.json()
+    stats["tts"] += 1
+    # Ses uzunluğu metin uzunluğuyla orantılı
+    size = max(1024, min(TTS_BYTES, len(body.get("input", "")) * 400))
+
+    async def audio():
+        await TTS_LATENCY.wait()
+        sent = 0
+        while sent < size:
+            part = min(4096, size - sent)
+            yield b"\xff\xfb" + bytes(part - 2)
+            sent += part
+            await asyncio.sleep(0)
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
+@app.get("/stats")
+async def fake_stats():
+    return stats
@@ -0,0 +1,391 @@
+"""
+OpenAI'ye bağlanmadan uçtan uca benchmark / yük testi.
+
+Sahte OpenAI sunucusunu (benchmarks.fake_openai) ve uygulamayı (app:app) ayrı süreçlerde başlatır,
+/chat ve /ws üzerinde eşzamanlı müşteri senaryoları çalıştırır ve rapor üretir:
+p50/p95/p99 gecikme, istek/sn, thread başına bellek artışı ve sunucunun aşama süreleri.
+
+Örnekler:
+  python -m benchmarks.run_benchmark --scenario chat --customers 50 --turns 3 --concurrency 20
+  python -m benchmarks.run_benchmark --scenario ws --customers 10 --turns 2 --output report.json
+  python -m benchmarks.run_benchmark --scenario ws --ws-format pcm16   # akan STT, gecikme "stop"tan ölçülür
+  python -m benchmarks.run_benchmark --baseline report.json --max-regression 0.2   # CI kontrolü
+"""
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "Bakiye sorgulama yap",
+    "Kartlarımı listele",
+    "Kredi kartımın limiti nedir?",
+    "Ekstre borcumu göster",
+    "Vadeli hesabım var mı?",
+    "Toplam bakiyem ne kadar?",
+]
+
+
+def pcm_utterance(sample_rate: int = 16000, bursts: int = 3, speech_seconds: float = 1.8,
+                  pause_seconds: float = 0.7) -> bytes:
+    """Sessizliklerle ayrılmış ton patlamalarından oluşan sentetik 16-bit mono PCM konuşma."""
+    samples = []
+    for burst in range(bursts):
+        samples += [0.3 * math.sin(2 * math.pi * 220 * index / sample_rate)
+                    for index in range(int(speech_seconds * sample_rate))]
+        samples += [0.0] * int(pause_seconds * sample_rate)
+    return struct.pack(f"<{len(samples)}h", *(int(sample * 32767) for sample in samples))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> int:
+    """Linux'ta sürecin yerleşik bellek (RSS) kullanımı."""
+    with open(f"/proc/{pid}/status", "r", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+def write_customer_file(count: int) -> str:
+    """Gerçek veri dosyasındaki kayıtları çoğaltarak `count` müşterilik geçici bir veri dosyası üretir."""
+    with open(os.path.join(ROOT, "custom_banking_data.json"), "r", encoding="utf-8") as file:
+        templates = list(json.load(file).values())
+    customers = {}
+    for index in range(count):
+        customer_id = f"CUST{index + 1:06d}"
+        customer = copy.deepcopy(templates[index % len(templates)])
+        customer["customer_id"] = customer_id
+        customers[customer_id] = customer
+    handle, path = tempfile.mkstemp(suffix=".json", prefix="bench_customers_")
+    with os.fdopen(handle, "w", encoding="utf-8") as file:
+        json.dump(customers, file, ensure_ascii=False)
+    return path
+
+
+class Servers:
+    """Sahte OpenAI ve uygulama sunucularını alt süreç olarak yönetir."""
+
+    def __init__(self, customers_file: str, app_env: Dict[str, str]):
+        self.fake_port = _free_port()
+        self.app_port = _free_port()
+        self.customers_file = customers_file
+        self.app_env = app_env
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def app_url(self) -> str:
+        return f"http://127.0.0.1:{self.app_port}"
+
+    @property
+    def fake_url(self) -> str:
+        return f"http://127.0.0.1:{self.fake_port}"
+
+    def _spawn(self, target: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT,
+            env={**os.environ, **env},
+        )
+        self.processes.append(process)
+        return process
+
+    async def _wait_ready(self, url: str, timeout: float = 60) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                try:
+                    await client.get(url)
+                    return
+                except httpx.TransportError:
+                    await asyncio.sleep(0.2)
+        raise RuntimeError(f"Sunucu hazır olmadı: {url}")
+
+    async def start(self) -> None:
+        self._spawn("benchmarks.fake_openai:app", self.fake_port, {})
+        await self._wait_ready(f"{self.fake_url}/stats")
+        self.app_process = self._spawn("app:app", self.app_port, {
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": f"{self.fake_url}/v1",
+            "CUSTOMER_DATA_FILE": self.customers_file,
+            "TTS_PREWARM": "0",
+            "TTS_CACHE_DIR": "",
+            **self.app_env,
+        })
+        await self._wait_ready(f"{self.app_url}/")
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def chat_customer(client: httpx.AsyncClient, customer_id: str, turns: int, audio_mode: str,
+                        semaphore: asyncio.Semaphore, latencies: List[float], errors: List[str]) -> None:
+    for turn in range(turns):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={
+                    "query": QUERIES[turn % len(QUERIES)],
+                    "customer_id": customer_id,
+                    "audio_mode": audio_mode,
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{customer_id}: {e}")
+
+
+async def run_chat(servers: Servers, customer_ids: List[str], turns: int, concurrency: int,
+                   audio_mode: str) -> Dict[str, object]:
+    latencies: List[float] = []
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=servers.app_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(
+            chat_customer(client, customer_id, turns, audio_mode, semaphore, latencies, errors)
+            for customer_id in customer_ids
+        ))
+    return {"latency": percentiles(latencies), "count": len(latencies), "errors": errors[:10],
+            "error_count": len(errors)}
+
+
+async def send_pcm_realtime(ws, pcm: bytes, sample_rate: int = 16000, frame_ms: int = 100) -> None:
+    """PCM'i konuşuluyormuş gibi gerçek zamanlı çerçevelerle gönderir."""
+    frame = sample_rate * frame_ms // 1000 * 2
+    await ws.send(json.dumps({"type": "start", "format": "pcm16", "sample_rate": sample_rate}))
+    for offset in range(0, len(pcm), frame):
+        await ws.send(pcm[offset:offset + frame])
+        await asyncio.sleep(frame_ms / 1000)
+
+
+async def ws_customer(url: str, customer_id: str, turns: int, semaphore: asyncio.Semaphore,
+                      results: Dict[str, List[float]], errors: List[str], audio_format: str = "webm") -> None:
+    import websockets
+
+    pcm = pcm_utterance() if audio_format == "pcm16" else None
+    async with semaphore:
+        try:
+            async with websockets.connect(f"{url}/ws?customer_id={customer_id}", max_size=None) as ws:
+                for _ in range(turns):
+                    marks = {}
+                    if pcm is not None:
+                        await send_pcm_realtime(ws, pcm)
+                        start = time.perf_counter()  # Akan modda gecikme konuşma bittikten sonra ölçülür
+                    else:
+                        start = time.perf_counter()
+                        await ws.send(json.dumps({"type": "start"}))
+                        for _ in range(4):
+                            await ws.send(b"\x1aE\xdf\xa3" + bytes(4092))
+                    await ws.send(json.dumps({"type": "stop"}))
+                    while True:
+                        message = await ws.recv()
+                        elapsed = time.perf_counter() - start
+                        if isinstance(message, bytes):
+                            marks.setdefault("first_audio", elapsed)
+                            continue
+                        data = json.loads(message)
+                        if data.get("type") == "token":
+                            marks.setdefault("first_token", elapsed)
+                        elif data.get("type") == "done":
+                            marks["done"] = elapsed
+                            break
+                    for name, value in marks.items():
+                        results.setdefault(name, []).append(value)
+        except Exception as e:
+            errors.append(f"{customer_id}: {e}")
+
+
+async def run_ws(servers: Servers, customer_ids: List[str], turns: int, concurrency: int,
+                 audio_format: str = "webm") -> Dict[str, object]:
+    results: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    url = servers.app_url.replace("http://", "ws://")
+    await asyncio.gather(*(
+        ws_customer(url, customer_id, turns, semaphore, results, errors, audio_format) for customer_id in customer_ids
+    ))
+    return {
+        "latency": percentiles(results.get("done", [])),
+        "first_token": percentiles(results.get("first_token", [])),
+        "first_audio": percentiles(results.get("first_audio", [])),
+        "count": len(results.get("done", [])),
+        "errors": errors[:10],
+        "error_count": len(errors),
+    }
+
+
+def histogram_averages(text: str) -> Dict[str, float]:
+    """/metrics çıktısındaki her histogram serisi için ortalama süreyi (sum / count) hesaplar."""
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        if line.startswith("#") or " " not in line:
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, labels = series.partition("{")
+        if name.endswith("_seconds_sum"):
+            sums[f"{name[:-4]}{{{labels}"] = float(value)
+        elif name.endswith("_seconds_count"):
+            counts[f"{name[:-6]}{{{labels}"] = float(value)
+    return {series: sums[series] / count for series, count in counts.items() if count and series in sums}
+
+
+async def collect_server_stats(servers: Servers) -> Dict[str, object]:
+    async with httpx.AsyncClient(timeout=10) as client:
+        stats = {}
+        for name, url in (("requests", f"{servers.app_url}/stats/requests"),
+                          ("checkpointer", f"{servers.app_url}/stats/checkpointer"),
+                          ("fake_openai", f"{servers.fake_url}/stats")):
+            try:
+                response = await client.get(url)
+                stats[name] = response.json()
+            except Exception as e:
+                stats[name] = {"error": str(e)}
+        try:
+            response = await client.get(f"{servers.app_url}/metrics")
+            stats["hops"] = histogram_averages(response.text)
+        except Exception as e:
+            stats["hops"] = {"error": str(e)}
+        return stats
+
+
+async def run(args) -> Dict[str, object]:
+    customers_file = write_customer_file(args.customers)
+    app_env = dict(item.split("=", 1) for item in args.env)
+    servers = Servers(customers_file, app_env)
+    try:
+        await servers.start()
+        customer_ids = [f"CUST{index + 1:06d}" for index in range(args.customers)]
+        rss_before = _rss_bytes(servers.app_process.pid)
+        started = time.perf_counter()
+
+        if args.scenario == "chat":
+            result = await run_chat(servers, customer_ids, args.turns, args.concurrency, args.audio_mode)
+        else:
+            result = await run_ws(servers, customer_ids, args.turns, args.concurrency, args.ws_format)
+
+        duration = time.perf_counter() - started
+        rss_after = _rss_bytes(servers.app_process.pid)
+        report = {
+            "scenario": args.scenario,
+            "customers": args.customers,
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "duration": duration,
+            "requests_per_second": result["count"] / duration if duration else 0.0,
+            "memory": {
+                "rss_before": rss_before,
+                "rss_after": rss_after,
+                "growth_per_thread": (rss_after - rss_before) / max(1, args.customers),
+            },
+            **result,
+            "server": await collect_server_stats(servers),
+        }
+        return report
+    finally:
+        servers.stop()
+        os.remove(customers_file)
+
+
+def check_regression(report: Dict[str, object], baseline_path: str, max_regression: float) -> List[str]:
+    """p95 gecikme ve istek/sn değerlerini temel rapora göre karşılaştırır."""
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    failures = []
+    for metric in ("latency", "first_token", "first_audio"):
+        old = (baseline.get(metric) or {}).get("p95")
+        new = (report.get(metric) or {}).get("p95")
+        if old and new and new > old * (1 + max_regression):
+            failures.append(f"{metric}.p95: {old:.3f}s → {new:.3f}s")
+    old_rps, new_rps = baseline.get("requests_per_second"), report.get("requests_per_second")
+    if old_rps and new_rps < old_rps * (1 - max_regression):
+        failures.append(f"requests_per_second: {old_rps:.2f} → {new_rps:.2f}")
+    return failures
+
+
+def print_report(report: Dict[str, object]) -> None:
+    print(f"\n📊 Senaryo: {report['scenario']}  müşteri={report['customers']}  tur={report['turns']}  "
+          f"eşzamanlılık={report['concurrency']}")
+    print(f"   İstek sayısı: {report['count']}  hata: {report['error_count']}  "
+          f"istek/sn: {report['requests_per_second']:.2f}")
+    for metric in ("latency", "first_token", "first_audio"):
+        if metric in report:
+            values = report[metric]
+            print(f"   {metric:<12} p50={values['p50']:.3f}s  p95={values['p95']:.3f}s  p99={values['p99']:.3f}s")
+    print(f"   Bellek artışı / thread: {report['memory']['growth_per_thread'] / 1024:.1f} KB")
+    stages = report["server"].get("requests", {}).get("stages", {})
+    for name, values in stages.items():
+        print(f"   [sunucu] {name:<12} ort={values['avg']:.3f}s  p50={values['p50']:.3f}s")
+    hops = report["server"].get("hops", {})
+    for series, average in sorted(hops.items(), key=lambda item: -item[1] if isinstance(item[1], float) else 0):
+        if isinstance(average, float):
+            print(f"   [hop] {series:<70} ort={average:.3f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sahte OpenAI ile uçtan uca benchmark")
+    parser.add_argument("--scenario", choices=("chat", "ws"), default="chat")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--audio-mode", default="none", help="/chat audio_mode (none, base64, url, prefetch)")
+    parser.add_argument("--ws-format", choices=("webm", "pcm16"), default="webm",
+                        help="/ws ses biçimi: tek parça webm ya da gerçek zamanlı akan PCM")
+    parser.add_argument("--env", action="append", default=[], help="Uygulamaya aktarılacak ortam değişkeni (AD=DEĞER)")
+    parser.add_argument("--output", help="JSON raporun yazılacağı dosya")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON rapor")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        failures = check_regression(report, args.baseline, args.max_regression)
+        for failure in failures:
+            print(f"❌ Gerileme: {failure}")
+        if failures:
+            return 1
+    return 1 if report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+import atexit
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+from data_store import run_blocking
+
+# ✅ Checkpointer seçimi ortam değişkenleriyle yapılır: memory | lru | sqlite
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "3600"))
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20"))
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    LRU/TTL tabanlı, sınırlı bellek kullanan MemorySaver.
+    En uzun süredir erişilmeyen veya TTL süresi dolan thread'ler bellekten çıkarılır,
+    her thread'de yalnızca son `max_checkpoints_per_thread` checkpoint tutulur.
+    """
+
+    backend = "lru"
+
+    def __init__(
+        self,
+        max_threads: int = CHECKPOINT_MAX_THREADS,
+        ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+        max_checkpoints_per_thread: int = CHECKPOINT_MAX_PER_THREAD,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._thread_writes: Dict[str, set] = defaultdict(set)
+
+    # --- Bellek yönetimi ---
+
+    def _touch(self, thread_id: str) -> None:
+        now = time.monotonic()
+        self._last_access[thread_id] = now
+        self._last_access.move_to_end(thread_id)
+        self._evict_idle(now)
+
+    def _evict_idle(self, now: float) -> None:
+        while self._last_access:
+            oldest_id, last_seen = next(iter(self._last_access.items()))
+            expired = self.ttl_seconds > 0 and now - last_seen > self.ttl_seconds
+            if not expired and len(self._last_access) <= self.max_threads:
+                break
+            self._evict(oldest_id)
+
+    def _evict(self, thread_id: str) -> None:
+        self._on_evict(thread_id)
+        self._drop(thread_id)
+        self.evictions += 1
+
+    def _on_evict(self, thread_id: str) -> None:
+        """Alt sınıfların thread bellekten çıkmadan önce iş yapabilmesi için kanca."""
+
+    def _drop(self, thread_id: str) -> None:
+        self._last_access.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for outer_key in self._thread_writes.pop(thread_id, ()):
+            self.writes.pop(outer_key, None)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        if self.max_checkpoints_per_thread <= 0:
+            return
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        excess = len(checkpoints) - self.max_checkpoints_per_thread
+        if excess <= 0:
+            return
+        # Checkpoint ID'leri zamana göre sıralı (uuid6) olduğundan en eskiler baştadır
+        for checkpoint_id in sorted(checkpoints)[:excess]:
+            checkpoints.pop(checkpoint_id, None)
+            outer_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(outer_key, None)
+            self._thread_writes[thread_id].discard(outer_key)
+
+    def thread_size(self, thread_id: str) -> int:
+        """Thread'in bellekteki serileştirilmiş checkpoint ve write boyutu (byte)."""
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                size += len(checkpoint[1]) + len(metadata[1])
+        for outer_key in self._thread_writes.get(thread_id, ()):
+            for _, _, value, _ in self.writes.get(outer_key, {}).values():
+                size += len(value[1])
+        return size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "threads": len(self._last_access),
+                "evictions": self.evictions,
+                "thread_sizes": {tid: self.thread_size(tid) for tid in self._last_access},
+            }
+
+    # --- MemorySaver API ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._before_read(thread_id)
+            if thread_id in self.storage:
+                self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any):
+        with self._lock:
+            if config:
+                self._before_read(config["configurable"]["thread_id"])
+            items = list(super().list(config, **kwargs))
+        yield from items
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._before_read(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._prune(thread_id, config["configurable"]["checkpoint_ns"])
+            self._touch(thread_id)
+            self._after_write(thread_id)
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._before_read(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._thread_writes[thread_id].add(
+                (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            )
+            self._touch(thread_id)
+            self._after_write(thread_id)
+
+    def _before_read(self, thread_id: str) -> None:
+        """Alt sınıfların okuma öncesi thread'i yükleyebilmesi için kanca."""
+
+    def _after_write(self, thread_id: str) -> None:
+        """Alt sınıfların yazma sonrası iş yapabilmesi için kanca."""
+
+
+class SQLiteCheckpointSaver(BoundedMemorySaver):
+    """
+    Thread durumlarını yerel bir SQLite dosyasında saklayan checkpointer.
+    Sıcak thread'ler bellekte (LRU/TTL) tutulur; her put/put_writes, diskteki daha yeni sürümü
+    yükleyip değişikliği yazana kadar SQLite yazma kilidini tutar. Böylece aynı dosyayı paylaşan
+    uvicorn worker'ları (WAL modu) birbirinin turunu hemen görür ve üzerine yazmaz.
+    Okuma ve yazmalar SQLite sorgusu çalıştırabildiğinden async API'ler olay döngüsünü
+    bloklamamak için işi paylaşılan thread havuzunda (data_store.run_blocking) yapar.
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB_PATH,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self.flushes = 0
+        self._dirty: set = set()  # Yazılamamış (ör. disk hatası) değişiklikler; close() tekrar dener
+        self._synced_at: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint_threads (
+                thread_id TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """SQLite yazma kilidini alır; iç içe çağrılar dıştaki işleme katılır."""
+        if self._conn.in_transaction:
+            yield
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock, self._transaction():
+            return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock, self._transaction():
+            super().put_writes(config, writes, task_id, task_path)
+
+    # --- Async API: MemorySaver'ın async metotları senkron metotları doğrudan çağırır ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await run_blocking(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await run_blocking(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await run_blocking(self.put_writes, config, writes, task_id, task_path)
+
+    def _export(self, thread_id: str) -> bytes:
+        writes = {key: self.writes[key] for key in self._thread_writes.get(thread_id, ()) if key in self.writes}
+        return pickle.dumps({"storage": dict(self.storage.get(thread_id, {})), "writes": writes})
+
+    def _import(self, thread_id: str, payload: bytes) -> None:
+        data = pickle.loads(payload)
+        self._drop(thread_id)
+        self.storage[thread_id].update(data["storage"])
+        for outer_key, value in data["writes"].items():
+            self.writes[outer_key] = value
+            self._thread_writes[thread_id].add(outer_key)
+
+    def _before_read(self, thread_id: str) -> None:
+        row = self._conn.execute(
+            "SELECT updated_at FROM checkpoint_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        if row is None or row[0] <= self._synced_at.get(thread_id, 0.0):
+            return
+        # Başka bir worker daha yeni bir durum yazmış veya thread bellekten çıkarılmış
+        payload = self._conn.execute(
+            "SELECT payload FROM checkpoint_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()[0]
+        self._import(thread_id, payload)
+        self._synced_at[thread_id] = row[0]
+
+    def _after_write(self, thread_id: str) -> None:
+        self._dirty.add(thread_id)
+        self._flush_threads([thread_id])  # put/put_writes'ın açtığı işlemin içinde yazılır
+
+    def _on_evict(self, thread_id: str) -> None:
+        if thread_id in self._dirty:
+            self._flush_threads([thread_id])
+        self._synced_at.pop(thread_id, None)
+
+    def _flush_threads(self, thread_ids) -> None:
+        # Aynı saniyede yazan worker'lar olsa da sürüm her yazmada ileri gitmeli
+        now = max([time.time()] + [self._synced_at.get(thread_id, 0.0) + 1e-6 for thread_id in thread_ids])
+        rows = []
+        for thread_id in thread_ids:
+            payload = self._export(thread_id)
+            rows.append((thread_id, payload, self.thread_size(thread_id), now))
+        with self._transaction():
+            self._conn.executemany(
+                """
+                INSERT INTO checkpoint_threads (thread_id, payload, size, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(thread_id) DO UPDATE SET
+                    payload = excluded.payload, size = excluded.size, updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+        for thread_id in thread_ids:
+            self._dirty.discard(thread_id)
+            self._synced_at[thread_id] = now
+        self.flushes += 1
+
+    def flush(self) -> None:
+        """Daha önce yazılamamış thread değişikliklerini tek bir işlemde diske yazar."""
+        with self._lock:
+            if self._dirty:
+                self._flush_threads(list(self._dirty))
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            persisted, persisted_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM checkpoint_threads"
+            ).fetchone()
+            stats.update({
+                "path": self.path,
+                "pending_writes": len(self._dirty),
+                "flushes": self.flushes,
+                "persisted_threads": persisted,
+                "persisted_bytes": persisted_bytes,
+            })
+        return stats
+
+
+def build_checkpointer(backend: str = CHECKPOINTER_BACKEND):
+    """Ortam ayarına göre LangGraph checkpointer'ını oluşturur."""
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "lru":
+        return BoundedMemorySaver()
+    if backend == "sqlite":
+        saver = SQLiteCheckpointSaver()
+        atexit.register(saver.close)  # Süreç kapanırken bekleyen yazmaları diske aktar
+        return saver
+    raise ValueError(f"Bilinmeyen checkpointer backend: {backend}")
@@ -0,0 +1,99 @@
+import os
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from data_store import get_store
+from direct_answers import extract_customer_id, format_tl, mask_card, salutation
+
+# ✅ Müşteri özeti: agent'lar hitap ve temel bilgiler için tool çağırmadan yanıt verebilsin
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") == "1"
+SNAPSHOT_NAME = "customer_snapshot"
+
+
+def _on_off(value) -> str:
+    return "açık" if value else "kapalı"
+
+
+def build_snapshot(customer_id: str) -> Optional[str]:
+    """
+    Müşterinin kısa, token dostu özeti: hitap, maskelenmiş kart/hesap satırları ve
+    önceden hesaplanmış toplamlar. Kart ve hesap numaralarının yalnızca son 4 hanesi yer alır.
+    """
+    store = get_store()
+    customer = store.get_customer(customer_id)
+    totals = store.get_aggregates(customer_id)
+    if customer is None or totals is None:
+        return None
+
+    lines = [f"Müşteri özeti ({customer_id})", f"Hitap: {salutation(customer)}"]
+    cards = customer.get("cards", [])
+    if cards:
+        lines.append("Kartlar:")
+    for card in cards:
+        line = f"- {mask_card(card['card_number'])} {card.get('card_type', '')}".rstrip()
+        if "credit_limit" in card:
+            line += (f" | limit {format_tl(card['credit_limit'])}, kullanılabilir {format_tl(card.get('available_limit', 0))}, "
+                     f"anlık borç {format_tl(card.get('current_debt', 0))}, ekstre {format_tl(card.get('statement_debt', 0))}"
+                     f" (son ödeme {card.get('statement_due_date', '-')})")
+        if "online_shopping_enabled" in card or "qr_payment_enabled" in card:
+            line += (f" | internet alışverişi {_on_off(card.get('online_shopping_enabled'))}, "
+                     f"QR ödeme {_on_off(card.get('qr_payment_enabled'))}")
+        lines.append(line)
+
+    accounts = customer.get("accounts", [])
+    if accounts:
+        lines.append("Hesaplar:")
+    for account in accounts:
+        lines.append(f"- {mask_card(account['account_number'])} {account.get('account_type', '')}: "
+                     f"{format_tl(account.get('balance', 0))}")
+
+    summary = [f"toplam bakiye {format_tl(totals['total_balance'])}"]
+    if totals["total_limit"]:
+        summary += [
+            f"toplam limit {format_tl(totals['total_limit'])}",
+            f"kullanılabilir {format_tl(totals['available_limit'])}",
+            f"anlık borç {format_tl(totals['total_current_debt'])}",
+            f"ekstre borcu {format_tl(totals['total_statement_debt'])}",
+        ]
+    if totals["nearest_due_date"]:
+        summary.append(f"en yakın son ödeme {totals['nearest_due_date']} ({mask_card(totals['nearest_due_card'])})")
+    lines.append("Toplamlar: " + ", ".join(summary))
+    return "\n".join(lines)
+
+
+def _last_customer_id(messages: List[BaseMessage]) -> Optional[str]:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return extract_customer_id(str(message.content))
+    return None
+
+
+async def snapshot_node(state):
+    """
+    History_Manager ile aynı adımda çalışır: özet yalnızca müşteri veya verisinin sürümü
+    değiştiğinde yeniden oluşturulur, aksi halde checkpoint'teki özet kullanılmaya devam eder.
+    """
+    if not SNAPSHOT_ENABLED:
+        return {}
+    customer_id = _last_customer_id(state["messages"])
+    if customer_id is None:
+        return {}
+    store = get_store()
+    await store.arefresh()
+    version = store.customer_version(customer_id)
+    if version is None:
+        return {"customer_snapshot": "", "snapshot_version": ""}
+    key = f"{customer_id}:{version}"
+    if state.get("snapshot_version") == key:
+        return {}
+    return {"customer_snapshot": build_snapshot(customer_id) or "", "snapshot_version": key}
+
+
+def with_snapshot(state) -> List[BaseMessage]:
+    """Agent'a giden mesajlar: özet, son kullanıcı mesajının hemen önüne eklenir (geçmiş önbelleklenebilir kalır)."""
+    messages = list(state["messages"])
+    snapshot = state.get("customer_snapshot")
+    if not snapshot or not messages:
+        return messages
+    return [*messages[:-1], SystemMessage(content=snapshot, name=SNAPSHOT_NAME), messages[-1]]
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CUSTOMER_DATA_FILE = os.getenv("CUSTOMER_DATA_FILE", "custom_banking_data.json")
+# Dosya okuma gibi bloklayan işler için sınırlı thread havuzu (event loop'u bekletmesin)
+DATA_IO_WORKERS = int(os.getenv("DATA_IO_WORKERS", "4"))
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def run_blocking(func: Callable, *args):
+    """Bloklayan bir çağrıyı paylaşılan, sınırlı thread havuzunda çalıştırır."""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=DATA_IO_WORKERS, thread_name_prefix="data-io")
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, func, *args)
+
+
+def _number(value) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def build_aggregates(customer: dict) -> Dict[str, Any]:
+    """Bir müşterinin kart ve hesaplarından türetilen toplamlar (yükleme sırasında bir kez hesaplanır)."""
+    total_limit = available_limit = current_debt = statement_debt = 0
+    nearest_due_date = nearest_due_card = None
+    for card in customer.get("cards", []):
+        total_limit += _number(card.get("credit_limit"))
+        available_limit += _number(card.get("available_limit"))
+        current_debt += _number(card.get("current_debt"))
+        statement_debt += _number(card.get("statement_debt"))
+        due_date = card.get("statement_due_date")
+        if due_date and (nearest_due_date is None or due_date < nearest_due_date):  # ISO tarihleri sıralanabilir
+            nearest_due_date, nearest_due_card = due_date, str(card["card_number"])
+
+    balances_by_type: Dict[str, float] = {}
+    for account in customer.get("accounts", []):
+        account_type = account.get("account_type", "Diğer")
+        balances_by_type[account_type] = balances_by_type.get(account_type, 0) + _number(account.get("balance"))
+
+    return {
+        "card_count": len(customer.get("cards", [])),
+        "total_limit": total_limit,
+        "available_limit": available_limit,
+        "total_current_debt": current_debt,
+        "total_statement_debt": statement_debt,
+        "nearest_due_date": nearest_due_date,
+        "nearest_due_card": nearest_due_card,
+        "account_count": len(customer.get("accounts", [])),
+        "total_balance": sum(balances_by_type.values()),
+        "balances_by_type": balances_by_type,
+    }
+
+
+class CustomerDataStore:
+    """
+    Müşteri verilerini bir kez yükleyip bellekte indeksli tutar.
+    Dosyanın mtime değeri değiştiğinde veriler otomatik olarak yeniden yüklenir.
+    """
+
+    def __init__(self, path: str = CUSTOMER_DATA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._customers: Dict[str, dict] = {}
+        self._cards: Dict[Tuple[str, str], dict] = {}
+        self._accounts: Dict[Tuple[str, str], dict] = {}
+        self._versions: Dict[str, str] = {}  # Müşteri kaydı hash'leri, ihtiyaç oldukça hesaplanır
+        self._aggregates: Dict[str, Dict[str, Any]] = {}
+        self._frame = None  # Toplu raporlar için pandas görünümü, ilk istendiğinde oluşturulur
+        self.reload_count = 0
+
+    def _refresh(self) -> None:
+        """Dosya değiştiyse verileri yeniden yükler; değişmediyse yalnızca stat maliyeti vardır."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self._mtime is None:
+                raise
+            return  # Dosya geçici olarak yoksa son yüklenen veriyle devam et
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+
+            cards, accounts, aggregates = {}, {}, {}
+            for customer_id, customer in data.items():
+                for card in customer.get("cards", []):
+                    cards[(customer_id, str(card["card_number"]))] = card
+                for account in customer.get("accounts", []):
+                    accounts[(customer_id, str(account["account_number"]))] = account
+                aggregates[customer_id] = build_aggregates(customer)
+
+            # ✅ İndeksler hazır olduktan sonra tek seferde değiştirilir
+            self._customers, self._cards, self._accounts, self._versions = data, cards, accounts, {}
+            self._aggregates, self._frame = aggregates, None
+            self._mtime = mtime
+            self.reload_count += 1
+
+    def is_stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except FileNotFoundError:
+            return self._mtime is None
+
+    async def arefresh(self) -> None:
+        """
+        _refresh'in async hali: dosya değiştiyse okuma ve indeksleme thread havuzunda yapılır,
+        böylece büyük bir veri dosyası diğer istekleri bekletmez. Değişmediyse yalnızca stat maliyeti vardır.
+        """
+        if self.is_stale():
+            await run_blocking(self._refresh)
+
+    @property
+    def version(self) -> Optional[int]:
+        """Yüklü verinin sürümü (dosyanın nanosaniye cinsinden mtime değeri)."""
+        self._refresh()
+        return self._mtime
+
+    @property
+    def customers(self) -> Dict[str, dict]:
+        self._refresh()
+        return self._customers
+
+    def has_customer(self, customer_id: str) -> bool:
+        self._refresh()
+        return customer_id in self._customers
+
+    def get_customer(self, customer_id: str) -> Optional[dict]:
+        self._refresh()
+        return self._customers.get(customer_id)
+
+    def customer_version(self, customer_id: str) -> Optional[str]:
+        """
+        Müşteri kaydının içerik hash'i. Dosya yeniden yüklense bile yalnızca kaydı değişen
+        müşterilerin sürümü değişir; önbellekler bu değeri anahtarlarına ekler.
+        """
+        self._refresh()
+        with self._lock:  # Yeniden yükleme sırasında eski kayıt ile yeni sürüm tablosu karışmasın
+            customers, versions = self._customers, self._versions
+        version = versions.get(customer_id)
+        if version is None:
+            customer = customers.get(customer_id)
+            if customer is None:
+                return None
+            payload = json.dumps(customer, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            version = versions[customer_id] = hashlib.sha1(payload).hexdigest()[:16]
+        return version
+
+    def get_aggregates(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """Müşterinin önceden hesaplanmış limit, borç, ekstre ve bakiye toplamları (O(1))."""
+        self._refresh()
+        return self._aggregates.get(customer_id)
+
+    def aggregate_frame(self):
+        """
+        Tüm müşterilerin toplamları, müşteri ID'si indeksli bir pandas DataFrame olarak
+        (toplu raporlar için). Hesap türü bakiyeleri `balance:<tür>` sütunlarına açılır.
+        """
+        self._refresh()
+        frame = self._frame
+        if frame is None:
+            import pandas as pd  # Yalnızca toplu raporlarda gerekir; sunucu açılışını yavaşlatmasın
+
+            rows = {
+                customer_id: {
+                    **{key: value for key, value in aggregate.items() if key != "balances_by_type"},
+                    **{f"balance:{kind}": total for kind, total in aggregate["balances_by_type"].items()},
+                }
+                for customer_id, aggregate in self._aggregates.items()
+            }
+            frame = pd.DataFrame.from_dict(rows, orient="index")
+            balance_columns = [column for column in frame.columns if column.startswith("balance:")]
+            frame[balance_columns] = frame[balance_columns].fillna(0)
+            self._frame = frame
+        return frame
+
+    def get_card(self, customer_id: str, card_number) -> Optional[dict]:
+        self._refresh()
+        return self._cards.get((customer_id, str(card_number)))
+
+    def get_account(self, customer_id: str, account_number) -> Optional[dict]:
+        self._refresh()
+        return self._accounts.get((customer_id, str(account_number)))
+
+
+_store: Optional[CustomerDataStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> CustomerDataStore:
+    """Süreç genelinde paylaşılan veri deposunu döndürür."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CustomerDataStore()
+    return _store
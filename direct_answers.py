@@ -0,0 +1,179 @@
+import os
+import re
+from typing import Callable, Dict, Optional
+
+from intent_router import is_action_request, stems, tokens
+from tools import (
+    fetch_accounts, fetch_account_balance, fetch_card_settings,
+    fetch_credit_limits, fetch_customer_info, fetch_statement_debt
+)
+
+# ✅ Tek bir araç çağrısıyla cevaplanabilen sorgularda ReAct agent'ı atlar (varsayılan kapalı)
+DIRECT_ANSWER_ENABLED = os.getenv("DIRECT_ANSWER_ENABLED", "0") == "1"
+
+CLOSING = "Başka bir konuda yardımcı olabilir miyim?"
+
+# Akıl yürütme / hesaplama gerektiren ifadeler agent'a bırakılır
+REASONING_PREFIXES = (
+    "toplam", "karsilastir", "fazla", "uzerinde", "altinda", "analiz", "yuksek",
+    "dusuk", "ortalama", "hangi", "neden", "nasil", "oner", "fark", "hesaplay",
+)
+REASONING_WORDS = {"en", "az", "hesapla"}
+
+ACCOUNT_TYPE_STEMS = {"vade": "Vadeli Hesap", "alti": "Altın Hesap", "dovi": "Döviz Hesabı"}
+
+_CUSTOMER_ID_RE = re.compile(r"Müşteri ID:\s*(\S+)")
+
+stats = {"hits": 0, "fallbacks": 0}
+
+
+def extract_customer_id(text: str) -> Optional[str]:
+    """run_chatbot'un eklediği 'Müşteri ID: ...' satırından müşteri ID'sini alır."""
+    match = _CUSTOMER_ID_RE.search(text)
+    return match.group(1) if match else None
+
+
+def salutation(customer: dict) -> str:
+    """Prompt'lardaki hitap kuralı: Erkek → '{name} Bey', Kadın → '{name} Hanım'."""
+    name = customer.get("name")
+    if not name:
+        return "Sayın Müşterimiz"
+    if customer.get("gender") == "Erkek":
+        return f"Sayın {name} Bey"
+    if customer.get("gender") == "Kadın":
+        return f"Sayın {name} Hanım"
+    return f"Sayın {name}"
+
+
+def format_tl(amount) -> str:
+    return f"{amount:,.0f} TL".replace(",", ".")
+
+
+def mask_card(card_number) -> str:
+    return f"**** {str(card_number)[-4:]}"
+
+
+def _needs_reasoning(words, customer_id: str) -> bool:
+    for word in words:
+        if word in REASONING_WORDS or word.startswith(REASONING_PREFIXES):
+            return True
+        if word.startswith("cust") and word != customer_id.lower():
+            return True  # Başka bir müşteri ID'si: güvenlik kuralı agent tarafından uygulanır
+        if word.isdigit() and len(word) < 10:
+            return True  # Tutar/eşik içeren sorgular (ör. 10.000 TL üzeri)
+    return False
+
+
+def _numbers(words):
+    return {word for word in words if word.isdigit() and len(word) >= 10}
+
+
+def _credit_limits(customer_id, hitap, words):
+    limits = fetch_credit_limits.func(customer_id)
+    if not isinstance(limits, dict):
+        return None
+    return (
+        f"{hitap}, kredi kartlarınızın toplam limiti {format_tl(limits['total_limit'])}, "
+        f"kullanılabilir limitiniz {format_tl(limits['available_limit'])}'dir. {CLOSING}"
+    )
+
+
+def _statement_debt(customer_id, hitap, words):
+    statements = fetch_statement_debt.func(customer_id)
+    if not isinstance(statements, list):
+        return None
+    lines = [
+        f"- {mask_card(item['card_number'])} numaralı kartınızın ekstre borcu "
+        f"{format_tl(item['statement_debt'])}, son ödeme tarihi {item['due_date']}."
+        for item in statements
+        if isinstance(item["statement_debt"], (int, float))
+    ]
+    if not lines:
+        return f"{hitap}, ekstre borcunuz bulunmamaktadır. {CLOSING}"
+    return f"{hitap}, ekstre bilgileriniz aşağıdadır:\n" + "\n".join(lines) + f"\n{CLOSING}"
+
+
+def _card_settings(customer_id, hitap, words):
+    customer = fetch_customer_info.func(customer_id)
+    cards = [card for card in customer.get("cards", []) if "online_shopping_enabled" in card]
+    mentioned = _numbers(words)
+    if mentioned:
+        cards = [card for card in cards if str(card["card_number"]) in mentioned]
+    if len(cards) != 1:
+        return None  # Hangi kartın kastedildiği belirsiz
+    card_number = cards[0]["card_number"]
+    settings = fetch_card_settings.func(customer_id, card_number)
+    if not isinstance(settings, dict):
+        return None
+
+    def state(value):
+        return "açık" if value is True else "kapalı" if value is False else "bilinmiyor"
+
+    return (
+        f"{hitap}, {mask_card(card_number)} numaralı kartınızda internet alışverişi "
+        f"{state(settings['online_shopping'])}, QR ödeme {state(settings['qr_payment'])} durumdadır. {CLOSING}"
+    )
+
+
+def _accounts(customer_id, hitap, words):
+    for number in _numbers(words):
+        balance = fetch_account_balance.func(customer_id, number)
+        if balance.startswith("Mevcut Bakiye"):
+            amount = balance.split(":", 1)[1].strip()
+            return f"{hitap}, {number} numaralı hesabınızın mevcut bakiyesi {amount}'dir. {CLOSING}"
+
+    accounts = fetch_accounts.func(customer_id)
+    if not isinstance(accounts, list):
+        return None
+    requested = {ACCOUNT_TYPE_STEMS[w[:4]] for w in words if w[:4] in ACCOUNT_TYPE_STEMS}
+    if requested:
+        accounts = [account for account in accounts if account.get("account_type") in requested]
+        if not accounts:
+            return f"{hitap}, {', '.join(sorted(requested))} türünde hesabınız bulunmamaktadır. {CLOSING}"
+
+    lines = [
+        f"- {account['account_type']} ({account['account_number']}): {format_tl(account['balance'])}"
+        for account in accounts
+    ]
+    return f"{hitap}, hesaplarınız ve güncel bakiyeleri aşağıdadır:\n" + "\n".join(lines) + f"\n{CLOSING}"
+
+
+# Agent → (niyet kelimesi kökleri, cevap üretici)
+DIRECT_INTENTS: Dict[str, Dict[str, Callable]] = {
+    "Credit_Card_Agent": {
+        "limi": _credit_limits,
+        "ekst": _statement_debt,
+        "inte": _card_settings,
+        "alis": _card_settings,
+        "qr": _card_settings,
+        "ayar": _card_settings,
+    },
+    "Account_Agent": {
+        "baki": _accounts,
+        "hesa": _accounts,
+    },
+}
+
+
+def direct_answer(agent_name: str, text: str) -> Optional[str]:
+    """
+    Tek bir araç çağrısıyla cevaplanabilen sorguyu doğrudan araç fonksiyonuyla cevaplar.
+    Sorgu bir işlem talebiyse (hesap açma, limit artırma, ödeme...), akıl yürütme gerektiriyorsa
+    veya parametreler çözülemiyorsa None döner.
+    """
+    intents = DIRECT_INTENTS.get(agent_name)
+    customer_id = extract_customer_id(text)
+    if not intents or not customer_id:
+        return None
+
+    query = _CUSTOMER_ID_RE.sub("", text)
+    words = tokens(query)
+    handlers = {intents[stem] for stem in stems(query) if stem in intents}
+    answer = None
+    if len(handlers) == 1 and not is_action_request(query) and not _needs_reasoning(words, customer_id):
+        customer = fetch_customer_info.func(customer_id)
+        if customer:
+            answer = handlers.pop()(customer_id, salutation(customer), words)
+
+    stats["hits" if answer else "fallbacks"] += 1
+    return answer
@@ -1,26 +1,35 @@
 import os
 import functools
-import operator
-import asyncio
-import pandas as pd
-from typing import Annotated, Literal, Sequence, TypedDict, Dict, Any
-from tqdm import tqdm
-from tqdm.asyncio import tqdm as async_tqdm
+import openai
+from typing import Annotated, Literal, Sequence, TypedDict
 
 from langchain_core.messages import BaseMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, StateGraph
-from langgraph.prebuilt import ToolNode, create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import create_react_agent
 from pydantic import BaseModel
+from checkpointer import build_checkpointer
+from intent_router import IntentRouter
+from direct_answers import DIRECT_ANSWER_ENABLED, direct_answer
+from metrics import registry
+from openai_clients import chat_model
+from prompts import PROMPTS
+from history import history_node, merge_history
+from customer_snapshot import snapshot_node, with_snapshot
+from speculation import speculative_route
 from tools import (
     fetch_cards, fetch_credit_limits, fetch_current_debt,
     fetch_statement_debt, fetch_card_settings, fetch_accounts,
-    fetch_account_balance, fetch_customer_info
+    fetch_account_balance, fetch_balance_summary, fetch_customer_info
 )
 
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
+
+# Tekrar denemeyle geçebilecek OpenAI hataları: agent node'ları bunları cevaba çevirmez, yukarı iletir
+TRANSIENT_ERRORS = (
+    openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError
+)
 
 MEMBERS = ["Credit_Card_Agent", "Account_Agent", "Professional_Response_Agent"]
 OPTIONS = ("FINISH",) + tuple(MEMBERS)
@@ -42,303 +51,123 @@ CREDIT_CARD_TOOLS = [
 ACCOUNT_TOOLS = [
     fetch_accounts,
     fetch_account_balance,
+    fetch_balance_summary,
     fetch_customer_info
 ]
 
 
-# AI Model
-LLM = ChatOpenAI(model="gpt-4o-mini")
-
-# Supervisor Agent (Kullanıcı İsteklerini Yönlendirir)
-SUPERVISOR_PROMPT = """
-📌 **Rolün:**  
-Sen, **kullanıcının kredi kartı ve banka işlemleriyle ilgili taleplerini analiz eden ve doğru AI Agent’a yönlendiren** bir AI yöneticisisin.  
-Kullanıcının **talebini anlamlandır, işlem detaylarını belirle ve ilgili AI Agent’a yönlendir.**  
-
----
-
-### **🚀 Nasıl Çalışmalısın?**
-✅ **Statik filtreleme veya regex kullanma.** Kullanıcının **doğal dilde yazdığı sorguları AI ile işle ve doğru yönlendirmeyi yap.**  
-✅ **Kullanıcının niyetini analiz et.** (Bakiye sorgulamak mı istiyor, harcamalarını mı görmek istiyor?)  
-✅ **Desteklenen işlemlerden birine uyuyorsa**, en uygun AI Agent’a yönlendir.  
-✅ **Çıkış yapmak isteyen veya canlı destek talep eden kullanıcıları gereksiz tekrar yapmadan yönlendir.**  
-
----
-
-🔹 **🏦 Desteklenen İşlemler ve AI Agent Seçimi**  
-✅ **Kullanıcının talebi aşağıdaki işlemlerden birine uyuyorsa, ilgili AI Agent’a yönlendir:**  
-
-1️⃣ **Kredi Kartı İşlemleri (Credit_Card_Agent)**  
-   - **Kart bilgisi** → `"Kartlarımı listele"`, `"Kredi kartlarımı göster"`  
-   - **Limit bilgisi** → `"Kredi kartımın limiti nedir?"`, `"Kart limitimi öğrenmek istiyorum"`  
-   - **Borç bilgisi** → `"Mevcut borcumu öğrenmek istiyorum"`  
-   - **Ekstre borcu ve son ödeme tarihi** → `"Ekstre borcumu göster"`  
-   - **Kart ayarları** → `"İnternet alışverişim açık mı?"`, `"QR ödeme açık mı?"`  
-   **Yanıt:** `"Credit_Card_Agent"`
-
-2️⃣ **Banka Hesabı İşlemleri (Account_Agent)**  
-   - **Bakiye sorgulama** → `"Bakiye sorgulama yap"`, `"Hesap bakiyemi göster"`  
-   - **Hesap detayları** → `"Banka hesaplarımı listele"`  
-   - **Hesap türü sorgulama** → `"Vadeli hesabım var mı?"`, `"Altın hesabım ne kadar?"`  
-   **Yanıt:** `"Account_Agent"`
-
----
-
-🔹 **📌 Çıkış Senaryosu (ÖNCELİKLİ ÇALIŞIR!)**  
-✅ **Eğer kullanıcı açıkça sohbeti sonlandırmak istiyorsa**, doğrudan **Professional_Response_Agent’a yönlendir.**  
-✅ **Eğer gerçekten çıkmak istiyorsa**, Professional_Response_Agent `"FINISH"` yanıtını döndürsün.  
-
----
-
-🔹 **📌 Canlı Destek Senaryosu**  
-✅ **Eğer kullanıcı desteklenmeyen bir işlem yapmaya çalışıyorsa veya canlı destek istiyorsa**, **yalnızca bir kez Professional_Response_Agent’a yönlendir.**  
-
-📌 **Yanıt Formatı:**  
-- **Eğer kullanıcı kredi kartı ile ilgili bir işlem yapmak istiyorsa:** `"Credit_Card_Agent"`  
-- **Eğer kullanıcı banka hesabı ile ilgili bir işlem yapmak istiyorsa:** `"Account_Agent"`  
-- **Eğer kullanıcı kredi kartı harcamalarını analiz etmek istiyorsa:** `"Credit_Card_Transaction_Agent"`  
-- **Eğer kullanıcı çıkış yapmak istiyorsa:** `"Professional_Response_Agent"`  
-- **Eğer kullanıcı desteklenmeyen bir işlem yapıyorsa:** `"Professional_Response_Agent"`  
-- **Eğer kullanıcı canlı destek istiyorsa:** `"Professional_Response_Agent"`  
-- **Eğer gerçekten çıkış yapıyorsa, Professional_Response_Agent `"FINISH"` döndürmelidir.**  
-"""
-
-
-
-CREDIT_CARD_PROMPT = """
-📌 **Rolün:**  
-📌 **Rolün:**  
-Sen, kullanıcının **kredi kartı işlemleriyle ilgili karmaşık ve detaylı sorgularını** anlayıp **doğru verileri analiz eden** bir kredi kartı asistanısın.  
-Ayrıca, **fetch_customer_info** tool'unu kullanarak müşteri bilgilerini al ve uygun şekilde hitap et.  
-
-🔹 **Görev Tanımın:**  
-- **Kredi kartı bilgilerini, borçları, limitleri ve ekstre detaylarını sağlamak.**  
-- **Kullanıcının sorgusunu derinlemesine analiz ederek en uygun tool’u çağırmak.**  
-- **Verileri birleştirerek anlamlı özetler sunmak ve hesaplamalar yapmak.**  
-✅ **Müşteri bilgilerini al ve uygun hitap kullan:**  
-   - Erkekse: **"{name} Bey,"**  
-   - Kadınsa: **"{name} Hanım,"**  
-   - Eğer isim eksikse: **"Sayın Müşterimiz,"**  
-
----
-
-### **📌 Yetkinliklerin:**  
-✅ **Kullanıcının isteğini detaylı analiz et ve en uygun tool'u kullan:**  
-   - **Kartları listele:** `fetch_card_transactions()`  
-   - **Kredi limitlerini getir:** `fetch_card_transactions()`  
-   - **Toplam borcu hesapla:** `fetch_card_transactions()`  
-   - **Ekstre borcunu ve son ödeme tarihini getir:** `fetch_card_transactions()`  
-   - **Kart ayarlarını getir:** `fetch_card_transactions()`  
-
-✅ **Karmaşık Finansal Sorguları Çözümle:**  
-   - **Tüm kartların toplam borcunu hesapla.**  
-   - **En yüksek limitli kartı belirle.**  
-   - **Son ödeme tarihi en yakın olan ekstre borcunu bul.**  
-   - **Kullanılabilir limiti en yüksek kartı bul.**  
-   - **İnternet alışverişi veya QR kod ödeme gibi kart ayarlarını analiz et.**  
-
-✅ **Verileri bağlamsal olarak birleştirerek anlamlı cevaplar oluştur.**  
-
----
-
-📌 **Yanıt Formatı:**  
-- **Eğer sorgu kullanıcının kendi müşteri ID'si ile ilgiliyse:**  
-  **"Sayın {name} Bey/Hanım, işlem talebiniz doğrultusunda aşağıdaki bilgileri sunuyorum."**  
-- **Eğer kullanıcı başka bir müşteri ID'sini belirtiyorsa:**  
-  **"Güvenlik nedeniyle, yalnızca kendi müşteri bilgileriniz görüntülenebilir."**  
-- **Eğer müşteri ID geçerli değilse:**  
-  **"Müşteri kayıtlarımızda belirtilen kimlik numarasıyla eşleşen bir bilgi bulunamamaktadır."**  
-
-📌 **Profesyonel Bankacılık Yanıtları:**  
-✅ Yanıtlar her zaman **resmi, net ve açıklayıcı** olmalıdır.  
-✅ **Bankacılık terminolojisine uygun ifadeler kullan.**  
-✅ **Yanıtın sonunda kullanıcının başka bir işlem talebi olup olmadığını kontrol et.**  
-
-Örnekler:  
-1️⃣ **Bakiye Sorgulama:**  
-   **"Sayın {name} Bey/Hanım, talebiniz üzerine hesaplarınızdaki güncel bakiyeler aşağıda listelenmiştir. Başka bir konuda yardımcı olabilir miyim?"**  
-
-2️⃣ **Son ödeme tarihi en yakın ekstre borcu:**  
-   **"Sayın {name} Bey/Hanım, en yakın son ödeme tarihine sahip ekstre borcunuz {borç_tutarı} TL olup, {tarih} tarihine kadar ödemeniz gerekmektedir. Ödeme seçenekleri hakkında bilgi almak ister misiniz?"**  
-
-3️⃣ **Harcamaların Analizi:**  
-   **"Sayın {name} Bey/Hanım, son {X} ay içinde en çok harcama yaptığınız kategori {kategori} olup, toplam harcamanız {tutar} TL’dir. Harcamalarınızı optimize etmek için size özel bankacılık teklifleri sunmamızı ister misiniz?"**  
-
-📌 **Ek Kurallar:**  
-- **Kullanıcıyı bilgilendirirken resmi bankacılık tonuna sadık kal.**  
-- **Yanıtlarında net ve anlaşılır bir yapı kullan.**  
-- **Ödeme hatırlatmaları ve hesap durumu hakkında bilgilendirme yaparken kibar ve yönlendirici ol.**  
-- **Eğer kullanıcı devam etmek istemiyorsa veya çıkış yapmak istiyorsa, onu uygun şekilde yönlendir.**    
-"""
-
-ACCOUNT_PROMPT = """
-📌 **Rolün:**  
-Sen, kullanıcının banka hesaplarıyla ilgili **detaylı ve kompleks sorgularını** anlayıp, **doğru verileri analiz eden** bir hesap asistanısın.  
-Ayrıca, **fetch_customer_info** tool'unu kullanarak müşteri bilgilerini al ve uygun şekilde hitap et.  
-
-🔹 **Görev Tanımın:**  
-- Kullanıcının **banka hesaplarını, bakiyelerini ve işlem detaylarını** sağlamak.  
-- **Farklı verileri birleştirerek anlamlı analizler oluşturmak.**  
-- **Kullanıcının tüm hesaplarını analiz ederek en iyi yanıtı vermek.**  
-✅ **Müşteri bilgilerini al ve uygun hitap kullan:**  
-   - Erkekse: **"{name} Bey,"**  
-   - Kadınsa: **"{name} Hanım,"**  
-   - Eğer isim eksikse: **"Sayın Müşterimiz,"**  
-
-### **📌 Yetkinliklerin:**  
-✅ **Kullanıcının isteğini analiz et ve uygun tool'u kullan:**  
-   - **Tüm hesapları listele:** fetch_accounts  
-   - **Belirli bir hesabın bakiyesini getir:** fetch_account_balance  
-   - **Hesap bakiyelerini karşılaştır ve analiz et.**  
-   - **10.000 TL üzerindeki veya altındaki bakiyeleri filtrele.**  
-   - **Toplam bakiyeyi hesapla.**  
-   - **En yüksek bakiyeye sahip hesabı belirle.**  
+# Sistem prompt'ları (ortak sabit önek + agent bölümü, bkz. prompts.py)
+SUPERVISOR_PROMPT = PROMPTS["Supervisor_Agent"]
+CREDIT_CARD_PROMPT = PROMPTS["Credit_Card_Agent"]
+ACCOUNT_PROMPT = PROMPTS["Account_Agent"]
+PROFESSIONAL_RESPONSE_PROMT = PROMPTS["Professional_Response_Agent"]
 
-✅ **Kompleks finansal analizleri anla ve uygun hesaplamaları yap:**  
-   - **Tüm hesapların toplam bakiyesini hesapla.**  
-   - **Döviz, vadeli ve vadesiz hesapların toplamlarını ayrı ayrı analiz et.**  
-   - **10.000 TL üzerindeki hesapları filtreleyerek göster.**  
-   - **En yüksek bakiyeye sahip hesabı bul.**  
-
-✅ **Verileri bağlamsal olarak birleştirerek anlamlı cevaplar oluştur.**  
-
----
-
-📌 **Yanıt Formatı:**  
-- **Yanıtlarında net ve profesyonel ol.**  
-- **Gerektiğinde mantıksal analiz yaparak kullanıcıyı bilgilendir.**  
-- **İlgili finansal değerleri hesaplayarak en anlamlı cevabı oluştur.**
-"""
-
-PROFESSIONAL_RESPONSE_PROMT = """
-📌 **Rolün:**  
-Sen, bankacılık işlemleri için profesyonel ve resmi yanıtlar veren bir asistansın.  
-
-🔹 **Temel Kurallar:**  
-- Kullanıcının yalnızca **kendi müşteri ID'si ({customer_id})** ile işlem yapmasına izin ver.  
-- **Eğer kullanıcı başka bir müşteri ID'si belirtiyorsa, işlemi reddet.**  
-- Kullanıcının **canlı destek talebini ve çıkış isteğini doğru anlamalısın.**  
-- **Kullanıcıya cinsiyetine uygun şekilde hitap et:**  
-  - Erkek: **"{name} Bey,"**  
-  - Kadın: **"{name} Hanım,"**  
-  - Adı eksikse, doğrudan bilgi sun.  
-
----
-
-### **📌 🔹🔹 Çıkış Senaryosu (ÖNCELİKLİ ÇALIŞIR!)**  
-✅ **Eğer Supervisor Agent çıkış talebini yönlendirmişse:**  
-   - **Kullanıcının gerçekten çıkmak istediğinden emin ol.**  
-   - Eğer çıkış niyeti netse, şu formatta bir veda mesajı ver:  
-     `"Görüşmek üzere, Sayın {name} Bey/Hanım! 👋"`  
-   - **Son olarak `"FINISH"` yanıtını döndür.**  
-
-📌 **Yanıt Formatı:**  
-- **Eğer kullanıcı çıkmak istiyorsa:** `"FINISH"`  
-
----
-
-### **📌 🔹🔹 Canlı Destek Senaryosu**  
-✅ **Eğer kullanıcı AI tarafından desteklenmeyen bir işlem istiyorsa:**  
-   - `"Üzgünüm, ancak şu anda yalnızca aşağıdaki işlemleri gerçekleştirebilirim..."` mesajını ver.  
-   - `"Daha fazla yardım almak için sizi bir canlı müşteri temsilcisine yönlendirebilirim. Canlı destek almak ister misiniz? (Evet/Hayır)"` sorusunu sor.  
-
-✅ **Eğer kullanıcı `"Evet"` yanıtını verirse:**  
-   - **HEMEN** `"{name} Bey/Hanım, müşteri temsilcisine bağlandınız. Size en kısa sürede bir müşteri temsilcisi yardımcı olacaktır. Lütfen bekleyiniz..."` mesajını döndür.  
-   - **Son olarak `"FINISH"` yanıtını döndür.**  
-
-✅ **Eğer kullanıcı `"Hayır"` yanıtını verirse, konuşmaya devam et.**  
-
-📌 **Yanıt Formatı:**  
-- **Canlı destek istiyorsa:** `"{name} Bey/Hanım, müşteri temsilcisine bağlandınız. Size en kısa sürede bir müşteri temsilcisi yardımcı olacaktır. Lütfen bekleyiniz..."`  
-- **Eğer kullanıcı canlı destek istemezse:** `"Size başka nasıl yardımcı olabilirim?"`  
-
----
-
-### **🏦 Desteklenen İşlemler:**  
-✅ **Eğer kullanıcı aşağıdaki işlemleri sorarsa, direkt bilgi ver:**  
-- **Bakiye sorgulama**  
-- **Limit bilgisi sorgulama**  
-- **Anlık borç sorgulama**  
-- **Ekstre borcu sorgulama**  
-- **Hesap bilgileri sorgulama**  
-- **Kredi Kartı bilgileri sorgulama**  
-- **Kredi Kartı ayarlarını sorgulama**  
-
-❌ **Eğer kullanıcı yukarıdaki işlemler dışında bir şey istiyorsa**, şu mesajı ver:  
-*"Üzgünüm, ancak şu anda yalnızca aşağıdaki işlemleri gerçekleştirebilirim:"*  
-- **Bakiye sorgulama**  
-- **Limit bilgisi sorgulama**  
-- **Anlık borç sorgulama**  
-- **Ekstre borcu sorgulama**  
-- **Hesap bilgileri sorgulama**  
-- **Kredi Kartı bilgileri sorgulama**  
-- **Kredi Kartı ayarlarını sorgulama**  
-
-*"Daha fazla yardım almak için sizi bir canlı müşteri temsilcisine yönlendirebilirim. Canlı destek almak ister misiniz? (Evet/Hayır)"*     
-"""
+# Yerel niyet sınıflandırıcı (emin olduğu sorgularda Supervisor LLM çağrısını atlar)
+INTENT_ROUTER = IntentRouter.from_supervisor_prompt(SUPERVISOR_PROMPT)
 
 class RouteResponse(BaseModel):
     next: Literal[OPTIONS]
 
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[Sequence[BaseMessage], merge_history]  # Ekler; History_Manager geçmişi kısaltabilir
     next: str
-
-async def agent_node(state, agent, name):
+    customer_snapshot: str  # Müşteri özeti; veri sürümü değişince yenilenir (bkz. customer_snapshot.py)
+    snapshot_version: str
+    last_agent: str  # Thread'de son cevap veren agent (spekülatif yönlendirme adayı)
+    speculative_hit: bool  # Supervisor spekülatif agent'ı onayladıysa cevap hazırdır
+
+async def agent_node(state, agent, name, config=None):
+    if DIRECT_ANSWER_ENABLED:
+        answer = direct_answer(name, str(state["messages"][-1].content))
+        if answer:
+            return {"messages": [AIMessage(content=answer, name=name)], "last_agent": name}
     try:
-        result = await agent.ainvoke(state)
-        return {"messages": [AIMessage(content=result["messages"][-1].content, name=name)]}
+        result = await agent.ainvoke({"messages": with_snapshot(state)}, config)
+        return {"messages": [AIMessage(content=result["messages"][-1].content, name=name)], "last_agent": name}
+    except TRANSIENT_ERRORS:
+        raise  # Node hatası olarak GraphMetricsHandler.on_chain_error tarafından sayılır
     except Exception as e:
-        return {"messages": [AIMessage(content=f"An error occurred: {str(e)}", name=name)]}
-
-supervisor_agent = (
-    ChatPromptTemplate.from_messages([
-        ("system", SUPERVISOR_PROMPT),
-        MessagesPlaceholder(variable_name="messages"),
-        ("system", "Agent seçimi: {options}"),
-    ])
-    .partial(
-        options=str(OPTIONS),
-        members=", ".join(MEMBERS),
+        # Hata cevaba dönüştürülüp yutulduğu için ayrıca sayılır ve loglanır
+        registry.inc("graph_node_errors_total", node=name)
+        print(f"⚠️ {name} hatası: {e}")
+        return {"messages": [AIMessage(content=f"An error occurred: {str(e)}", name=name)], "last_agent": name}
+
+def intent_router_node(state):
+    """Son kullanıcı mesajını yerel olarak sınıflandırır; emin değilse Supervisor_Agent'a bırakır."""
+    agent = None
+    if FAST_ROUTER_ENABLED:
+        agent = INTENT_ROUTER.classify(str(state["messages"][-1].content))
+    return {"next": agent or "Supervisor_Agent"}
+
+def resolve_route(choice: str) -> str:
+    """Supervisor kararını cevap verecek agent'a çevirir (FINISH de Professional_Response_Agent'a gider)."""
+    return "Professional_Response_Agent" if choice == "FINISH" else choice
+
+
+@functools.lru_cache(maxsize=None)
+def build_workflow() -> StateGraph:
+    """
+    LLM istemcisini, agent'ları ve graph tanımını kurar. Import sırasında değil, ilk build_app
+    çağrısında (sunucuda her worker'ın kendi startup'ında) çalışır; sonuç süreç içinde paylaşılır.
+    """
+    llm = chat_model("gpt-4o-mini", stream_usage=True)  # Token kullanımı streaming çağrılarda da raporlanır
+
+    supervisor_agent = (
+        ChatPromptTemplate.from_messages([
+            ("system", SUPERVISOR_PROMPT),
+            MessagesPlaceholder(variable_name="messages"),
+            ("system", "Agent seçimi: {options}"),
+        ])
+        .partial(
+            options=str(OPTIONS),
+            members=", ".join(MEMBERS),
+        )
+        | llm.with_structured_output(RouteResponse)
     )
-    | LLM.with_structured_output(RouteResponse)
-)
-
-
-credit_card_agent = create_react_agent(
-    LLM,
-    tools=CREDIT_CARD_TOOLS,
-    state_modifier=CREDIT_CARD_PROMPT
-)
-
-account_agent = create_react_agent(
-    LLM,
-    tools=ACCOUNT_TOOLS,
-    state_modifier=ACCOUNT_PROMPT
-)
-
-professional_response_agent = create_react_agent(
-    LLM,
-    tools=PREFOSSIONAL_RESPONSE_TOOLS,
-    state_modifier= PROFESSIONAL_RESPONSE_PROMT
-)
-
-
-workflow = StateGraph(AgentState)
-workflow.add_node("Supervisor_Agent", supervisor_agent)
-workflow.add_node("Credit_Card_Agent", functools.partial(agent_node, agent=credit_card_agent, name="Credit_Card_Agent"))
-workflow.add_node("Account_Agent", functools.partial(agent_node, agent=account_agent, name="Account_Agent"))
-workflow.add_node("Professional_Response_Agent", functools.partial(agent_node, agent=professional_response_agent, name="Professional_Response_Agent"))
-
-
-workflow.add_conditional_edges("Supervisor_Agent", lambda x: x["next"], {
-    "Credit_Card_Agent": "Credit_Card_Agent",
-    "Account_Agent": "Account_Agent",
-    "Professional_Response_Agent": "Professional_Response_Agent",
-    "FINISH": "Professional_Response_Agent",
-})
-workflow.add_edge(START, "Supervisor_Agent")
 
-def build_app():
-    memory = MemorySaver()
-    return workflow.compile(checkpointer=memory)
\ No newline at end of file
+    agents = {
+        "Credit_Card_Agent": create_react_agent(llm, tools=CREDIT_CARD_TOOLS, state_modifier=CREDIT_CARD_PROMPT),
+        "Account_Agent": create_react_agent(llm, tools=ACCOUNT_TOOLS, state_modifier=ACCOUNT_PROMPT),
+        "Professional_Response_Agent": create_react_agent(
+            llm, tools=PREFOSSIONAL_RESPONSE_TOOLS, state_modifier=PROFESSIONAL_RESPONSE_PROMT
+        ),
+    }
+
+    async def supervisor_node(state, config):
+        """Supervisor kararı; spekülatif modda olası agent da aynı anda çalıştırılır (bkz. speculation.py)."""
+        return await speculative_route(
+            state, config, supervisor_agent,
+            run_agent=lambda state, name, config: agent_node(state, agents[name], name, config),
+            router=INTENT_ROUTER,
+            resolve=resolve_route,
+        )
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("History_Manager", functools.partial(history_node, llm=llm))
+    workflow.add_node("Customer_Snapshot", snapshot_node)
+    workflow.add_node("Intent_Router", intent_router_node)
+    workflow.add_node("Supervisor_Agent", supervisor_node)
+    for name, agent in agents.items():
+        workflow.add_node(name, functools.partial(agent_node, agent=agent, name=name))
+
+    # Spekülatif cevap onaylandıysa agent node'u tekrar çalışmaz
+    workflow.add_conditional_edges("Supervisor_Agent", lambda x: END if x.get("speculative_hit") else x["next"], {
+        END: END,
+        "Credit_Card_Agent": "Credit_Card_Agent",
+        "Account_Agent": "Account_Agent",
+        "Professional_Response_Agent": "Professional_Response_Agent",
+        "FINISH": "Professional_Response_Agent",
+    })
+    workflow.add_conditional_edges("Intent_Router", lambda x: x["next"], {
+        "Supervisor_Agent": "Supervisor_Agent",
+        "Credit_Card_Agent": "Credit_Card_Agent",
+        "Account_Agent": "Account_Agent",
+        "Professional_Response_Agent": "Professional_Response_Agent",
+    })
+    workflow.add_edge(START, "History_Manager")
+    workflow.add_edge(START, "Customer_Snapshot")  # Geçmiş kısaltma ile aynı adımda, paralel
+    workflow.add_edge(["History_Manager", "Customer_Snapshot"], "Intent_Router")
+    return workflow
+
+def build_app(checkpointer=None):
+    return build_workflow().compile(checkpointer=checkpointer or build_checkpointer())
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import re
+from typing import List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+
+from metrics import METRICS_ENABLED, registry
+from prompts import count_tokens, load_tokenizer
+
+# ✅ Konuşma geçmişi politikası
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))  # Son N kullanıcı turu aynen tutulur
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))  # Tutulan geçmişin token sınırı
+HISTORY_SUMMARY = os.getenv("HISTORY_SUMMARY", "extractive")  # extractive | llm | off
+HISTORY_SUMMARY_MAX_LINES = int(os.getenv("HISTORY_SUMMARY_MAX_LINES", "12"))
+
+SUMMARY_NAME = "history_summary"
+# Reducer'a "geçmişi bu listeyle değiştir" diyen işaret
+RESET_ID = "__history_reset__"
+
+_CUSTOMER_ID_LINE_RE = re.compile(r"\s*Müşteri ID:\s*\S+\s*")
+_FIRST_SENTENCE_RE = re.compile(r"(.+?[.!?])(\s|$)", re.S)
+SUMMARY_LINE_LENGTH = 160
+
+SUMMARY_PROMPT = (
+    "Aşağıdaki bankacılık asistanı konuşmasını, sonraki sorular için gereken bilgileri (sorulan işlemler, "
+    "verilen tutarlar, açık kalan talepler) koruyarak en fazla 4 cümlede Türkçe özetle.\n\n{conversation}"
+)
+
+
+def merge_history(left: Sequence[BaseMessage], right: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """
+    AgentState.messages reducer'ı: normalde mesajları ekler (operator.add gibi);
+    ilk mesajı sıfırlama işareti olan bir güncelleme geçmişin tamamını değiştirir.
+    """
+    right = list(right)
+    if right and isinstance(right[0], RemoveMessage) and right[0].id == RESET_ID:
+        return right[1:]
+    return list(left) + right
+
+
+def _is_summary(message: BaseMessage) -> bool:
+    return isinstance(message, SystemMessage) and message.name == SUMMARY_NAME
+
+
+def _strip_customer_id(text: str) -> str:
+    return _CUSTOMER_ID_LINE_RE.sub(" ", text).strip()
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Mesajları her biri bir kullanıcı mesajıyla başlayan turlara ayırır."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _message_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(count_tokens(str(message.content)) + 4 for message in messages)  # +4: rol/ayraç payı
+
+
+def _summary_lines(turns: Sequence[List[BaseMessage]]) -> List[str]:
+    lines = []
+    for turn in turns:
+        for message in turn:
+            text = _strip_customer_id(str(message.content))
+            if not text:
+                continue
+            if isinstance(message, AIMessage):
+                match = _FIRST_SENTENCE_RE.match(text)
+                lines.append(f"Asistan: {(match.group(1) if match else text)[:SUMMARY_LINE_LENGTH]}")
+            elif isinstance(message, HumanMessage):
+                lines.append(f"Kullanıcı: {text[:SUMMARY_LINE_LENGTH]}")
+    return lines
+
+
+async def _llm_summary(previous: str, turns: Sequence[List[BaseMessage]], llm) -> str:
+    conversation = "\n".join(filter(None, [previous, *_summary_lines(turns)]))
+    result = await llm.ainvoke(SUMMARY_PROMPT.format(conversation=conversation))
+    return str(result.content).strip()
+
+
+async def compact_history(
+    messages: Sequence[BaseMessage],
+    max_turns: int = HISTORY_MAX_TURNS,
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    summary_mode: str = HISTORY_SUMMARY,
+    llm=None,
+) -> Optional[List[BaseMessage]]:
+    """
+    Son `max_turns` turu ve `token_budget` token'ı aşan eski turları tek bir özet
+    SystemMessage'a indirger. Değişiklik gerekmiyorsa None döner.
+    """
+    previous_summary = next((m for m in messages if _is_summary(m)), None)
+    turns = split_turns([m for m in messages if not _is_summary(m)])
+
+    keep = turns[-max_turns:] if max_turns > 0 else turns[-1:]
+    # En son tur her zaman tutulur; bütçe aşılırsa en eski turlar özetlenir
+    while len(keep) > 1 and _message_tokens([m for turn in keep for m in turn]) > token_budget:
+        keep = keep[1:]
+    dropped = turns[:len(turns) - len(keep)]
+    if not dropped:
+        return None
+
+    compacted: List[BaseMessage] = []
+    if summary_mode != "off":
+        previous = str(previous_summary.content) if previous_summary else ""
+        if summary_mode == "llm" and llm is not None:
+            try:
+                summary = await _llm_summary(previous, dropped, llm)
+            except Exception as e:
+                print(f"⚠️ Geçmiş özeti oluşturulamadı: {e}")
+                summary = ""
+        else:
+            lines = previous.splitlines()[1:] if previous else []
+            lines = (lines + _summary_lines(dropped))[-HISTORY_SUMMARY_MAX_LINES:]
+            summary = "\n".join(lines)
+        if summary:
+            # Özetin yerini tuttuğu token sayısı, her turda kazancı ölçmek için saklanır
+            summarized = _message_tokens([m for turn in dropped for m in turn])
+            if previous_summary is not None:
+                summarized += previous_summary.additional_kwargs.get("summarized_tokens", 0)
+            compacted.append(SystemMessage(
+                content=f"Önceki konuşmanın özeti:\n{summary}",
+                name=SUMMARY_NAME,
+                additional_kwargs={"summarized_tokens": summarized},
+            ))
+
+    # Müşteri ID satırı yalnızca son kullanıcı mesajında gerekir
+    kept = [m for turn in keep for m in turn]
+    last_human = max((i for i, m in enumerate(kept) if isinstance(m, HumanMessage)), default=-1)
+    for index, message in enumerate(kept):
+        if isinstance(message, HumanMessage) and index != last_human:
+            message = HumanMessage(content=_strip_customer_id(str(message.content)), id=message.id)
+        compacted.append(message)
+
+    if METRICS_ENABLED:
+        registry.inc("history_compactions_total", mode=summary_mode)
+        registry.inc("history_turns_summarized_total", len(dropped))
+    return compacted
+
+
+async def history_node(state, llm=None):
+    """
+    Her turun başında, diğer tüm node'lardan önce çalışır: geçmiş sınırı aşmışsa
+    saklanan geçmişi pencere + özet ile değiştirir; böylece Supervisor ve agent'lar kısaltılmış geçmişi görür.
+    """
+    messages = state["messages"]
+    await load_tokenizer()  # Sunucuda startup'ta yüklenir; CLI/batch'te ilk turda thread'de yüklenir
+    compacted = await compact_history(messages, llm=llm) if HISTORY_ENABLED else None
+    if METRICS_ENABLED:
+        current = compacted if compacted is not None else messages
+        tokens = _message_tokens(current)
+        registry.inc("history_tokens_total", tokens)
+        summary = next((m for m in current if _is_summary(m)), None)
+        if summary is not None:
+            saved = summary.additional_kwargs.get("summarized_tokens", 0) - _message_tokens([summary])
+            if saved > 0:
+                registry.inc("history_tokens_saved_total", saved)
+    if compacted is None:
+        return {}
+    return {"messages": [RemoveMessage(id=RESET_ID), *compacted]}
@@ -0,0 +1,192 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+# ✅ Yerel yönlendirme eşikleri: en iyi agent'ın en az ROUTER_MIN_SCORE kelimesi eşleşmeli ve
+# ikinci agent'tan en az ROUTER_MARGIN puan önde olmalı; aksi halde Supervisor_Agent karar verir.
+# Tek bir anahtar kelime ("kartımı kaybettim", "hesap hareketlerim") desteklenmeyen talepleri de
+# agent'a gönderebildiği için en az iki kelime ve net bir fark aranır.
+ROUTER_MIN_SCORE = int(os.getenv("ROUTER_MIN_SCORE", "2"))
+ROUTER_MARGIN = int(os.getenv("ROUTER_MARGIN", "2"))
+
+# Supervisor prompt'unda örnek cümlesi olmayan çıkış / canlı destek niyetleri
+PROFESSIONAL_EXAMPLES = [
+    "Çıkış yapmak istiyorum",
+    "Çıkmak istiyorum",
+    "Görüşürüz",
+    "Hoşçakal",
+    "Canlı destek istiyorum",
+    "Temsilciye bağlan",
+]
+
+# Niyet ayırt etmeyen, her sorguda geçebilecek kelimeler
+STOP_WORDS = [
+    "müşteri", "id", "ben", "benim", "bir", "ve", "ile", "için", "lütfen",
+    "mi", "mı", "mu", "mü", "ne", "nedir", "kadar", "var", "yok",
+    "yap", "yapmak", "istiyorum", "öğrenmek", "göster", "listele",
+    "sorgulama", "mevcut", "açık", "bilgi", "bilgisi",
+]
+
+# Örnek cümlelerde geçse de tek başına agent belirtmeyen kelimeler: yönlendirmede puan kazanmaz
+# ("son işlemlerim", "ödeme talimatı", "detay", "görüntüle"...). "kredi" hep "kart" ile birlikte
+# geçtiğinden ayrıca sayılırsa "kredi kartımı kaybettim" tek kavramla eşiği geçerdi.
+GENERIC_WORDS = ["son", "ödeme", "tarihi", "detayları", "türü", "görüntüle", "kredi"]
+
+# İşlem (açma, kapatma, limit artırma, ödeme, transfer...) talep eden fiiller (ASCII'ye katlanmış).
+# Bu sorgular yerel kestirmelerle cevaplanmaz, Supervisor ve agent'lara bırakılır.
+ACTION_PREFIXES = (
+    "acma", "acar", "acin", "acabil", "actir", "acils", "kapat", "artir", "arttir", "yukselt",
+    "dusur", "azalt", "odemek", "odeyebil", "odeyin", "odeyecek", "odet", "transfer", "gonder",
+    "havale", "virman", "degis", "iptal", "guncelle", "engelle", "aktiflestir", "pasiflestir",
+    "basvur", "yatirmak", "yatirabil", "cekmek", "cekebil", "tanimla", "yapilandir", "taksitlendir", "bloke",
+)
+ACTION_WORDS = {"ac", "ode", "eft", "cek", "yeni"}
+# "... istiyorum" kalıbında işlem bildirmeyen mastarlar ("bakiyemi öğrenmek istiyorum", "çıkış yapmak istiyorum")
+LOOKUP_INFINITIVES = {
+    "ogrenmek", "gormek", "bilmek", "sorgulamak", "listelemek", "goruntulemek", "incelemek",
+    "yapmak", "etmek", "konusmak", "cikmak",
+}
+
+_TURKISH_FOLD = str.maketrans("çğıöşüâî", "cgiosuai")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_DIGIT_RE = re.compile(r"[0-9]")
+_STEM_LENGTH = 4
+
+
+def tokens(text: str) -> List[str]:
+    """Metni Türkçe'ye uygun küçük harfe çevirip ASCII'ye katlar ve kelimelere ayırır."""
+    text = text.replace("İ", "i").replace("I", "ı").lower().translate(_TURKISH_FOLD)
+    return _TOKEN_RE.findall(text)
+
+
+def stems(text: str) -> Iterable[str]:
+    """Kelimeleri ilk 4 harfe indirger (Türkçe ekleri kabaca atmak için)."""
+    return (token[:_STEM_LENGTH] for token in tokens(text))
+
+
+_STOP_STEMS = {stem for word in STOP_WORDS for stem in stems(word)}
+_GENERIC_STEMS = {stem for word in GENERIC_WORDS for stem in stems(word)}
+
+
+def is_action_request(text: str) -> bool:
+    """Sorgu bir bilgi okumak yerine işlem yapılmasını mı istiyor (hesap aç, limit artır, borç öde...)?"""
+    words = tokens(text)
+    for index, word in enumerate(words):
+        if word in ACTION_WORDS or word.startswith(ACTION_PREFIXES):
+            return True
+        if word.startswith(("istiyor", "isterim")) and index > 0:
+            previous = words[index - 1]
+            if previous.endswith(("mak", "mek")) and previous not in LOOKUP_INFINITIVES:
+                return True
+    return False
+
+
+def content_stems(text: str) -> List[str]:
+    """
+    Niyet taşıyan kelime köklerinin sıralı listesi (aynı soruyu farklı yazışlar aynı sonucu verir).
+    Rakam içeren kelimeler (tutar, hesap/kart numarası) kısaltılmaz: "5000" ile "50000" ayrı kalır.
+    """
+    keys = set()
+    for token in tokens(text):
+        key = token if _DIGIT_RE.search(token) else token[:_STEM_LENGTH]
+        if key not in _STOP_STEMS:
+            keys.add(key)
+    return sorted(keys)
+
+
+class IntentRouter:
+    """
+    Supervisor LLM çağrısından önce çalışan, kelime puanlamasına dayalı yerel niyet sınıflandırıcı.
+    Yalnızca tek bir agent'a ait kelimeler puan kazanır; emin olunamayan sorgular ve işlem
+    talepleri (bkz. is_action_request) None döner ve Supervisor_Agent'a bırakılır.
+    """
+
+    def __init__(self, examples: Dict[str, Iterable[str]], min_score: int = ROUTER_MIN_SCORE,
+                 margin: int = ROUTER_MARGIN):
+        self.min_score = min_score
+        self.margin = margin
+        owners = defaultdict(set)
+        for agent, phrases in examples.items():
+            for phrase in phrases:
+                for stem in stems(phrase):
+                    if stem not in _STOP_STEMS and stem not in _GENERIC_STEMS:
+                        owners[stem].add(agent)
+        # Birden fazla agent'ta geçen kelimeler ayırt edici değildir
+        self.vocabulary = {stem: next(iter(agents)) for stem, agents in owners.items() if len(agents) == 1}
+        self.agents = list(examples)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+        self.hits_by_agent = defaultdict(int)
+        self.total_latency = 0.0
+
+    @classmethod
+    def from_supervisor_prompt(cls, prompt: str, **kwargs) -> "IntentRouter":
+        """Supervisor prompt'undaki `→` satırlarından agent başına örnek ifadeleri çıkarır."""
+        examples = defaultdict(list)
+        agent = None
+        for line in prompt.splitlines():
+            header = re.search(r"\((\w+_Agent)\)", line)
+            if header:
+                agent = header.group(1)
+            elif line.strip() == "---":
+                agent = None
+            elif agent and "→" in line:
+                label, phrases = line.split("→", 1)
+                examples[agent].append(label.strip(" -*"))
+                examples[agent].extend(re.findall(r'"([^"]+)"', phrases))
+        examples["Professional_Response_Agent"].extend(PROFESSIONAL_EXAMPLES)
+        return cls(examples, **kwargs)
+
+    def _ranked(self, text: str):
+        scores = dict.fromkeys(self.agents, 0)
+        for stem in set(stems(text)):
+            agent = self.vocabulary.get(stem)
+            if agent:
+                scores[agent] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_agent, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        return best_agent, best, runner_up
+
+    def predict(self, text: str) -> Optional[str]:
+        """classify ile aynı karar, istatistiklere yazmadan (ör. önbellek anahtarı için)."""
+        if is_action_request(text):
+            return None
+        best_agent, best, runner_up = self._ranked(text)
+        return best_agent if best >= self.min_score and best - runner_up >= self.margin else None
+
+    def best_guess(self, text: str) -> Optional[str]:
+        """Eşik ve fark şartı aranmadan en yüksek puanlı agent (eşitlikte None); spekülatif çalıştırma için."""
+        best_agent, best, runner_up = self._ranked(text)
+        return best_agent if best > runner_up else None
+
+    def classify(self, text: str) -> Optional[str]:
+        """Emin olunan agent adını, aksi halde None döndürür."""
+        start = time.perf_counter()
+        result = self.predict(text)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.calls += 1
+            self.total_latency += elapsed
+            if result:
+                self.hits += 1
+                self.hits_by_agent[result] += 1
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hits": self.hits,
+                "fallbacks": self.calls - self.hits,
+                "hit_rate": self.hits / self.calls if self.calls else 0.0,
+                "hits_by_agent": dict(self.hits_by_agent),
+                "avg_latency_ms": 1000 * self.total_latency / self.calls if self.calls else 0.0,
+            }
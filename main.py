@@ -1,34 +1,140 @@
 import sys
 import asyncio
-import base64
-from langchain_core.messages import HumanMessage
-from graph import build_app
-from tools import is_valid_customer, transcribe_audio, generate_speech_base64
+import openai
+from typing import AsyncIterator
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from graph import INTENT_ROUTER, MEMBERS, build_app
+from metrics import instrument_config
+from prompts import customer_message
+from response_cache import RESPONSE_CACHE_ENABLED, response_cache
+from tools import is_valid_customer, synthesize_speech
+
+# Sağlayıcı veya yerel istek sınırı aşıldığında kullanıcıya gösterilen mesaj
+BUSY_MESSAGE = "⚠️ Sistem şu anda yoğun, lütfen birkaç saniye sonra tekrar deneyin."
+
+def session_config(customer_id: str, channel: str) -> dict:
+    """
+    Müşteri + kanal başına tek konuşma thread'i. checkpoint_id verilmez; böylece her turda
+    thread'in son checkpoint'i (konuşma geçmişi) yüklenir.
+    """
+    return {"configurable": {"thread_id": f"{channel}_{customer_id}"}}
+
+def cache_agent(query: str):
+    """Cevap önbelleği anahtarındaki agent: yerel router'ın bu sorgu için seçeceği agent."""
+    return INTENT_ROUTER.predict(query) if RESPONSE_CACHE_ENABLED else None
+
+async def record_cached_turn(app, config: dict, message: str, response: str, agent: str) -> None:
+    """Önbellekten dönen cevabı, graph çalışmış gibi konuşma geçmişine ekler."""
+    try:
+        await app.aupdate_state(config, {
+            "messages": [HumanMessage(content=message), AIMessage(content=response, name=agent)]
+        }, as_node=agent)
+    except Exception as e:
+        print(f"⚠️ Önbellek cevabı geçmişe yazılamadı: {e}")
 
 async def run_chatbot(app, query: str, customer_id: str, config: dict) -> str:
     """
     LangGraph üzerinden AI yanıtı alır. Mesajlardan temiz içerik döner.
+    Aynı müşterinin verisi değişmeden tekrar sorulan sorular önbellekten cevaplanır.
     """
     if not is_valid_customer(customer_id):
         return f"❌ Müşteri ID '{customer_id}' geçerli değil. Lütfen doğru ID giriniz."
 
-    query = f"Müşteri ID: {customer_id}\n{query}"
-    inputs = {"messages": [HumanMessage(content=query)]}
-    result = ""
-
     try:
-        async for chunk in app.astream(inputs, config, stream_mode="values"):
-            response = chunk["messages"][-1].content
-            # Bot prefix veya tekrar input gönderimini filtrele
-            if response.startswith("Bot:") or response.startswith(f"Müşteri ID: {customer_id}") or response == query:
+        return await answer_query(app, query, customer_id, config)
+    except openai.RateLimitError as e:
+        print(f"⚠️ OpenAI istek sınırı: {e}")
+        return BUSY_MESSAGE
+    except Exception as e:
+        print(f"⚠️ Chatbot işlem hatası: {e}")
+        return "⚠️ Bot cevabı alınamadı."
+
+async def answer_query(app, query: str, customer_id: str, config: dict, use_cache: bool = True) -> str:
+    """
+    run_chatbot'un hata yakalamayan hali: geçici OpenAI hataları çağırana (ör. toplu işlemdeki tekrar denemeye) iletilir.
+    use_cache=False: cevap önbelleği ne okunur ne yazılır (toplu/regresyon çalıştırmaları her zaman modeli çağırır).
+    """
+    parts = [delta async for delta in stream_answer(app, query, customer_id, config, tokens=False, use_cache=use_cache)]
+    return "".join(parts).strip()
+
+def stream_chatbot(app, query: str, customer_id: str, config: dict) -> AsyncIterator[str]:
+    """AI yanıtını üretildikçe token token döndürür (sesli akış ve CLI için)."""
+    return stream_answer(app, query, customer_id, config, tokens=True)
+
+async def stream_answer(app, query: str, customer_id: str, config: dict, tokens: bool = True,
+                        use_cache: bool = True) -> AsyncIterator[str]:
+    """
+    Cevabı metin parçaları halinde döndüren ortak akış. Yalnızca cevap veren agent node'larının
+    (MEMBERS) mesajları dinlenir; Supervisor çıktısı ve konuşma geçmişi hiç taranmaz.
+    tokens=True: LLM token'ları geldikçe ("messages" modu);
+    tokens=False: her agent cevabı tek parça ("updates" modu, token başına ek iş yok).
+    Tam cevap yalnızca sonunda, önbellek için bir kez birleştirilir; use_cache=False ise önbellek atlanır.
+    """
+    agent = cache_agent(query) if use_cache else None
+    cached = response_cache.get(customer_id, query, agent) if agent else None
+    if cached is not None:
+        await record_cached_turn(app, config, customer_message(customer_id, query), cached, agent)
+        yield cached
+        return
+
+    inputs = {"messages": [HumanMessage(content=customer_message(customer_id, query))]}
+    config = instrument_config(config)
+    parts = []
+    deltas = _token_deltas(app, inputs, config) if tokens else _agent_answers(app, inputs, config)
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+
+    if agent:
+        response_cache.put(customer_id, query, agent, "".join(parts).strip())
+
+def _is_answer(node: str, message) -> bool:
+    """Agent node'larının cevabı ya da Supervisor'ın onayladığı spekülatif agent cevabı (adı agent'ın adıdır)."""
+    if not isinstance(message, AIMessage) or not isinstance(message.content, str):
+        return False
+    return node in MEMBERS or (message.name in MEMBERS and not isinstance(message, AIMessageChunk))
+
+async def _agent_answers(app, inputs: dict, config: dict) -> AsyncIterator[str]:
+    """Yalnızca agent node'larının durum güncellemelerini dinler; her cevap tek parça gelir."""
+    async for update in app.astream(inputs, config, stream_mode="updates"):
+        for node, values in update.items():
+            if not values:
                 continue
-            result += response + "\n"
+            for message in values.get("messages", []):
+                if _is_answer(node, message) and message.content:
+                    yield message.content
 
-        return result.strip()
+async def _token_deltas(app, inputs: dict, config: dict) -> AsyncIterator[str]:
+    """Agent node'larının LLM token'larını üretildikçe döndürür."""
+    streamed_nodes = set()
+    async for message, metadata in app.astream(inputs, config, stream_mode="messages"):
+        node = metadata.get("langgraph_checkpoint_ns", "").split(":", 1)[0]
+        if not _is_answer(node, message) or message.tool_calls or not message.content:
+            continue
+        if isinstance(message, AIMessageChunk):
+            streamed_nodes.add(node)
+            yield message.content
+        elif node not in streamed_nodes:
+            # LLM token'ı üretmeyen cevaplar (doğrudan cevaplar, hata mesajları) tek parça gelir
+            yield message.content
 
+async def print_answer(app, query: str, customer_id: str, config: dict) -> str:
+    """CLI: cevabı geldikçe terminale yazar ve tam cevabı döndürür."""
+    parts = []
+    try:
+        async for delta in stream_chatbot(app, query, customer_id, config):
+            parts.append(delta)
+            print(delta, end="", flush=True)
+    except openai.RateLimitError as e:
+        print(f"⚠️ OpenAI istek sınırı: {e}")
+        parts = [BUSY_MESSAGE]
+        print(BUSY_MESSAGE, end="")
     except Exception as e:
         print(f"⚠️ Chatbot işlem hatası: {e}")
-        return "⚠️ Bot cevabı alınamadı."
+        parts = ["⚠️ Bot cevabı alınamadı."]
+        print(parts[0], end="")
+    print()
+    return "".join(parts).strip()
 
 async def interactive_mode(app):
     """
@@ -45,13 +151,7 @@ async def interactive_mode(app):
 
     print(f"\n✅ '{customer_id}' ile giriş yapıldı.\n")
 
-    config = {
-        "configurable": {
-            "thread_id": customer_id,
-            "checkpoint_ns": "banking_session",
-            "checkpoint_id": f"session_{customer_id}"
-        }
-    }
+    config = session_config(customer_id, "session")
 
     while True:
         query = input("\n📝 Sormak istediğiniz şey: ").strip()
@@ -59,16 +159,19 @@ async def interactive_mode(app):
             print("👋 Görüşmek üzere!")
             break
 
-        print("🔄 İşleniyor...")
-        response = await run_chatbot(app, query, customer_id, config)
-        print(f"\n🤖 AI Yanıtı:\n{response}")
+        print("\n🤖 AI Yanıtı:")
+        response = await print_answer(app, query, customer_id, config)
 
-        # ✅ Text-to-Speech
-        audio_base64 = await generate_speech_base64(response)
-        if audio_base64:
-            audio_path = "response_audio.wav"
+        # ✅ Text-to-Speech (ham ses byte'ları, base64 dönüşümü olmadan)
+        try:
+            audio_bytes = await synthesize_speech(response)
+        except Exception as e:
+            print(f"🔊 Ses üretim hatası: {e}")
+            audio_bytes = b""
+        if audio_bytes:
+            audio_path = "response_audio.mp3"
             with open(audio_path, "wb") as f:
-                f.write(base64.b64decode(audio_base64))
+                f.write(audio_bytes)
             print(f"🔊 Yanıt ses dosyası: {audio_path}")
 
             try:
@@ -77,21 +180,21 @@ async def interactive_mode(app):
                 print(f"⚠️ Ses çalınamadı: {e}")
 
 async def main():
+    if sys.argv[1:2] == ["--batch"]:
+        from batch import batch_main  # Toplu mod: python main.py --batch girdi.jsonl [-o çıktı.jsonl] [-c 16]
+        sys.exit(await batch_main(sys.argv[2:]))
+
     app = build_app()
     if len(sys.argv) < 2:
         await interactive_mode(app)
     else:
         customer_id = input("Müşteri ID: ").strip()
         query = " ".join(sys.argv[1:])
-        config = {
-            "configurable": {
-                "thread_id": customer_id,
-                "checkpoint_ns": "banking_session",
-                "checkpoint_id": f"session_{customer_id}"
-            }
-        }
-        response = await run_chatbot(app, query, customer_id, config)
-        print(response)
+        config = session_config(customer_id, "session")
+        if not is_valid_customer(customer_id):
+            print(f"❌ Müşteri ID '{customer_id}' geçerli değil. Lütfen doğru ID giriniz.")
+            return
+        await print_answer(app, query, customer_id, config)
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,256 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# ✅ Ölçüm ayarları: kapalıyken callback eklenmez, zamanlayıcılar hiçbir şey yapmaz
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PREFIX = "voicebot_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bitiş olayı hiç gelmeyen (iptal edilen) çalışmalar için üst sınır
+MAX_OPEN_RUNS = 10000
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Aktif isteğin iz (span) listesi; RequestContext tarafından açılır
+_current_trace: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar("trace", default=None)
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    Prometheus metin formatında dışa aktarılan sayaç ve histogramlar.
+    Harici bağımlılık olmadan, süreç içi ve thread-safe tutulur.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # [bucket sayaçları..., toplam süre, gözlem sayısı]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    state[index] += 1
+            state[-2] += seconds
+            state[-1] += 1
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        """/metrics okunurken çağrılan, anlık değer (gauge) üreten fonksiyon ekler."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{METRICS_PREFIX}{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+                for labels, state in series.items():
+                    for bound, count in zip(self.buckets, state):
+                        le = f'le="{bound}"'
+                        lines.append(f"{METRICS_PREFIX}{name}_bucket{_format_labels(labels, le)} {count}")
+                    le = 'le="+Inf"'
+                    lines.append(f"{METRICS_PREFIX}{name}_bucket{_format_labels(labels, le)} {state[-1]}")
+                    lines.append(f"{METRICS_PREFIX}{name}_sum{_format_labels(labels)} {state[-2]}")
+                    lines.append(f"{METRICS_PREFIX}{name}_count{_format_labels(labels)} {state[-1]}")
+        for collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                print(f"⚠️ Metrik toplanamadı: {e}")
+                continue
+            for name, value in values.items():
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} gauge")
+                lines.append(f"{METRICS_PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def start_trace() -> List[dict]:
+    """Geçerli istek için yeni bir iz listesi açar; aynı bağlamdaki tüm ölçümler buraya eklenir."""
+    spans: List[dict] = []
+    _current_trace.set(spans)
+    return spans
+
+
+def record_span(kind: str, name: str, seconds: float, **fields) -> None:
+    spans = _current_trace.get()
+    if spans is not None:
+        spans.append({"kind": kind, "name": name, "seconds": round(seconds, 4), **fields})
+
+
+@contextmanager
+def timer(metric: str, **labels) -> Iterator[None]:
+    """Bir kod bloğunun süresini `<metric>_seconds` histogramına, hatalarını `<metric>_errors_total` sayacına yazar."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc(f"{metric}_errors_total", **labels)
+        raise
+    finally:
+        observe_duration(metric, time.perf_counter() - start, **labels)
+
+
+def observe_duration(metric: str, elapsed: float, **labels) -> None:
+    """Elle ölçülmüş bir süreyi timer ile aynı histogram ve span kaydına yazar (ör. akışlarda yalnızca bekleme süresi)."""
+    if not METRICS_ENABLED:
+        return
+    registry.observe(f"{metric}_seconds", elapsed, **labels)
+    record_span(metric, ",".join(str(value) for value in labels.values()), elapsed)
+
+
+def _node_of(metadata: Optional[dict]) -> str:
+    """Alt graph'lar dahil, çağrının ait olduğu üst seviye graph node'unun adı."""
+    return ((metadata or {}).get("langgraph_checkpoint_ns") or "").split("|", 1)[0].split(":", 1)[0]
+
+
+class _Run:
+    __slots__ = ("kind", "name", "start", "labels", "first_token")
+
+    def __init__(self, kind: str, name: str, labels: Dict[str, str]):
+        self.kind = kind
+        self.name = name
+        self.start = time.perf_counter()
+        self.labels = labels
+        self.first_token = False
+
+
+class GraphMetricsHandler(BaseCallbackHandler):
+    """
+    LangGraph çalışmasını izleyen callback: üst seviye node süreleri, tool süreleri/hataları,
+    LLM çağrı süreleri, ilk token gecikmesi ve token kullanımı.
+    """
+
+    run_inline = True  # Olaylar executor'a gönderilmeden event loop içinde işlenir
+
+    def __init__(self):
+        self._runs: Dict[UUID, _Run] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, **labels) -> None:
+        if len(self._runs) >= MAX_OPEN_RUNS:
+            self._runs.pop(next(iter(self._runs)))
+        self._runs[run_id] = _Run(kind, name, labels)
+
+    def _end(self, run_id: UUID, error: bool = False) -> Optional[_Run]:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        elapsed = time.perf_counter() - run.start
+        registry.observe(f"{run.kind}_seconds", elapsed, **run.labels)
+        if error:
+            registry.inc(f"{run.kind}_errors_total", **run.labels)
+        record_span(run.kind, run.name, elapsed, **({"error": True} if error else {}))
+        return run
+
+    # Graph node'ları: yalnızca üst seviye (alt graph olmayan) node çalışmaları ölçülür
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        if node and node == name and not node.startswith("__") \
+                and "|" not in metadata.get("langgraph_checkpoint_ns", ""):
+            self._start(run_id, "graph_node", node, node=node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, name=None, **kwargs) -> None:
+        tool_name = name or (serialized or {}).get("name", "tool")
+        self._start(run_id, "tool", tool_name, tool=tool_name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None,
+                            **kwargs) -> None:
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or "unknown"
+        node = _node_of(metadata)
+        self._start(run_id, "llm", node, node=node, model=model)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and not run.first_token:
+            run.first_token = True
+            registry.observe("llm_first_token_seconds", time.perf_counter() - run.start, **run.labels)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        run = self._end(run_id)
+        if run is None:
+            return
+        prompt_tokens, completion_tokens = token_usage(response)
+        if prompt_tokens:
+            registry.inc("llm_tokens_total", prompt_tokens, type="prompt", **run.labels)
+        if completion_tokens:
+            registry.inc("llm_tokens_total", completion_tokens, type="completion", **run.labels)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+
+def token_usage(response: LLMResult) -> Tuple[int, int]:
+    """Token kullanımını streaming (usage_metadata) ve normal (llm_output) cevaplardan okur."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+graph_metrics_handler = GraphMetricsHandler()
+
+
+def instrument_config(config: dict) -> dict:
+    """Graph çağrısının config'ine ölçüm callback'ini ekler (ölçüm kapalıysa config aynen döner)."""
+    if not METRICS_ENABLED:
+        return config
+    callbacks = list(config.get("callbacks") or [])
+    callbacks.append(graph_metrics_handler)
+    return {**config, "callbacks": callbacks}
@@ -0,0 +1,307 @@
+"""
+Paylaşılan OpenAI istemcileri.
+
+Tüm OpenAI trafiği (LangChain ChatOpenAI, STT, TTS) tek bir httpx bağlantı havuzu ve onun
+önündeki `RateLimitedTransport` üzerinden geçer. Transport her isteği türüne göre
+(chat / stt / tts) sınıflandırır ve:
+
+- tür başına token bucket ile RPM (chat için ayrıca tahmini TPM) sınırına uyar,
+- tür başına eşzamanlı istek sayısını sınırlar,
+- sıra çok uzunsa veya beklenen süre `OPENAI_MAX_QUEUE_WAIT` saniyeyi aşıyorsa isteği
+  sağlayıcıya hiç göndermeden hemen 429 ile reddeder (fast-fail),
+- sağlayıcıdan 429 gelince aynı türdeki tüm istekleri Retry-After (yoksa jitter'lı üstel)
+  süre kadar bekletir.
+
+SDK'nın kendi tekrar denemeleri (üstel bekleme + jitter) de bu transport'tan geçer; yani her
+deneme sınırlara tabidir. İstatistikler: `limiter_stats()` ve /stats/openai.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+
+from metrics import METRICS_ENABLED, registry
+
+# ✅ Bağlantı havuzu ve tekrar deneme ayarları
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# ✅ Kabul kontrolü: tür başına bekleyen istek sınırı ve en fazla bekleme süresi
+OPENAI_MAX_QUEUE = int(os.getenv("OPENAI_MAX_QUEUE", "200"))
+OPENAI_MAX_QUEUE_WAIT = float(os.getenv("OPENAI_MAX_QUEUE_WAIT", "10"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "1.0"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "30"))
+
+# ✅ Sınırlar süreç içinde tutulur: birden fazla worker (WEB_CONCURRENCY) aynı hesabı paylaştığında
+# her worker RPM/TPM bütçesinin yalnızca bu payını kullanır (varsayılan 1 / worker sayısı)
+OPENAI_LIMIT_SHARE = float(os.getenv(
+    "OPENAI_LIMIT_SHARE", str(1 / max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))
+))
+
+
+def _budget(name: str, default: str) -> float:
+    """Hesap genelindeki RPM/TPM sınırının bu sürece düşen payı."""
+    return float(os.getenv(name, default)) * OPENAI_LIMIT_SHARE
+
+
+# ✅ Tür başına sağlayıcı sınırları (0 = sınırsız); hesabın OpenAI limitlerine göre ayarlanmalı
+LIMITS = {
+    "chat": {
+        "rpm": _budget("OPENAI_CHAT_RPM", "5000"),
+        "tpm": _budget("OPENAI_CHAT_TPM", "2000000"),
+        "concurrency": int(os.getenv("OPENAI_CHAT_CONCURRENCY", "64")),
+    },
+    "stt": {
+        "rpm": _budget("OPENAI_STT_RPM", "500"),
+        "tpm": 0,
+        "concurrency": int(os.getenv("OPENAI_STT_CONCURRENCY", "16")),
+    },
+    "tts": {
+        "rpm": _budget("OPENAI_TTS_RPM", "500"),
+        "tpm": 0,
+        "concurrency": int(os.getenv("OPENAI_TTS_CONCURRENCY", "32")),
+    },
+    "other": {"rpm": 0, "tpm": 0, "concurrency": 16},
+}
+# Cevap uzunluğu bilinmediğinde chat isteği başına ayrılan çıktı token'ı
+CHAT_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("CHAT_COMPLETION_TOKEN_ESTIMATE", "300"))
+
+
+def request_kind(path: str) -> str:
+    if path.endswith("/chat/completions"):
+        return "chat"
+    if path.endswith("/audio/transcriptions"):
+        return "stt"
+    if path.endswith("/audio/speech"):
+        return "tts"
+    return "other"
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    """Chat isteğinin TPM bütçesinden düşülecek tahmini token sayısı (girdi ~4 bayt/token + çıktı)."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return CHAT_COMPLETION_TOKEN_ESTIMATE
+    completion = body.get("max_completion_tokens") or body.get("max_tokens") or CHAT_COMPLETION_TOKEN_ESTIMATE
+    return len(request.content) // 4 + int(completion)
+
+
+class TokenBucket:
+    """
+    Dakikalık kapasiteli token bucket. `reserve` token'ı hemen düşer (bakiye eksiye inebilir)
+    ve isteğin ne kadar beklemesi gerektiğini döndürür; böylece sıradaki istekler sırayla yayılır.
+    Asyncio tek thread'de çalıştığı için kilit gerekmez.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= min(cost, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, cost: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+
+class KindLimiter:
+    """Bir istek türü (chat / stt / tts) için RPM/TPM bucket'ları, eşzamanlılık sınırı ve istatistikler."""
+
+    def __init__(self, kind: str, rpm: float, tpm: float, concurrency: int):
+        self.kind = kind
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self.paused_until = 0.0
+        self.consecutive_429 = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+
+    def reject_reason(self, wait: float) -> Optional[str]:
+        if self.queued >= OPENAI_MAX_QUEUE:
+            return "queue_full"
+        if wait > OPENAI_MAX_QUEUE_WAIT:
+            return "wait_too_long"
+        return None
+
+    async def acquire(self, cost: int) -> Optional[str]:
+        """İsteğe izin verir (gerekirse bekleterek) veya ret nedenini döndürür."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(cost), self.paused_until - time.monotonic())
+        reason = self.reject_reason(wait)
+        if reason is not None:
+            self.requests.refund(1)
+            self.tokens.refund(cost)
+            self.rejected += 1
+            if METRICS_ENABLED:
+                registry.inc("openai_admission_rejected_total", kind=self.kind, reason=reason)
+            return reason
+
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        waited = time.monotonic() - started
+        self.wait_total += waited
+        self.admitted += 1
+        self.in_flight += 1
+        if METRICS_ENABLED:
+            registry.observe("openai_queue_wait_seconds", waited, kind=self.kind)
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def on_response(self, response: httpx.Response) -> None:
+        """Sağlayıcı 429 döndürdüyse bu türdeki tüm istekler bir süre bekletilir."""
+        if response.status_code != 429:
+            self.consecutive_429 = 0
+            return
+        self.consecutive_429 += 1
+        self.throttled += 1
+        try:
+            pause = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            pause = OPENAI_BACKOFF_BASE * 2 ** (self.consecutive_429 - 1) * random.uniform(0.5, 1.0)
+        self.paused_until = max(self.paused_until, time.monotonic() + min(pause, OPENAI_BACKOFF_MAX))
+        if METRICS_ENABLED:
+            registry.inc("openai_throttled_total", kind=self.kind)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "concurrency": self.concurrency,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttled_429": self.throttled,
+            "avg_queue_wait": self.wait_total / self.admitted if self.admitted else 0.0,
+            "paused_for": max(0.0, self.paused_until - time.monotonic()),
+            "rpm_available": self.requests.tokens if self.requests.rate > 0 else -1,
+            "tpm_available": self.tokens.tokens if self.tokens.rate > 0 else -1,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Akış (streaming) cevaplarında eşzamanlılık slotu gövde tamamen okunup kapanınca bırakılır."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Tür bazlı sınırları uygulayan, gerçek isteği paylaşılan havuzlu transport'a ileten katman."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limits: Dict[str, dict] = LIMITS):
+        self._transport = transport
+        self.limiters = {kind: KindLimiter(kind, **config) for kind, config in limits.items()}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiters[request_kind(request.url.path)]
+        cost = estimate_tokens(request) if limiter.kind == "chat" else 1
+        reason = await limiter.acquire(cost)
+        if reason is not None:
+            # SDK bunu tekrar denemeden RateLimitError olarak yükseltir
+            return httpx.Response(
+                429,
+                headers={"x-should-retry": "false", "retry-after": str(OPENAI_MAX_QUEUE_WAIT)},
+                json={"error": {"message": f"Yerel istek sınırı aşıldı ({reason}).", "type": "local_rate_limit",
+                                "code": reason}},
+                request=request,
+            )
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                limiter.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        limiter.on_response(response)
+        if response.is_closed:
+            release()  # Gövdesi önceden okunmuş cevap (akış yok)
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_transport = RateLimitedTransport(httpx.AsyncHTTPTransport(
+    limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE),
+))
+# Tüm OpenAI istemcileri bu tek havuzu paylaşır
+http_client = httpx.AsyncClient(
+    transport=_transport,
+    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+)
+
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def get_async_client() -> AsyncOpenAI:
+    """STT/TTS için süreç genelinde paylaşılan AsyncOpenAI istemcisi."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(http_client=http_client, max_retries=OPENAI_MAX_RETRIES, timeout=OPENAI_TIMEOUT)
+    return _async_client
+
+
+def chat_model(model: str = "gpt-4o-mini", **kwargs) -> ChatOpenAI:
+    """Paylaşılan havuzu ve sınırlayıcıyı kullanan ChatOpenAI."""
+    kwargs.setdefault("max_retries", OPENAI_MAX_RETRIES)
+    kwargs.setdefault("timeout", OPENAI_TIMEOUT)
+    return ChatOpenAI(model=model, http_async_client=http_client, **kwargs)
+
+
+def limiter_stats() -> Dict[str, Dict[str, float]]:
+    return {kind: limiter.stats() for kind, limiter in _transport.limiters.items()}
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Dict, Optional
+
+from fastapi import Request
+
+from metrics import METRICS_ENABLED, registry, start_trace
+
+# ✅ İstek genel süresi ve aşama bazlı zaman aşımları (saniye)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+STAGE_TIMEOUTS = {
+    "stt": float(os.getenv("STT_TIMEOUT_SECONDS", "15")),
+    "llm": float(os.getenv("LLM_TIMEOUT_SECONDS", "25")),
+    "tts": float(os.getenv("TTS_TIMEOUT_SECONDS", "15")),
+    "answer": float(os.getenv("ANSWER_TIMEOUT_SECONDS", "30")),
+}
+LOG_REQUEST_TIMINGS = os.getenv("LOG_REQUEST_TIMINGS", "0") == "1"
+
+# Son isteklerin aşama süreleri (/stats/requests için)
+RECENT_REQUESTS: deque = deque(maxlen=500)
+
+
+class ClientDisconnected(Exception):
+    """İstemci, işlem tamamlanmadan bağlantıyı kapattı."""
+
+
+class RequestContext:
+    """
+    Tek bir isteğin (HTTP veya sesli tur) genel süre sınırını ve aşama sürelerini tutar.
+    Her aşama, kendi zaman aşımı ile isteğin kalan süresinden küçük olanıyla sınırlandırılır.
+    """
+
+    def __init__(self, kind: str, deadline: float = REQUEST_DEADLINE):
+        self.kind = kind
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline
+        self.timings: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+        self.status = "ok"
+        # İz kaydı yalnızca loglama açıkken tutulur; aynı bağlamdaki node/tool/LLM ölçümleri buraya düşer
+        self.spans = start_trace() if LOG_REQUEST_TIMINGS else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def mark(self, name: str) -> None:
+        """İsteğin başından itibaren geçen süreyi bir kez kaydeder (ör. ilk token, ilk ses)."""
+        self.marks.setdefault(name, time.monotonic() - self.started)
+
+    async def run_stage(self, name: str, awaitable: Awaitable, timeout: Optional[float] = None) -> Any:
+        limit = min(timeout or STAGE_TIMEOUTS.get(name, REQUEST_DEADLINE), self.remaining())
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(awaitable, limit)
+        except asyncio.TimeoutError:
+            self.status = f"timeout:{name}"
+            raise
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            if METRICS_ENABLED:
+                registry.observe("request_stage_seconds", elapsed, kind=self.kind, stage=name)
+
+    def finish(self) -> Dict[str, Any]:
+        summary = {
+            "request_id": self.request_id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": time.monotonic() - self.started,
+            "stages": self.timings,
+            "marks": self.marks,
+        }
+        RECENT_REQUESTS.append(summary)
+        if METRICS_ENABLED:
+            registry.inc("requests_total", kind=self.kind, status=self.status.split(":", 1)[0])
+            registry.observe("request_seconds", summary["total"], kind=self.kind)
+        if LOG_REQUEST_TIMINGS:
+            print(json.dumps({**summary, "spans": self.spans}, ensure_ascii=False))
+        return summary
+
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable) -> Any:
+    """
+    İşi çalıştırırken HTTP bağlantısını izler; istemci koparsa devam eden
+    OpenAI çağrıları dahil tüm iş iptal edilir ve ClientDisconnected fırlatılır.
+    """
+    work = asyncio.ensure_future(awaitable)
+
+    async def watch():
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    watcher = asyncio.create_task(watch())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not work.done():
+            work.cancel()
+            try:
+                await work
+            except asyncio.CancelledError:
+                pass
+            raise ClientDisconnected()
+        return work.result()
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+
+
+def request_stats() -> Dict[str, Any]:
+    """Son isteklerin aşama bazlı ortalama ve medyan süreleri."""
+    stages: Dict[str, list] = {}
+    statuses: Dict[str, int] = {}
+    for summary in RECENT_REQUESTS:
+        statuses[summary["status"]] = statuses.get(summary["status"], 0) + 1
+        for name, value in {**summary["stages"], **summary["marks"], "total": summary["total"]}.items():
+            stages.setdefault(name, []).append(value)
+    return {
+        "requests": len(RECENT_REQUESTS),
+        "statuses": statuses,
+        "stages": {
+            name: {"avg": statistics.fmean(values), "p50": statistics.median(values), "max": max(values)}
+            for name, values in stages.items()
+        },
+    }
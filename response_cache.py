@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from data_store import get_store
+from intent_router import content_stems
+
+# ✅ Cevap önbelleği ayarları
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# Yalnızca cevabı müşteri verisinden türeyen agent'lar önbelleğe alınır
+# (çıkış / canlı destek akışı konuşmanın durumuna bağlıdır)
+RESPONSE_CACHE_AGENTS = tuple(
+    agent.strip() for agent in os.getenv("RESPONSE_CACHE_AGENTS", "Credit_Card_Agent,Account_Agent").split(",")
+)
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class ResponseCache:
+    """
+    Müşteri başına cevap önbelleği. Anahtar: müşteri ID + normalize edilmiş sorgu (niyet kökleri)
+    + yönlendirilen agent + müşteri kaydının sürüm hash'i. Müşterinin kart/hesap verisi değişince
+    sürüm değişir ve eski cevaplar bir daha eşleşmez (LRU/TTL ile zamanla silinir).
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 agents: Tuple[str, ...] = RESPONSE_CACHE_AGENTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.agents = agents
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+
+    def key(self, customer_id: str, query: str, agent: Optional[str]) -> Optional[CacheKey]:
+        if agent not in self.agents:
+            return None
+        normalized = " ".join(content_stems(query))
+        version = get_store().customer_version(customer_id)
+        if not normalized or version is None:
+            return None
+        return customer_id, normalized, agent, version
+
+    def get(self, customer_id: str, query: str, agent: Optional[str]) -> Optional[str]:
+        key = self.key(customer_id, query, agent)
+        with self._lock:
+            if key is None:
+                self.skipped += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() - self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, customer_id: str, query: str, agent: Optional[str], response: str) -> None:
+        if not response or response.startswith(("⚠️", "❌", "An error occurred")):
+            return  # Hata cevapları önbelleğe alınmaz
+        key = self.key(customer_id, query, agent)
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "stores": self.stores,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+response_cache = ResponseCache()
@@ -7,8 +7,30 @@ const audioPlayer = document.getElementById("audio-player");
 
 const backendHost = "https://banking-chatbot-k0qe.onrender.com";
 let mediaRecorder;
-let audioChunks = [];
 let socket;
+let stopRecording = null;
+
+// 🎙️ Ses, konuşma sürerken 16 kHz PCM olarak akıtılır; sunucu sessizliklerde bölüp eşzamanlı yazıya döker
+const PCM_SAMPLE_RATE = 16000;
+const PCM_FRAME_MS = 100;
+const MAX_RECORDING_MS = 30000;
+const pcmWorkletSource = `
+class PcmCapture extends AudioWorkletProcessor {
+  process(inputs) {
+    const channel = inputs[0][0];
+    if (channel) {
+      const pcm = new Int16Array(channel.length);
+      for (let i = 0; i < channel.length; i++) {
+        const sample = Math.max(-1, Math.min(1, channel[i]));
+        pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+      }
+      this.port.postMessage(pcm.buffer, [pcm.buffer]);
+    }
+    return true;
+  }
+}
+registerProcessor("pcm-capture", PcmCapture);
+`;
 
 // ✉️ Yazılı mesaj gönderildiğinde
 chatForm.addEventListener("submit", async (e) => {
@@ -26,7 +48,7 @@ chatForm.addEventListener("submit", async (e) => {
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ query, customer_id: customerId }),
+      body: JSON.stringify({ query, customer_id: customerId, audio_mode: "prefetch" }),
     });
 
     const data = await response.json();
@@ -35,9 +57,12 @@ chatForm.addEventListener("submit", async (e) => {
     const botText = data.response || data.text || "⚠️ Yanıt alınamadı.";
     appendMessage("🤖 Bot", botText);
 
-    // Sesli yanıt varsa çal
-    if (data.audio) {
-      const audio = new Audio(`data:audio/wav;base64,${data.audio}`);
+    // Sesli yanıt varsa çal (ses sunucudan binary olarak akıtılır)
+    if (data.audio_url) {
+      const audio = new Audio(`${backendHost}${data.audio_url}`);
+      audio.play();
+    } else if (data.audio) {
+      const audio = new Audio(`data:audio/mpeg;base64,${data.audio}`);
       audio.play();
     }
   } catch (err) {
@@ -46,61 +71,75 @@ chatForm.addEventListener("submit", async (e) => {
   }
 });
 
-// 🎙️ Sesli mesaj gönderme
-recordButton.addEventListener("click", async () => {
-  const customerId = customerIdInput.value.trim();
-  if (!customerId) {
-    alert("Lütfen müşteri ID girin.");
-    return;
+// 🔌 Konuşma boyunca tek bir WebSocket bağlantısı kullanılır
+let socketCustomerId = null;
+let pingTimer = null;
+let botMessageElem = null;
+let partialElem = null;
+let botText = "";
+let sentenceChunks = [];
+
+function openSocket(customerId) {
+  if (socket && socketCustomerId === customerId && socket.readyState === WebSocket.OPEN) {
+    return Promise.resolve(socket);
   }
+  if (socket) socket.close();
 
   socket = new WebSocket(`${backendHost.replace("https", "wss")}/ws?customer_id=${customerId}`);
   socket.binaryType = "arraybuffer";
+  socketCustomerId = customerId;
 
-  socket.onopen = async () => {
-    try {
-      const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-      mediaRecorder = new MediaRecorder(stream);
-      audioChunks = [];
-      mediaRecorder.start();
-
-      mediaRecorder.ondataavailable = (event) => {
-        audioChunks.push(event.data);
-      };
-
-      mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunks, { type: "audio/wav" });
-        socket.send(await audioBlob.arrayBuffer());
-        audioChunks = [];
-      };
-
-      setTimeout(() => mediaRecorder.stop(), 4000);
-    } catch (err) {
-      console.error("🎙️ Mikrofon hatası:", err);
-      appendMessage("🤖 Bot", "🎤 Mikrofon erişimi reddedildi.");
+  socket.onmessage = async (event) => {
+    if (typeof event.data !== "string") {
+      // 🔊 Cümlenin ses parçalarını biriktir
+      sentenceChunks.push(event.data);
+      return;
     }
-  };
 
-socket.onmessage = async (event) => {
-  if (typeof event.data === "string") {
     const data = JSON.parse(event.data);
-    const userText = data.query || data.transcript || null; // 👈 yeni ek
-    const botText = data.response || data.text || "⚠️ Bot cevabı alınamadı.";
-
-    // ✅ Sesli sorguyu kullanıcı mesajı olarak göster
-    if (userText) {
-      appendMessage("🗣️ Siz", userText);
+    switch (data.type) {
+      case "pong":
+      case "cancelled":
+        break;
+      case "partial":
+        // ✅ Konuşma sürerken yazıya dökülen bölümleri göster
+        if (!partialElem) partialElem = appendMessage("🗣️ Siz", "");
+        setMessageText(partialElem, "🗣️ Siz", `${data.query} …`);
+        break;
+      case "transcript":
+        // ✅ Sesli sorguyu kullanıcı mesajı olarak göster
+        if (partialElem) {
+          setMessageText(partialElem, "🗣️ Siz", data.query);
+          partialElem = null;
+        } else {
+          appendMessage("🗣️ Siz", data.query);
+        }
+        break;
+      case "token":
+        // ✅ Bot yanıtını token geldikçe güncelle
+        botText += data.text;
+        if (!botMessageElem) botMessageElem = appendMessage("🤖 Bot", "");
+        setMessageText(botMessageElem, "🤖 Bot", botText);
+        break;
+      case "audio_end":
+        // ✅ Tamamlanan cümleyi oynatma kuyruğuna ekle
+        enqueueAudio(new Blob(sentenceChunks, { type: "audio/mpeg" }));
+        sentenceChunks = [];
+        break;
+      case "done":
+      default: {
+        partialElem = null;
+        const finalText = data.text || data.response || "⚠️ Bot cevabı alınamadı.";
+        if (botMessageElem) {
+          setMessageText(botMessageElem, "🤖 Bot", finalText);
+        } else {
+          appendMessage("🤖 Bot", finalText);
+        }
+        botMessageElem = null;
+        botText = "";
+      }
     }
-
-    appendMessage("🤖 Bot", botText);
-  } else {
-    const audioBlob = new Blob([event.data], { type: "audio/wav" });
-    const audioUrl = URL.createObjectURL(audioBlob);
-    audioPlayer.src = audioUrl;
-    audioPlayer.play();
-  }
-};
-
+  };
 
   socket.onerror = (error) => {
     console.error("WebSocket hatası:", error);
@@ -109,14 +148,188 @@ socket.onmessage = async (event) => {
 
   socket.onclose = () => {
     console.log("🔌 WebSocket bağlantısı kapandı.");
+    clearInterval(pingTimer);
+    socketCustomerId = null;
   };
+
+  return new Promise((resolve, reject) => {
+    socket.onopen = () => {
+      clearInterval(pingTimer);
+      pingTimer = setInterval(() => sendControl("ping"), 25000);
+      resolve(socket);
+    };
+    socket.addEventListener("error", reject, { once: true });
+  });
+}
+
+function sendControl(type) {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify({ type }));
+  }
+}
+
+// 🎙️ Sesli mesaj gönderme: ilk tıklama kaydı başlatır, ikinci tıklama (ya da süre sınırı) bitirir
+recordButton.addEventListener("click", async () => {
+  if (stopRecording) {
+    stopRecording();
+    return;
+  }
+  const customerId = customerIdInput.value.trim();
+  if (!customerId) {
+    alert("Lütfen müşteri ID girin.");
+    return;
+  }
+
+  try {
+    await openSocket(customerId);
+    const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+
+    // Önceki cevap hâlâ işleniyorsa sunucu onu iptal eder
+    stopAudio();
+    sentenceChunks = [];
+    botMessageElem = null;
+    partialElem = null;
+    botText = "";
+
+    const stop = window.AudioWorkletNode ? await streamPcm(stream) : recordBlob(stream);
+    const timer = setTimeout(() => stopRecording && stopRecording(), MAX_RECORDING_MS);
+    stopRecording = () => {
+      clearTimeout(timer);
+      stopRecording = null;
+      stop();
+    };
+  } catch (err) {
+    console.error("🎙️ Mikrofon hatası:", err);
+    appendMessage("🤖 Bot", "🎤 Mikrofon erişimi reddedildi.");
+  }
 });
 
+// Akan mod: AudioWorklet'ten gelen PCM, PCM_FRAME_MS'lik çerçeveler halinde gönderilir
+async function streamPcm(stream) {
+  let context;
+  let source;
+  try {
+    context = new AudioContext({ sampleRate: PCM_SAMPLE_RATE });
+    source = context.createMediaStreamSource(stream);
+  } catch (err) {
+    // Bazı tarayıcılar mikrofonu farklı hızda bir context'e bağlayamaz; sunucu hızı kendisi düşürür
+    if (context) context.close();
+    context = new AudioContext();
+    source = context.createMediaStreamSource(stream);
+  }
+  const moduleUrl = URL.createObjectURL(new Blob([pcmWorkletSource], { type: "application/javascript" }));
+  await context.audioWorklet.addModule(moduleUrl);
+  URL.revokeObjectURL(moduleUrl);
+
+  const capture = new AudioWorkletNode(context, "pcm-capture");
+  const frameSamples = Math.round((context.sampleRate * PCM_FRAME_MS) / 1000);
+  let pending = [];
+  let pendingSamples = 0;
+
+  const flush = () => {
+    if (!pendingSamples) return;
+    const frame = new Int16Array(pendingSamples);
+    let offset = 0;
+    for (const part of pending) {
+      frame.set(part, offset);
+      offset += part.length;
+    }
+    pending = [];
+    pendingSamples = 0;
+    if (socket.readyState === WebSocket.OPEN) socket.send(frame.buffer);
+  };
+
+  capture.port.onmessage = (event) => {
+    const part = new Int16Array(event.data);
+    pending.push(part);
+    pendingSamples += part.length;
+    if (pendingSamples >= frameSamples) flush();
+  };
+
+  socket.send(JSON.stringify({ type: "start", format: "pcm16", sample_rate: context.sampleRate }));
+  source.connect(capture);
+
+  return () => {
+    source.disconnect();
+    capture.port.onmessage = null;
+    flush();
+    sendControl("stop");
+    stream.getTracks().forEach((track) => track.stop());
+    context.close();
+  };
+}
+
+// Yedek mod: AudioWorklet yoksa MediaRecorder kaydı parça parça gönderilir, sunucu tek parça işler
+function recordBlob(stream) {
+  mediaRecorder = new MediaRecorder(stream);
+  sendControl("start");
+
+  // Ses parçaları ve "stop" mesajı sırayla gönderilsin diye tek bir zincir kullanılır
+  let sendChain = Promise.resolve();
+
+  mediaRecorder.ondataavailable = (event) => {
+    if (!event.data.size) return;
+    sendChain = sendChain.then(async () => {
+      const chunk = await event.data.arrayBuffer();
+      if (socket.readyState === WebSocket.OPEN) socket.send(chunk);
+    });
+  };
+
+  mediaRecorder.onstop = () => {
+    sendChain = sendChain.then(() => sendControl("stop"));
+    stream.getTracks().forEach((track) => track.stop());
+  };
+
+  mediaRecorder.start(250);
+  return () => mediaRecorder.stop();
+}
+
 // 💬 Mesaj kutusuna yeni mesaj ekle
 function appendMessage(sender, message) {
   const messageElem = document.createElement("div");
   messageElem.className = "message";
-  messageElem.innerHTML = `<strong>${sender}:</strong> ${message}`;
+  setMessageText(messageElem, sender, message);
   chatBox.appendChild(messageElem);
   chatBox.scrollTop = chatBox.scrollHeight;
+  return messageElem;
+}
+
+function setMessageText(messageElem, sender, message) {
+  messageElem.innerHTML = `<strong>${sender}:</strong> ${message}`;
+  chatBox.scrollTop = chatBox.scrollHeight;
 }
+
+// 🔊 Cümle cümle gelen sesleri sırayla çal
+const audioQueue = [];
+let audioPlaying = false;
+
+function enqueueAudio(blob) {
+  if (!blob.size) return;
+  audioQueue.push(URL.createObjectURL(blob));
+  if (!audioPlaying) playNextAudio();
+}
+
+function playNextAudio() {
+  const nextUrl = audioQueue.shift();
+  if (!nextUrl) {
+    audioPlaying = false;
+    return;
+  }
+  audioPlaying = true;
+  audioPlayer.src = nextUrl;
+  audioPlayer.play().catch((err) => {
+    console.error("🔊 Ses çalınamadı:", err);
+    playNextAudio();
+  });
+}
+
+function stopAudio() {
+  audioQueue.splice(0).forEach((url) => URL.revokeObjectURL(url));
+  audioPlayer.pause();
+  audioPlaying = false;
+}
+
+audioPlayer.addEventListener("ended", () => {
+  URL.revokeObjectURL(audioPlayer.src);
+  playNextAudio();
+});
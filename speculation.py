@@ -0,0 +1,148 @@
+"""
+Spekülatif yönlendirme (varsayılan kapalı, SPECULATIVE_ROUTING=1 ile açılır).
+
+Yerel IntentRouter emin olamadığında tur Supervisor_Agent'a düşer ve normalde iki LLM gecikmesi
+art arda ödenir: önce Supervisor, sonra seçilen agent. Spekülatif modda Supervisor ile en olası
+agent aynı anda başlatılır:
+- Supervisor aynı agent'ı seçerse agent'ın cevabı doğrudan kullanılır (agent node'u atlanır),
+- farklı bir agent seçerse spekülatif çalışma iptal edilir ve seçilen agent normal şekilde çalışır.
+
+Aday agent: yerel sınıflandırıcının eşik altı en iyi tahmini, yoksa thread'de son cevap veren agent.
+Boşa harcanan token'lar ve isabet oranı /stats/speculation ve /metrics üzerinden izlenir.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackManager, BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import patch_config
+
+from metrics import METRICS_ENABLED, registry, token_usage
+from prompts import count_tokens
+
+# ✅ Spekülatif yönlendirme ayarları
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "0") == "1"
+# Spekülasyon yapılabilecek agent'lar (ör. yalnızca veri agent'ları için: "Credit_Card_Agent,Account_Agent")
+SPECULATIVE_AGENTS = tuple(
+    agent.strip() for agent in os.getenv(
+        "SPECULATIVE_AGENTS", "Credit_Card_Agent,Account_Agent,Professional_Response_Agent"
+    ).split(",")
+)
+
+_lock = threading.Lock()
+stats = {"attempts": 0, "hits": 0, "misses": 0, "errors": 0, "wasted_tokens": 0, "saved_seconds": 0.0}
+
+
+class SpeculationUsage(BaseCallbackHandler):
+    """Spekülatif çalışmanın LLM token kullanımını sayar; iptal edilen çağrılar için tahmini değer kullanır."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.tokens = 0
+        self._open: Dict[UUID, list] = {}  # run_id → [tahmini prompt token'ı, akan token sayısı]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        prompt = sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        self._open[run_id] = [prompt, 0]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs) -> None:
+        if run_id in self._open:
+            self._open[run_id][1] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        estimate = self._open.pop(run_id, [0, 0])
+        prompt_tokens, completion_tokens = token_usage(response)
+        self.tokens += (prompt_tokens + completion_tokens) or sum(estimate)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self.tokens += sum(self._open.pop(run_id, [0, 0]))
+
+    @property
+    def total(self) -> int:
+        """Tamamlanan çağrılar + hâlâ açık (iptal edilmiş) çağrıların tahmini."""
+        return self.tokens + sum(sum(estimate) for estimate in self._open.values())
+
+
+def candidate_agent(state, router) -> Optional[str]:
+    """Supervisor ile birlikte başlatılacak agent; uygun aday yoksa None."""
+    guess = router.best_guess(str(state["messages"][-1].content))
+    candidate = guess or state.get("last_agent")
+    return candidate if candidate in SPECULATIVE_AGENTS else None
+
+
+def _record(result: str, agent: str, wasted: int = 0, saved: float = 0.0) -> None:
+    with _lock:
+        stats["attempts"] += 1
+        stats[{"hit": "hits", "miss": "misses", "error": "errors"}[result]] += 1
+        stats["wasted_tokens"] += wasted
+        stats["saved_seconds"] += saved
+    if METRICS_ENABLED:
+        registry.inc("speculation_total", result=result, agent=agent)
+        if wasted:
+            registry.inc("speculation_wasted_tokens_total", wasted, agent=agent)
+        if saved:
+            registry.observe("speculation_saved_seconds", saved)
+
+
+async def speculative_route(state, config, supervisor, run_agent, router, resolve) -> dict:
+    """
+    Supervisor'ı ve aday agent'ı paralel çalıştırır. Dönen güncelleme `speculative_hit` True ise
+    agent cevabını içerir ve graph doğrudan biter; değilse yalnızca `next` döner.
+    `run_agent(state, name, config)` aday agent'ı çalıştırır, `resolve` Supervisor kararını agent adına çevirir.
+    """
+    candidate = candidate_agent(state, router) if SPECULATIVE_ROUTING else None
+    if candidate is None:
+        route = await supervisor.ainvoke(state, config)
+        return {"next": route.next, "speculative_hit": False}
+
+    usage = SpeculationUsage()
+    manager = AsyncCallbackManager.configure(inheritable_callbacks=config.get("callbacks"))
+    manager.add_handler(usage, inherit=True)
+
+    async def timed_agent():
+        agent_started = time.perf_counter()
+        update = await run_agent(state, candidate, patch_config(config, callbacks=manager))
+        return update, time.perf_counter() - agent_started
+
+    speculative = asyncio.create_task(timed_agent())
+    started = time.perf_counter()
+    try:
+        route = await supervisor.ainvoke(state, config)
+    except BaseException:
+        speculative.cancel()
+        raise
+    supervisor_seconds = time.perf_counter() - started
+
+    if resolve(route.next) != candidate:
+        speculative.cancel()
+        await asyncio.wait([speculative])  # İptalin tamamlanmasını bekle (sonucu/hatası önemsiz)
+        _record("miss", candidate, wasted=usage.total)
+        return {"next": route.next, "speculative_hit": False}
+
+    try:
+        update, agent_seconds = await speculative
+    except Exception as e:
+        # Spekülatif agent hata verdiyse agent node'u normal yoldan yeniden dener
+        print(f"⚠️ Spekülatif {candidate} hatası: {e}")
+        _record("error", candidate, wasted=usage.total)
+        return {"next": route.next, "speculative_hit": False}
+
+    # Sıralı çalışmaya göre kazanç: iki gecikmeden kısa olanı kadar
+    _record("hit", candidate, saved=min(supervisor_seconds, agent_seconds))
+    return {**update, "next": route.next, "speculative_hit": True}
+
+
+def speculation_stats() -> Dict[str, float]:
+    with _lock:
+        decided = stats["hits"] + stats["misses"]
+        return {
+            "enabled": SPECULATIVE_ROUTING,
+            **stats,
+            "accuracy": stats["hits"] / decided if decided else 0.0,
+            "avg_wasted_tokens_per_miss": stats["wasted_tokens"] / stats["misses"] if stats["misses"] else 0.0,
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from data_store import run_blocking
+
+# Cümle sonu: noktalama + boşluk veya satır sonu ("4.500 TL" gibi sayılar bölünmez)
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…:])\s+|\n+")
+MARKDOWN_RE = re.compile(r"[*_`#>]+")
+
+# Aynı anda sentezlenecek en fazla cümle sayısı
+MAX_PARALLEL_TTS = 3
+
+# /audio/{id} bağlantılarının geçerlilik süresi ve arka planda üretilip bekletilen en fazla ses sayısı
+AUDIO_TICKET_TTL = 300
+MAX_AUDIO_TICKETS = 1000
+# Bilet → metin eşlemesi; aynı makinedeki tüm worker'lar aynı dosyayı paylaşır (WAL)
+AUDIO_TICKET_DB_PATH = os.getenv("AUDIO_TICKET_DB_PATH", "audio_tickets.sqlite")
+
+
+def clean_for_speech(text: str) -> str:
+    """Markdown işaretlerini seslendirilmemeleri için temizler."""
+    return MARKDOWN_RE.sub("", text).strip(" -\t")
+
+
+class SentenceChunker:
+    """
+    LLM'den gelen token akışını seslendirilebilir cümlelere böler.
+    `min_length` karakterden kısa parçalar bir sonraki cümleyle birleştirilir.
+    """
+
+    def __init__(self, min_length: int = 12):
+        self.min_length = min_length
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences = []
+        while True:
+            match = SENTENCE_END_RE.search(self._buffer)
+            if not match:
+                break
+            sentence = clean_for_speech(self._buffer[:match.start()])
+            self._buffer = self._buffer[match.end():]
+            if not sentence:
+                continue
+            self._pending = f"{self._pending} {sentence}".strip()
+            if len(self._pending) >= self.min_length:
+                sentences.append(self._pending)
+                self._pending = ""
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        rest = f"{self._pending} {clean_for_speech(self._buffer)}".strip()
+        self._buffer = self._pending = ""
+        return rest or None
+
+
+async def synthesize_in_order(
+    sentences: AsyncIterator[str],
+    synthesize: Callable[[str], AsyncIterator[bytes]],
+    max_parallel: int = MAX_PARALLEL_TTS,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Cümleleri geldikleri anda paralel olarak seslendirir, ses parçalarını sırayla döndürür.
+    Her cümlenin sonunda (index, None) işareti üretilir.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+    ordered: asyncio.Queue = asyncio.Queue()
+    tasks = []
+
+    async def pump(sentence: str, out: asyncio.Queue) -> None:
+        try:
+            async with semaphore:
+                async for chunk in synthesize(sentence):
+                    await out.put(chunk)
+        finally:
+            await out.put(None)
+
+    async def schedule() -> None:
+        try:
+            async for sentence in sentences:
+                out: asyncio.Queue = asyncio.Queue()
+                tasks.append(asyncio.create_task(pump(sentence, out)))
+                await ordered.put(out)
+        finally:
+            await ordered.put(None)
+
+    scheduler = asyncio.create_task(schedule())
+    try:
+        index = 0
+        while (out := await ordered.get()) is not None:
+            while (chunk := await out.get()) is not None:
+                yield index, chunk
+            yield index, None
+            index += 1
+        await scheduler  # Cümle kaynağındaki hataları yukarı taşı
+    finally:
+        scheduler.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+class AudioTicketStore:
+    """
+    Seslendirilecek metinler için kısa ömürlü /audio/{id} biletleri.
+    /chat cevabı metni hemen döndürür; ses ya arka planda paralel üretilir (`audio` görevi)
+    ya da istemci /audio/{id} adresini açtığında akıtılır.
+
+    Bilet ID'si tahmin edilemez ve içerik taşımaz; cevap metni (ad, hesap no, bakiye...) URL'ye ve
+    erişim loglarına girmez, worker'ların paylaştığı SQLite dosyasında süresi dolana kadar tutulur.
+    Böylece istek hangi worker'a düşerse düşsün seslendirilebilir. Arka planda üretilen ses yalnızca
+    bileti veren worker'da bekletilir; diğer worker'lar TTS önbelleğinden ya da yeniden sentezler.
+    SQLite işleri olay döngüsünü bloklamasın diye paylaşılan thread havuzunda çalışır.
+    """
+
+    def __init__(self, path: str = AUDIO_TICKET_DB_PATH, ttl: float = AUDIO_TICKET_TTL,
+                 max_tickets: int = MAX_AUDIO_TICKETS):
+        self.path = path
+        self.ttl = ttl
+        self.max_tickets = max_tickets
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._prefetched: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS audio_tickets "
+                "(ticket_id TEXT PRIMARY KEY, text TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS audio_tickets_expiry ON audio_tickets (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    def _store(self, ticket_id: str, text: str, expires_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM audio_tickets WHERE expires_at < ?", (time.time(),))
+            conn.execute("INSERT INTO audio_tickets VALUES (?, ?, ?)", (ticket_id, text, expires_at))
+
+    def _load(self, ticket_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT text FROM audio_tickets WHERE ticket_id = ? AND expires_at >= ?", (ticket_id, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    async def register(self, text: str, audio: Optional[asyncio.Task] = None) -> str:
+        self._expire()
+        ticket_id = secrets.token_urlsafe(16)
+        expires_at = time.time() + self.ttl
+        await run_blocking(self._store, ticket_id, text, expires_at)
+        if audio is not None:
+            self._prefetched[ticket_id] = (expires_at, audio)
+            while len(self._prefetched) > self.max_tickets:
+                self._discard(self._prefetched.popitem(last=False)[1][1])
+        return ticket_id
+
+    async def get(self, ticket_id: str) -> Optional[dict]:
+        self._expire()
+        text = await run_blocking(self._load, ticket_id)
+        if text is None:
+            return None
+        prefetched = self._prefetched.get(ticket_id)
+        return {"text": text, "audio": prefetched[1] if prefetched else None}
+
+    def __len__(self) -> int:
+        return len(self._prefetched)
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._prefetched:
+            expires_at, audio = next(iter(self._prefetched.values()))
+            if expires_at >= now:
+                break
+            self._prefetched.popitem(last=False)
+            self._discard(audio)
+
+    @staticmethod
+    def _discard(audio: asyncio.Task) -> None:
+        if not audio.done():
+            audio.cancel()  # Kimsenin dinlemeyeceği ses için TTS ödemesi yapılmasın
@@ -0,0 +1,146 @@
+"""
+Akan STT: kullanıcı konuşurken gelen PCM çerçeveleri sessizlik sınırlarında bölümlere ayrılır ve
+tamamlanan her bölüm beklemeden, diğerleriyle eşzamanlı olarak Whisper'a gönderilir. "stop" geldiğinde
+yalnızca son bölüm yazıya dökülmeyi bekler; sorgu, bölüm transkriptlerinin sırayla birleştirilmesidir.
+
+İstemci bu modu {"type": "start", "format": "pcm16", "sample_rate": 16000} ile açar; ardından gelen binary
+çerçeveler little-endian 16-bit mono PCM'dir (bkz. ws_session.VoiceSession).
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from audio_preprocess import MIN_SPEECH_MS, NO_SPEECH_MESSAGE, VAD_FRAME_MS, VAD_MARGIN_DB, VAD_PADDING_MS, \
+    VAD_THRESHOLD_DB, encode_wav, to_mono_16k
+from data_store import run_blocking
+from metrics import METRICS_ENABLED, registry
+
+# ✅ Akan STT ayarları
+STREAM_SEGMENT_SILENCE_MS = int(os.getenv("STREAM_SEGMENT_SILENCE_MS", "500"))  # Bölüm sınırı sayılan sessizlik
+# Whisper çok kısa seslerde zayıf: bu kadar konuşma birikmeden bölüm kesilmez
+STREAM_SEGMENT_MIN_MS = int(os.getenv("STREAM_SEGMENT_MIN_MS", "1500"))
+STREAM_SEGMENT_MAX_SECONDS = float(os.getenv("STREAM_SEGMENT_MAX_SECONDS", "20"))  # Sessizlik olmasa da kesilir
+STREAM_MIN_SAMPLE_RATE, STREAM_MAX_SAMPLE_RATE = 8000, 48000
+# Gürültü tabanı takibi: başta eşik mutlak tabandadır; yeni minimumlara hemen iner,
+# yukarı çerçeve başına bu kadar yavaşça çıkar (gürültülü ortamlara birkaç saniyede uyum sağlar)
+NOISE_FLOOR_RISE_DB = 0.05
+
+PartialCallback = Callable[[int, str, str], Awaitable[None]]
+
+
+def _encode_segment(pcm: bytes, sample_rate: int) -> bytes:
+    import numpy as np
+
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768
+    return encode_wav(*to_mono_16k(samples, sample_rate))
+
+
+def _frame_energies(pcm: bytes, frame_samples: int) -> List[float]:
+    import numpy as np
+
+    frames = np.frombuffer(pcm, dtype="<i2").astype(np.float32).reshape(-1, frame_samples) / 32768
+    return (10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)).tolist()
+
+
+class StreamingTranscriber:
+    """
+    Bir konuşma turunun akan STT durumu. `feed` ses geldikçe çağrılır ve bölüm kesildiğinde
+    yazıya dökmeyi arka planda başlatır; `finish` son bölümü kesip birleştirilmiş sorguyu döndürür.
+    `transcribe(wav_bytes) -> str` hata durumunda "⚠️" ile başlayan bir metin döndürür (bkz. tools.transcribe_audio).
+    """
+
+    def __init__(self, sample_rate: int, transcribe: Callable[[bytes], Awaitable[str]],
+                 on_partial: Optional[PartialCallback] = None):
+        if not STREAM_MIN_SAMPLE_RATE <= sample_rate <= STREAM_MAX_SAMPLE_RATE:
+            raise ValueError(f"Desteklenmeyen örnekleme hızı: {sample_rate}")
+        self.sample_rate = sample_rate
+        self._transcribe = transcribe
+        self._on_partial = on_partial
+        self._frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self._frame_bytes = self._frame_samples * 2
+        self._padding_bytes = sample_rate * VAD_PADDING_MS // 1000 * 2
+        self._pending = bytearray()  # Henüz tam bir VAD çerçevesi oluşturmayan byte'lar
+        self._segment = bytearray()
+        self._speech_ms = 0
+        self._silence_ms = 0
+        # Konuşma ilk çerçeveden başlasa bile kaçırılmasın diye taban, eşik mutlak tabanda olacak şekilde başlar
+        self._noise_db = VAD_THRESHOLD_DB - VAD_MARGIN_DB
+        self._tasks: List[asyncio.Task] = []
+        self._texts: Dict[int, str] = {}
+        self._error: Optional[str] = None
+        self.bytes_received = 0
+
+    def _is_speech(self, energy: float) -> bool:
+        if energy < self._noise_db:
+            self._noise_db = energy
+        else:
+            self._noise_db += NOISE_FLOOR_RISE_DB
+        return energy > max(VAD_THRESHOLD_DB, self._noise_db + VAD_MARGIN_DB)
+
+    def feed(self, data: bytes) -> None:
+        self.bytes_received += len(data)
+        self._pending.extend(data)
+        usable = len(self._pending) - len(self._pending) % self._frame_bytes
+        if not usable:
+            return
+        pcm = bytes(self._pending[:usable])
+        del self._pending[:usable]
+        max_segment_bytes = int(STREAM_SEGMENT_MAX_SECONDS * self.sample_rate) * 2
+        for index, energy in enumerate(_frame_energies(pcm, self._frame_samples)):
+            self._segment.extend(pcm[index * self._frame_bytes:(index + 1) * self._frame_bytes])
+            if self._is_speech(energy):
+                self._speech_ms += VAD_FRAME_MS
+                self._silence_ms = 0
+            else:
+                self._silence_ms += VAD_FRAME_MS
+                if not self._speech_ms and len(self._segment) > self._padding_bytes:
+                    # Konuşma başlamadan önceki sessizlik birikmesin; yalnızca dolgu kadarı tutulur
+                    del self._segment[:len(self._segment) - self._padding_bytes]
+            if self._speech_ms >= STREAM_SEGMENT_MIN_MS and self._silence_ms >= STREAM_SEGMENT_SILENCE_MS:
+                self._cut("silence")
+            elif len(self._segment) >= max_segment_bytes:
+                self._cut("max_length")
+
+    def _cut(self, reason: str) -> None:
+        pcm, speech_ms = bytes(self._segment), self._speech_ms
+        self._segment, self._speech_ms, self._silence_ms = bytearray(), 0, 0
+        if speech_ms < MIN_SPEECH_MS:
+            return  # Yalnızca sessizlik/gürültü: Whisper çağrılmaz
+        if METRICS_ENABLED:
+            registry.inc("stt_stream_segments_total", reason=reason)
+        index = len(self._tasks)
+        self._tasks.append(asyncio.create_task(self._transcribe_segment(index, pcm)))
+
+    async def _transcribe_segment(self, index: int, pcm: bytes) -> None:
+        wav = await run_blocking(_encode_segment, pcm, self.sample_rate)
+        text = (await self._transcribe(wav)).strip()
+        if text.startswith("⚠️"):
+            if text != NO_SPEECH_MESSAGE and self._error is None:
+                self._error = text  # Eksik bir sorguyla işlem yapılmasın
+            text = ""
+        self._texts[index] = text
+        if text and self._on_partial is not None:
+            await self._on_partial(index, text, self.transcript())
+
+    def transcript(self) -> str:
+        """Şu ana kadar yazıya dökülen bölümler, konuşma sırasıyla."""
+        return " ".join(self._texts[index] for index in sorted(self._texts) if self._texts[index])
+
+    async def finish(self) -> str:
+        """Kalan sesi son bölüm olarak gönderir, tüm bölümleri bekler ve birleştirilmiş sorguyu döndürür."""
+        # Yarım kalan örnek (tek sayıda byte) atılır; 16-bit çözümleme tam örnek ister
+        self._segment.extend(self._pending[:len(self._pending) - len(self._pending) % 2])
+        self._pending.clear()
+        self._cut("final")
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.cancel()
+            raise
+        if self._error:
+            return self._error
+        return self.transcript() or NO_SPEECH_MESSAGE
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modüller OpenAI istemcisini import sırasında oluşturur; testler ağa çıkmaz
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+import asyncio
+
+from streaming import AudioTicketStore
+
+ANSWER = "Sayın Hüseyin Bey, 8694788651 numaralı hesabınızın bakiyesi 10.000 TL"
+
+
+def test_ticket_is_opaque_and_shared_between_workers(tmp_path):
+    path = str(tmp_path / "tickets.sqlite")
+
+    async def scenario():
+        ticket_id = await AudioTicketStore(path=path).register(ANSWER)
+        return ticket_id, await AudioTicketStore(path=path).get(ticket_id)
+
+    ticket_id, ticket = asyncio.run(scenario())
+    assert "8694788651" not in ticket_id and len(ticket_id) < 32
+    assert ticket == {"text": ANSWER, "audio": None}
+
+
+def test_unknown_and_expired_tickets(tmp_path):
+    path = str(tmp_path / "tickets.sqlite")
+
+    async def scenario():
+        expired = await AudioTicketStore(path=path, ttl=-1).register(ANSWER)
+        store = AudioTicketStore(path=path)
+        return await store.get(expired), await store.get("yok")
+
+    assert asyncio.run(scenario()) == (None, None)
+
+
+def test_prefetched_audio_stays_with_issuing_worker(tmp_path):
+    path = str(tmp_path / "tickets.sqlite")
+
+    async def scenario():
+        issuer, other = AudioTicketStore(path=path), AudioTicketStore(path=path)
+        audio = asyncio.create_task(asyncio.sleep(0, b"mp3"))
+        ticket_id = await issuer.register(ANSWER, audio)
+        local, remote = await issuer.get(ticket_id), await other.get(ticket_id)
+        return audio, local, remote
+
+    audio, local, remote = asyncio.run(scenario())
+    assert local["audio"] is audio
+    assert remote == {"text": ANSWER, "audio": None}
+
+
+def test_oldest_prefetch_is_cancelled_over_limit(tmp_path):
+    async def scenario():
+        store = AudioTicketStore(path=str(tmp_path / "tickets.sqlite"), max_tickets=1)
+        first = asyncio.create_task(asyncio.sleep(10))
+        await store.register("bir", first)
+        await store.register("iki", asyncio.create_task(asyncio.sleep(0)))
+        await asyncio.sleep(0)
+        return first, len(store)
+
+    first, size = asyncio.run(scenario())
+    assert first.cancelled() and size == 1
@@ -0,0 +1,61 @@
+import asyncio
+
+from langgraph.graph import START, MessagesState, StateGraph
+
+from checkpointer import SQLiteCheckpointSaver
+
+
+def _worker(path):
+    """Aynı SQLite dosyasını paylaşan bir uvicorn worker'ının checkpointer'ı ve graph'ı."""
+    saver = SQLiteCheckpointSaver(path=path)
+    graph = StateGraph(MessagesState)
+    graph.add_node("echo", lambda state: {"messages": [("ai", f"cevap {len(state['messages'])}")]})
+    graph.add_edge(START, "echo")
+    return saver, graph.compile(checkpointer=saver)
+
+
+def _turn(app, text, thread_id="T1"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return [message.content for message in app.invoke({"messages": [("user", text)]}, config)["messages"]]
+
+
+def test_turn_is_visible_to_other_worker_immediately(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    _, worker1 = _worker(path)
+    _, worker2 = _worker(path)
+
+    _turn(worker1, "birinci")
+    assert _turn(worker2, "ikinci") == ["birinci", "cevap 1", "ikinci", "cevap 3"]
+
+
+def test_workers_do_not_overwrite_each_others_turns(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    _, worker1 = _worker(path)
+    _, worker2 = _worker(path)
+
+    _turn(worker1, "birinci")
+    _turn(worker2, "ikinci")
+    assert _turn(worker1, "üçüncü")[-2:] == ["üçüncü", "cevap 5"]
+
+    fresh, _ = _worker(path)
+    state = fresh.get_tuple({"configurable": {"thread_id": "T1"}}).checkpoint["channel_values"]["messages"]
+    assert [message.content for message in state] == [
+        "birinci", "cevap 1", "ikinci", "cevap 3", "üçüncü", "cevap 5",
+    ]
+
+
+def test_async_api_round_trips(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    _, worker1 = _worker(path)
+    reader, _ = _worker(path)
+    config = {"configurable": {"thread_id": "T2"}}
+
+    async def scenario():
+        await worker1.ainvoke({"messages": [("user", "merhaba")]}, config)
+        checkpoint = await reader.aget_tuple(config)
+        history = [item async for item in reader.alist(config, limit=2)]
+        return checkpoint, history
+
+    checkpoint, history = asyncio.run(scenario())
+    assert len(checkpoint.checkpoint["channel_values"]["messages"]) == 2
+    assert len(history) == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from direct_answers import direct_answer
+from prompts import customer_message
+
+CUSTOMER_ID = "CUST0001"
+
+# (agent, sorgu, beklenen cevabın içermesi gereken ifade; None → agent'a bırakılmalı)
+CASES = [
+    ("Account_Agent", "Bakiyemi göster", "hesaplarınız ve güncel bakiyeleri"),
+    ("Account_Agent", "Bakiyemi öğrenmek istiyorum", "hesaplarınız ve güncel bakiyeleri"),
+    ("Account_Agent", "Vadeli hesabım var mı?", "Vadeli Hesap"),
+    ("Credit_Card_Agent", "Kart limitim nedir?", "toplam limiti"),
+    ("Credit_Card_Agent", "Ekstre borcumu göster", "ekstre"),
+    ("Credit_Card_Agent", "Ekstremin son ödeme tarihi ne zaman?", "son ödeme tarihi"),
+    # İşlem talepleri: okuma cevabı verilmemeli
+    ("Account_Agent", "Yeni hesap açmak istiyorum", None),
+    ("Account_Agent", "Hesabımdan para transferi yapmak istiyorum", None),
+    ("Account_Agent", "Hesabımı kapatmak istiyorum", None),
+    ("Account_Agent", "Hesabıma para yatırmak istiyorum", None),
+    ("Account_Agent", "Başka hesaba para gönder", None),
+    ("Credit_Card_Agent", "Kart limitimi artırmak istiyorum", None),
+    ("Credit_Card_Agent", "Kart limitimi yükselt", None),
+    ("Credit_Card_Agent", "Kart limitimi düşür", None),
+    ("Credit_Card_Agent", "İnternet alışverişimi kapat", None),
+    ("Credit_Card_Agent", "İnternet alışverişimi aç", None),
+    ("Credit_Card_Agent", "QR ödeme ayarımı değiştir", None),
+    ("Credit_Card_Agent", "Ekstre borcumu ödemek istiyorum", None),
+    ("Credit_Card_Agent", "Ekstre borcumu öde", None),
+    ("Credit_Card_Agent", "Kart limitimi iptal et", None),
+    # Akıl yürütme gerektiren sorgular
+    ("Account_Agent", "En yüksek bakiyeli hesabım hangisi?", None),
+    ("Credit_Card_Agent", "5000 TL üzeri ekstrem var mı?", None),
+]
+
+
+@pytest.mark.parametrize("agent, query, expected", CASES)
+def test_direct_answer(agent, query, expected):
+    answer = direct_answer(agent, customer_message(CUSTOMER_ID, query))
+    if expected is None:
+        assert answer is None
+    else:
+        assert answer is not None and expected in answer
+
+
+def test_requires_customer_id():
+    assert direct_answer("Account_Agent", "Bakiyemi göster") is None
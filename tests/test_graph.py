@@ -0,0 +1,12 @@
+import graph
+from langgraph.checkpoint.memory import MemorySaver
+
+
+def test_agents_are_built_on_first_build_app_not_at_import():
+    graph.build_workflow.cache_clear()
+    assert graph.build_workflow.cache_info().currsize == 0
+
+    app = graph.build_app(MemorySaver())
+    assert {"Intent_Router", "Supervisor_Agent", *graph.MEMBERS} <= set(app.get_graph().nodes)
+    graph.build_app(MemorySaver())
+    assert graph.build_workflow.cache_info().hits == 1  # Aynı süreçte ikinci graph tanımı yeniden kurmaz
@@ -0,0 +1,61 @@
+import pytest
+
+from intent_router import IntentRouter, is_action_request
+from prompts import PROMPTS
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter.from_supervisor_prompt(PROMPTS["Supervisor_Agent"])
+
+
+# Birden fazla ayırt edici kelimesi olan, tek agent'a ait sorgular yerelde yönlendirilir
+@pytest.mark.parametrize("query, agent", [
+    ("Kart limitim nedir?", "Credit_Card_Agent"),
+    ("Kredi kartı borcum ne kadar", "Credit_Card_Agent"),
+    ("Ekstre borcumu göster", "Credit_Card_Agent"),
+    ("İnternet alışverişim açık mı?", "Credit_Card_Agent"),
+    ("Hesap bakiyem ne kadar", "Account_Agent"),
+    ("Vadeli hesabım var mı?", "Account_Agent"),
+    ("Altın hesabım ne kadar?", "Account_Agent"),
+    ("Canlı destek istiyorum", "Professional_Response_Agent"),
+])
+def test_confident_queries_are_routed(router, query, agent):
+    assert router.predict(query) == agent
+
+
+# Desteklenmeyen, belirsiz veya işlem talepleri Supervisor_Agent'a bırakılır
+@pytest.mark.parametrize("query", [
+    "Kartımı kaybettim",
+    "Kredi kartımı kaybettim",
+    "Kart şifremi unuttum",
+    "Son işlemlerimi göster",
+    "Kredi notum kaç",
+    "Altın fiyatı ne kadar",
+    "Hesap hareketlerimi göster",
+    "Son ödeme tarihi ne zaman",
+    "Hesap detaylarını görüntüle",
+    "IBAN numaram nedir",
+    "Kart limitimi artırmak istiyorum",
+    "Hesabımdan para transferi yapmak istiyorum",
+])
+def test_unsupported_or_ambiguous_queries_fall_through(router, query):
+    assert router.predict(query) is None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Yeni hesap açmak istiyorum", True),
+    ("Ekstre borcumu öde", True),
+    ("Bakiyemi öğrenmek istiyorum", False),
+    ("Çıkış yapmak istiyorum", False),
+])
+def test_action_requests(query, expected):
+    assert is_action_request(query) is expected
+
+
+def test_classify_records_fallbacks(router):
+    router.classify("Kartımı kaybettim")
+    router.classify("Kart limitim nedir?")
+    stats = router.stats()
+    assert stats["hits_by_agent"].get("Credit_Card_Agent", 0) >= 1
+    assert stats["fallbacks"] >= 1
@@ -0,0 +1,45 @@
+import pytest
+
+from response_cache import ResponseCache
+
+CUSTOMER_ID = "CUST0001"
+AGENT = "Credit_Card_Agent"
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(ttl=60, max_entries=100)
+
+
+# Aynı niyetin farklı yazışları aynı anahtarı paylaşır
+@pytest.mark.parametrize("first, second", [
+    ("Kart limitim nedir?", "kart limitim ne"),
+    ("Ekstre borcumu göster", "EKSTRE BORCUM"),
+    ("Kartımın limiti", "limiti kartımın"),
+])
+def test_same_intent_shares_key(cache, first, second):
+    assert cache.key(CUSTOMER_ID, first, AGENT) == cache.key(CUSTOMER_ID, second, AGENT)
+
+
+# Tutar ve numara farkı olan sorgular asla aynı cevabı almamalı
+@pytest.mark.parametrize("first, second", [
+    ("5000 TL üzeri ekstrem var mı", "50000 TL üzeri ekstrem var mı"),
+    ("1000 TL altı harcamalarım", "10000 TL altı harcamalarım"),
+    ("8694788651 numaralı hesabımın bakiyesi", "8694712345 numaralı hesabımın bakiyesi"),
+    ("4543 6012 3456 7890 kartımın limiti", "4543 6012 9999 0000 kartımın limiti"),
+    ("Son 3 ekstrem", "Son 30 ekstrem"),
+])
+def test_numbers_do_not_collide(cache, first, second):
+    assert cache.key(CUSTOMER_ID, first, AGENT) != cache.key(CUSTOMER_ID, second, AGENT)
+
+
+def test_cached_answer_not_served_for_other_amount(cache):
+    cache.put(CUSTOMER_ID, "5000 TL üzeri ekstrem var mı", AGENT, "Evet, 5000 TL üzeri ekstreniz var.")
+    assert cache.get(CUSTOMER_ID, "50000 TL üzeri ekstrem var mı", AGENT) is None
+    assert cache.get(CUSTOMER_ID, "5000 TL üzeri ekstrem var mı?", AGENT) == "Evet, 5000 TL üzeri ekstreniz var."
+
+
+def test_uncached_agents_and_errors_are_skipped(cache):
+    assert cache.key(CUSTOMER_ID, "Görüşürüz", "Professional_Response_Agent") is None
+    cache.put(CUSTOMER_ID, "Kart limitim nedir?", AGENT, "⚠️ Bot cevabı alınamadı.")
+    assert cache.get(CUSTOMER_ID, "Kart limitim nedir?", AGENT) is None
@@ -0,0 +1,46 @@
+import asyncio
+
+import numpy as np
+
+from streaming_stt import StreamingTranscriber
+
+RATE = 16000
+
+
+def _tone(seconds: float) -> bytes:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * 12000).astype("<i2").tobytes()
+
+
+def _transcriber(received):
+    async def transcribe(wav: bytes) -> str:
+        received.append(wav)
+        return "bakiyemi göster"
+
+    return StreamingTranscriber(RATE, transcribe)
+
+
+def test_finish_tolerates_odd_trailing_byte():
+    received = []
+
+    async def scenario():
+        transcriber = _transcriber(received)
+        transcriber.feed(_tone(1.0) + b"\x01")  # Çerçeveye tamamlanmayan kuyruk + yarım örnek
+        return await transcriber.finish()
+
+    assert asyncio.run(scenario()) == "bakiyemi göster"
+    assert len(received) == 1 and received[0][:4] == b"RIFF"
+
+
+def test_frames_split_across_feeds_are_reassembled():
+    received = []
+
+    async def scenario():
+        transcriber = _transcriber(received)
+        audio = _tone(1.0)
+        for start in range(0, len(audio), 333):  # Tek sayılı parça boyu: örnekler parçalar arasında bölünür
+            transcriber.feed(audio[start:start + 333])
+        return await transcriber.finish(), transcriber.bytes_received
+
+    text, received_bytes = asyncio.run(scenario())
+    assert text == "bakiyemi göster" and received_bytes == RATE * 2
@@ -1,72 +1,83 @@
-from langchain_core.tools import tool
-import json
-from typing import List
-from openai import AsyncOpenAI
+from langchain_core.tools import StructuredTool
+from typing import AsyncIterator, BinaryIO, List, Optional, Union
 import base64
-import openai
-
-client = AsyncOpenAI()
-
-CUSTOMER_DATA_FILE = "custom_banking_data.json"
+import functools
+import os
+import tempfile
+import time
+from data_store import get_store
+from metrics import METRICS_ENABLED, observe_duration, registry, timer
+from audio_preprocess import NO_SPEECH, NO_SPEECH_MESSAGE, prepare_audio
+from openai_clients import get_async_client
+from tts_cache import tts_cache
+
+client = get_async_client()  # Paylaşılan bağlantı havuzu ve istek sınırlayıcı
 
 def load_customer_data():
-    """Müşteri bilgilerini JSON dosyasından yükler."""
-    with open(CUSTOMER_DATA_FILE, "r", encoding="utf-8") as file:
-        data = json.load(file)
-        return data  # Veriyi direkt olarak döndürüyoruz çünkü anahtarlar müşteri ID'leri
+    """Müşteri bilgilerini paylaşılan veri deposundan döndürür (dosya yalnızca değiştiğinde okunur)."""
+    return get_store().customers  # Anahtarlar müşteri ID'leri
 
 def is_valid_customer(customer_id: str) -> bool:
     """Müşteri ID'nin geçerli olup olmadığını kontrol eder."""
-    data = load_customer_data()
-    return customer_id in data  # Artık direkt ID'yi kontrol edebiliriz
+    return get_store().has_customer(customer_id)
 
 
-@tool
-def fetch_cards(customer_id: str) -> List[str]:
-    """Fetches the customer's unique credit and debit card numbers from transaction history."""
-    data = load_customer_data()
+def banking_tool(func) -> StructuredTool:
+    """
+    Bankacılık tool'u: senkron gövde (direct_answers `.func` ile çağırır) + async-native sürüm.
+    Agent'lar async sürümü kullanır: veri dosyası değiştiyse önce thread havuzunda yeniden yüklenir,
+    ardından bellekteki indekslerden doğrudan event loop'ta okunur (thread'e geçiş maliyeti olmadan).
+    Bir adımdaki paralel tool çağrıları ToolNode tarafından aynı anda çalıştırılır.
+    """
+    @functools.wraps(func)
+    async def coroutine(*args, **kwargs):
+        await get_store().arefresh()
+        return func(*args, **kwargs)
 
-    # Find transactions belonging to the customer
-    customer_data = next((entry for entry in data if entry["customer_id"] == customer_id), None)
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
 
-    if not customer_data:
-        return "Müşteri bulunamadı veya işlem kaydı yok."
 
-    # Extract unique card numbers
-    unique_cards = list(set(transaction["card_number"] for transaction in customer_data["transactions"]))
+@banking_tool
+def fetch_cards(customer_id: str) -> List[dict]:
+    """Lists the customer's credit and debit cards (card number and card type)."""
+    customer = get_store().get_customer(customer_id)
+    if not customer:
+        return "Müşteri bulunamadı."
 
-    return unique_cards
+    return [
+        {"card_number": card["card_number"], "card_type": card.get("card_type", "N/A")}
+        for card in customer.get("cards", [])
+    ]
 
-@tool
+@banking_tool
 def fetch_credit_limits(customer_id: str) -> dict:
     """Fetches total and available credit limits for a customer."""
-    data = load_customer_data()
-    customer = data.get(customer_id)
-    if not customer:
+    totals = get_store().get_aggregates(customer_id)  # Veri yüklenirken bir kez hesaplanır
+    if totals is None:
         return "Müşteri bulunamadı."
 
-    total_limit = sum(card.get("credit_limit", 0) for card in customer.get("cards", []))
-    available_limit = sum(card.get("available_limit", 0) for card in customer.get("cards", []))
-
-    return {"total_limit": total_limit, "available_limit": available_limit}
+    return {"total_limit": totals["total_limit"], "available_limit": totals["available_limit"]}
 
-@tool
+@banking_tool
 def fetch_current_debt(customer_id: str) -> dict:
-    """Fetches total outstanding credit card debt for a customer."""
-    transactions = load_customer_data()
-    customer_transactions = [t for t in transactions if t["customer_id"] == customer_id]
-
-    if not customer_transactions:
-        return "Müşteri bulunamadı veya işlem kaydı yok."
+    """Fetches total outstanding credit card debt for a customer, with the per-card breakdown."""
+    customer = get_store().get_customer(customer_id)
+    totals = get_store().get_aggregates(customer_id)
+    if not customer or totals is None:
+        return "Müşteri bulunamadı."
 
-    total_debt = sum(t["amount"] for t in customer_transactions)
-    return {"total_debt": total_debt}
+    return {
+        "total_debt": totals["total_current_debt"],
+        "cards": [
+            {"card_number": card["card_number"], "current_debt": card["current_debt"]}
+            for card in customer.get("cards", []) if "current_debt" in card
+        ],
+    }
 
-@tool
+@banking_tool
 def fetch_statement_debt(customer_id: str) -> str:
     """Fetches the statement debt and due date for a customer's credit cards."""
-    data = load_customer_data()
-    customer = data.get(customer_id)
+    customer = get_store().get_customer(customer_id)
     if not customer:
         return "Müşteri bulunamadı."
 
@@ -80,83 +91,203 @@ def fetch_statement_debt(customer_id: str) -> str:
 
     return statement_info
 
-@tool
+@banking_tool
 def fetch_card_settings(customer_id: str, card_number: str) -> dict:
     """Fetches a card's settings (e.g., online shopping, QR payment)."""
-    data = load_customer_data()
-    customer = data.get(customer_id)
+    customer = get_store().get_customer(customer_id)
     if not customer:
         return "Müşteri bulunamadı."
 
-    for card in customer.get("cards", []):
-        if str(card["card_number"]) == str(card_number):
-            return {
-                "online_shopping": card.get("online_shopping_enabled", "Unknown"),
-                "qr_payment": card.get("qr_payment_enabled", "Unknown"),
-                "statement_preference": card.get("statement_preference", "Unknown"),
-            }
+    card = get_store().get_card(customer_id, card_number)
+    if not card:
+        return "Kart bulunamadı."
 
-    return "Kart bulunamadı."
+    return {
+        "online_shopping": card.get("online_shopping_enabled", "Unknown"),
+        "qr_payment": card.get("qr_payment_enabled", "Unknown"),
+        "statement_preference": card.get("statement_preference", "Unknown"),
+    }
 
-@tool
+@banking_tool
 def fetch_accounts(customer_id: str) -> list:
     """Fetches all bank accounts associated with a customer."""
-    data = load_customer_data()
-    customer = data.get(customer_id)
+    customer = get_store().get_customer(customer_id)
     if not customer:
         return "Müşteri bulunamadı."
 
     return customer.get("accounts", [])
 
-@tool
+@banking_tool
 def fetch_account_balance(customer_id: str, account_number: str) -> str:
     """Fetches the balance of a specific bank account."""
-    data = load_customer_data()
-    customer = data.get(customer_id)
+    customer = get_store().get_customer(customer_id)
     if not customer:
         return "Müşteri bulunamadı."
 
-    for account in customer.get("accounts", []):
-        if str(account["Account_Number"]) == str(account_number):
-            return f"Mevcut Bakiye: {account['Balance']} TL"
+    account = get_store().get_account(customer_id, account_number)
+    if not account:
+        return "Hesap bulunamadı."
+
+    return f"Mevcut Bakiye: {account['balance']} TL"
+
+
+@banking_tool
+def fetch_balance_summary(customer_id: str) -> dict:
+    """Fetches the customer's total balance and balance totals per account type."""
+    totals = get_store().get_aggregates(customer_id)
+    if totals is None:
+        return "Müşteri bulunamadı."
 
-    return "Hesap bulunamadı."
+    return {
+        "total_balance": totals["total_balance"],
+        "balances_by_type": totals["balances_by_type"],
+        "account_count": totals["account_count"],
+    }
 
 
-@tool
+@banking_tool
 def fetch_customer_info(customer_id: str) -> dict:
     """Fetches customer information including name, surname, and gender."""
-    data = load_customer_data()
-    return data.get(customer_id, {})
+    return get_store().get_customer(customer_id) or {}
+
+# ✅ Ses yüklemeleri için sınırlar (Whisper en fazla 25 MB kabul eder)
+MAX_UTTERANCE_BYTES = int(os.getenv("MAX_UTTERANCE_BYTES", str(10 * 1024 * 1024)))
+# 0 ise ses hiçbir zaman diske yazılmaz; >0 ise bu boyutu aşan sesler geçici dosyaya taşınır
+STT_SPILL_THRESHOLD = int(os.getenv("STT_SPILL_THRESHOLD", "0"))
+
+AudioInput = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
 
-# ✅ Türkçe Sesli Girdiyi Metne Çevir
-async def transcribe_audio(audio_file_path: str) -> str:
+def guess_audio_filename(data: bytes) -> str:
+    """Whisper'ın formatı doğru algılaması için içerikten dosya adı uzantısı tahmin eder."""
+    if data[:4] == b"RIFF":
+        return "speech.wav"
+    if data[:4] == b"OggS":
+        return "speech.ogg"
+    if data[:3] == b"ID3" or data[:2] == b"\xff\xfb":
+        return "speech.mp3"
+    if data[4:8] == b"ftyp":
+        return "speech.m4a"
+    return "speech.webm"  # MediaRecorder varsayılanı
+
+
+# ✅ Türkçe Sesli Girdiyi Metne Çevir (dosya yolu, bytes veya dosya benzeri nesne)
+async def transcribe_audio(audio: AudioInput, filename: Optional[str] = None) -> str:
     try:
-        with open(audio_file_path, "rb") as audio_file:
-            transcript = await client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="tr",
-                response_format="text"
-            )
-        return transcript.strip()
+        if isinstance(audio, str):
+            with open(audio, "rb") as audio_file:
+                return await _transcribe(audio_file)
+
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            data = memoryview(audio)
+            if len(data) > MAX_UTTERANCE_BYTES:
+                return "⚠️ Ses kaydı çok uzun."
+            # Sessizlik kırpılır, 16 kHz mono'ya indirilir; konuşma yoksa Whisper çağrılmaz
+            prepared = await prepare_audio(audio if isinstance(audio, bytes) else data.tobytes())
+            if prepared == NO_SPEECH:
+                return NO_SPEECH_MESSAGE
+            if prepared is not None:
+                audio, data, filename = prepared, memoryview(prepared), None
+            filename = filename or guess_audio_filename(bytes(data[:12]))
+            if STT_SPILL_THRESHOLD and len(data) > STT_SPILL_THRESHOLD:
+                # Büyük kayıtlar geçici dosyaya taşınır; dosya kapanınca otomatik silinir
+                with tempfile.SpooledTemporaryFile(max_size=STT_SPILL_THRESHOLD) as spool:
+                    spool.write(data)
+                    spool.seek(0)
+                    return await _transcribe((filename, spool))
+            return await _transcribe((filename, audio if isinstance(audio, bytes) else data.tobytes()))
+
+        return await _transcribe((filename or "speech.webm", audio))
     except Exception as e:
         print(f"⚠️ Ses tanıma hatası: {e}")
         return "⚠️ Ses çözümlenemedi."
 
 
-# ✅ Text-to-Speech - WAV Ses Dosyası Oluşturur
+async def _transcribe(file) -> str:
+    with timer("openai_request", endpoint="transcriptions"):
+        transcript = await client.audio.transcriptions.create(
+            model="whisper-1",
+            file=file,
+            language="tr",
+            response_format="text"
+        )
+    return transcript.strip()
+
+
+TTS_MODEL = "gpt-4o-mini-tts"
+TTS_VOICE = "nova"
+TTS_FORMAT = "mp3"
+
+
+async def synthesize_speech(text: str) -> bytes:
+    """Metni seslendirir; aynı cümle daha önce üretildiyse önbellekten döner."""
+    audio_bytes = await tts_cache.aget(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT)
+    if audio_bytes is None:
+        with timer("openai_request", endpoint="speech"):
+            response = await client.audio.speech.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text,
+                response_format=TTS_FORMAT
+            )
+            audio_bytes = await response.aread()
+        await tts_cache.aput(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT, audio_bytes)
+    return audio_bytes
+
+
+# ✅ Text-to-Speech - Ses dosyası oluşturur (base64)
 async def generate_speech_base64(text: str) -> str:
     try:
-        response = await client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="nova",
-            input=text
-        )
-        audio_bytes = await response.aread()
+        audio_bytes = await synthesize_speech(text)
         return base64.b64encode(audio_bytes).decode("utf-8")
     except Exception as e:
         print(f"🔊 Ses üretim hatası: {e}")
         return ""
 
 
+# ✅ Text-to-Speech - Sesi üretildikçe parça parça döndürür
+async def stream_speech(text: str, chunk_size: int = 4096) -> AsyncIterator[bytes]:
+    cached = await tts_cache.aget(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT)
+    if cached is not None:
+        for start in range(0, len(cached), chunk_size):
+            yield cached[start:start + chunk_size]
+        return
+
+    parts = []
+    # Yalnızca sağlayıcıyı bekleme süresi ölçülür; tüketicinin parçayı gönderdiği süre (yield) sayılmaz
+    upstream, resumed = 0.0, time.perf_counter()
+    try:
+        async with client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            response_format=TTS_FORMAT
+        ) as response:
+            async for chunk in response.iter_bytes(chunk_size):
+                upstream, resumed = upstream + time.perf_counter() - resumed, None
+                parts.append(chunk)
+                yield chunk
+                resumed = time.perf_counter()
+        upstream, resumed = upstream + time.perf_counter() - resumed, None
+        # Yalnızca eksiksiz tamamlanan sesler önbelleğe alınır
+        await tts_cache.aput(text, TTS_MODEL, TTS_VOICE, TTS_FORMAT, b"".join(parts))
+    except Exception as e:
+        if METRICS_ENABLED:
+            registry.inc("openai_request_errors_total", endpoint="speech_stream")
+        print(f"🔊 Ses akışı hatası: {e}")
+    finally:
+        if resumed is not None:
+            upstream += time.perf_counter() - resumed
+        observe_duration("openai_request", upstream, endpoint="speech_stream")
+
+
+async def prewarm_speech_cache(phrases: List[str]) -> int:
+    """Sabit cümleleri önceden seslendirip önbelleğe alır; hazır olan cümle sayısını döndürür."""
+    ready = 0
+    for phrase in phrases:
+        try:
+            await synthesize_speech(phrase)
+            ready += 1
+        except Exception as e:
+            print(f"🔊 Ses önbelleği ısıtılamadı: {e}")
+    return ready
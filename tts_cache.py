@@ -0,0 +1,226 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from data_store import run_blocking
+
+# ✅ TTS önbellek ayarları
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")  # Boş bırakılırsa disk katmanı kapanır
+TTS_CACHE_DISK_MAX_BYTES = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+# Sınır aşılınca disk bu orana kadar boşaltılır; böylece dizin her yazmada değil, arada bir taranır
+TTS_CACHE_DISK_LOW_WATER = float(os.getenv("TTS_CACHE_DISK_LOW_WATER", "0.8"))
+# Kişiye özel uzun cevaplar tekrar etmediği için yalnızca kısa metinler önbelleğe alınır
+TTS_CACHE_MAX_TEXT = int(os.getenv("TTS_CACHE_MAX_TEXT", "300"))
+
+# Prompt'ların botun sürekli söylettiği sabit cümleler
+DEFAULT_PREWARM_PHRASES = [
+    "Size başka nasıl yardımcı olabilirim?",
+    "Başka bir konuda yardımcı olabilir miyim?",
+    "Görüşmek üzere!",
+    "Üzgünüm, ancak şu anda yalnızca aşağıdaki işlemleri gerçekleştirebilirim:",
+    "Daha fazla yardım almak için sizi bir canlı müşteri temsilcisine yönlendirebilirim.",
+    "Canlı destek almak ister misiniz? (Evet/Hayır)",
+    "Size en kısa sürede bir müşteri temsilcisi yardımcı olacaktır. Lütfen bekleyiniz...",
+]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_MARKDOWN_RE = re.compile(r"[*_`#>]+")
+
+
+def normalize_text(text: str) -> str:
+    """Seslendirmeyi değiştirmeyen farkları (boşluk, markdown, unicode biçimi) yok sayar."""
+    text = unicodedata.normalize("NFC", text)
+    text = _MARKDOWN_RE.sub("", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def prewarm_phrases() -> list:
+    """TTS_PREWARM_FILE verilmişse satır satır cümleleri, yoksa varsayılan listeyi döndürür."""
+    path = os.getenv("TTS_PREWARM_FILE")
+    if not path:
+        return list(DEFAULT_PREWARM_PHRASES)
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+class TTSCache:
+    """
+    Normalize edilmiş metin + model + ses + format ile adreslenen iki katmanlı ses önbelleği.
+    Bellek katmanı toplam byte'a göre sınırlı LRU'dur; disk katmanı süreç yeniden başlasa da kalır.
+    Olay döngüsünden `aget`/`aput` kullanılır: disk okuma/yazma/temizleme thread havuzunda çalışır.
+    Disk boyutu tahmini tutulur; dizin yalnızca tahmin sınırı aştığında taranıp temizlenir.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = TTS_CACHE_MAX_BYTES,
+        directory: Optional[str] = TTS_CACHE_DIR,
+        disk_max_bytes: int = TTS_CACHE_DISK_MAX_BYTES,
+        max_text_length: int = TTS_CACHE_MAX_TEXT,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_length = max_text_length
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._trim_lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # Bu sürecin disk boyutu tahmini; ilk yazmada taranır
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.skipped = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, text: str, model: str, voice: str, fmt: str) -> Optional[str]:
+        normalized = normalize_text(text)
+        if not normalized or len(normalized) > self.max_text_length:
+            return None
+        return hashlib.sha256(f"{model}|{voice}|{fmt}|{normalized}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _lookup(self, text: str, model: str, voice: str, fmt: str):
+        """(anahtar, bellekteki ses) döndürür; anahtar None ise metin önbelleğe alınmaz."""
+        key = self.key(text, model, voice, fmt)
+        with self._lock:
+            if key is None:
+                self.skipped += 1
+                return None, None
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+            return key, audio
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read() or None
+        except FileNotFoundError:
+            return None
+
+    def _found_on_disk(self, key: str, audio: Optional[bytes]) -> Optional[bytes]:
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+        self._remember(key, audio)
+        return audio
+
+    def get(self, text: str, model: str, voice: str, fmt: str) -> Optional[bytes]:
+        key, audio = self._lookup(text, model, voice, fmt)
+        if key is None or audio is not None:
+            return audio
+        return self._found_on_disk(key, self._read_disk(key) if self.directory else None)
+
+    async def aget(self, text: str, model: str, voice: str, fmt: str) -> Optional[bytes]:
+        key, audio = self._lookup(text, model, voice, fmt)
+        if key is None or audio is not None:
+            return audio
+        return self._found_on_disk(key, await run_blocking(self._read_disk, key) if self.directory else None)
+
+    def put(self, text: str, model: str, voice: str, fmt: str, audio: bytes) -> None:
+        key = self.key(text, model, voice, fmt)
+        if key is None or not audio:
+            return
+        self._remember(key, audio)
+        if self.directory:
+            self._write_disk(key, audio)
+
+    async def aput(self, text: str, model: str, voice: str, fmt: str, audio: bytes) -> None:
+        key = self.key(text, model, voice, fmt)
+        if key is None or not audio:
+            return
+        self._remember(key, audio)
+        if self.directory:
+            await run_blocking(self._write_disk, key, audio)
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _write_disk(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(audio)
+            os.replace(temp_path, path)  # Birden fazla worker aynı dizini paylaşabilir
+            with self._lock:
+                if self._disk_bytes is not None:
+                    # Üzerine yazılan dosyalar da eklenir; fazla tahmin yalnızca taramayı erkene çeker
+                    self._disk_bytes += len(audio)
+                needs_trim = self._disk_bytes is None or self._disk_bytes > self.disk_max_bytes
+            if needs_trim:
+                self._trim_disk()
+        except OSError as e:
+            print(f"🔊 TTS önbelleği diske yazılamadı: {e}")
+
+    def _trim_disk(self) -> None:
+        """
+        Dizini tarar; sınır aşılmışsa en eski dosyaları silerek TTS_CACHE_DISK_LOW_WATER oranına iner.
+        Boyut tahmini gerçek değerle düzeltilir (diğer worker'ların yazdıkları da burada görülür).
+        """
+        if not self._trim_lock.acquire(blocking=False):
+            return  # Başka bir thread zaten temizliyor
+        try:
+            total = self._scan_and_trim()
+        finally:
+            self._trim_lock.release()
+        with self._lock:
+            self._disk_bytes = total
+
+    def _scan_and_trim(self) -> int:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".audio"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.disk_max_bytes:
+            return total
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes * TTS_CACHE_DISK_LOW_WATER:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+
+tts_cache = TTSCache()
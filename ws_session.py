@@ -0,0 +1,180 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+# Gönderim kuyruğu dolduğunda üreticiler bekletilir (backpressure)
+MAX_OUTBOX_FRAMES = 64
+
+
+class VoiceSession:
+    """
+    Tek bir WebSocket bağlantısı üzerinde çok turlu sesli oturum.
+
+    İstemci → sunucu çerçeveleri:
+      {"type": "start"}   yeni konuşma başlat (devam eden tur iptal edilir)
+      {"type": "start", "format": "pcm16", "sample_rate": 16000}
+                          akan mod: ses 16-bit mono PCM olarak gelir ve konuşma sürerken yazıya dökülür
+      <binary>            konuşmanın ses parçaları
+      {"type": "stop"}    konuşmayı bitir ve işle
+      {"type": "cancel"}  devam eden turu iptal et
+      {"type": "ping"}    bağlantı kontrolü → {"type": "pong"}
+    `start` gönderilmeden gelen tek binary çerçeve, eski istemciler için tam bir konuşma sayılır.
+
+    Handler'a tamponlanmış modda konuşmanın byte'ları, akan modda ise `stream_factory(session, sample_rate)`
+    ile oluşturulan nesne (bkz. streaming_stt.StreamingTranscriber) verilir.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        handler: Callable[["VoiceSession", Any], Awaitable[None]],
+        max_outbox: int = MAX_OUTBOX_FRAMES,
+        max_utterance_bytes: Optional[int] = None,
+        stream_factory: Optional[Callable[["VoiceSession", int], Any]] = None,
+    ):
+        self.websocket = websocket
+        self.handler = handler
+        self.max_utterance_bytes = max_utterance_bytes
+        self.stream_factory = stream_factory
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=max_outbox)
+        self._buffer: Optional[bytearray] = None
+        self._stream = None  # Akan moddaki konuşmanın STT durumu
+        self._discarding = False
+        self._turn: Optional[asyncio.Task] = None
+        self.turns = 0
+
+    # --- Gönderim (tek bir görev üzerinden sıralı) ---
+
+    async def send_json(self, data: dict) -> None:
+        await self._outbox.put(("json", data))
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self._outbox.put(("bytes", data))
+
+    async def _send_loop(self) -> None:
+        while True:
+            kind, payload = await self._outbox.get()
+            if kind == "json":
+                await self.websocket.send_json(payload)
+            else:
+                await self.websocket.send_bytes(payload)
+
+    # --- Alım ---
+
+    async def run(self) -> None:
+        sender = asyncio.create_task(self._send_loop())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await self._on_audio(message["bytes"])
+                elif message.get("text") is not None:
+                    await self._on_control(message["text"])
+        finally:
+            self._close_stream()
+            await self._cancel_turn()
+            sender.cancel()
+            if self.websocket.client_state == WebSocketState.CONNECTED:
+                await self.websocket.close()
+
+    async def _on_audio(self, data: bytes) -> None:
+        if self._discarding:
+            return
+        if self._stream is not None:
+            received = self._stream.bytes_received
+        else:
+            received = len(self._buffer) if self._buffer is not None else 0
+        if self.max_utterance_bytes and len(data) + received > self.max_utterance_bytes:
+            # Tek bir büyük yükleme belleği şişirmesin: konuşmanın kalanı "stop" gelene kadar atılır
+            self._discarding = self._buffer is not None or self._stream is not None
+            self._buffer = None
+            self._close_stream()
+            await self.send_json({"type": "error", "text": "⚠️ Ses kaydı çok uzun."})
+            return
+        if self._stream is not None:
+            self._stream.feed(data)
+        elif self._buffer is not None:
+            self._buffer.extend(data)
+        else:
+            self._start_turn(data)
+
+    async def _on_control(self, text: str) -> None:
+        try:
+            control = json.loads(text)
+        except json.JSONDecodeError:
+            await self.send_json({"type": "error", "text": "⚠️ Geçersiz kontrol mesajı."})
+            return
+
+        kind = control.get("type")
+        if kind == "ping":
+            await self.send_json({"type": "pong"})
+        elif kind == "start":
+            self._close_stream()
+            await self._cancel_turn()
+            self._buffer = bytearray()
+            self._discarding = False
+            if control.get("format") == "pcm16":
+                self._buffer = None
+                try:
+                    if self.stream_factory is None:
+                        raise ValueError("sunucuda kapalı")
+                    self._stream = self.stream_factory(self, int(control.get("sample_rate", 16000)))
+                except (TypeError, ValueError) as e:
+                    # Başlıksız PCM tek parça çözülemez: konuşmanın sesi "stop" gelene kadar atılır
+                    self._discarding = True
+                    await self.send_json({"type": "error", "text": f"⚠️ Akan ses kullanılamıyor: {e}"})
+        elif kind == "stop":
+            audio, self._buffer = self._buffer, None
+            stream, self._stream = self._stream, None
+            self._discarding = False
+            if stream is not None:
+                self._start_turn(stream)
+            elif audio:
+                self._start_turn(bytes(audio))
+        elif kind == "cancel":
+            self._buffer = None
+            self._close_stream()
+            if await self._cancel_turn():
+                await self.send_json({"type": "cancelled"})
+        else:
+            await self.send_json({"type": "error", "text": f"⚠️ Bilinmeyen mesaj türü: {kind}"})
+
+    # --- Tur yönetimi ---
+
+    def _close_stream(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.cancel()
+
+    def _start_turn(self, audio) -> None:
+        if self._turn and not self._turn.done():
+            self._turn.cancel()  # Kullanıcı yeni konuşmaya başladıysa eski cevap gereksiz
+        self.turns += 1
+        self._turn = asyncio.create_task(self._run_turn(audio))
+
+    async def _run_turn(self, audio) -> None:
+        try:
+            await self.handler(self, audio)
+        except asyncio.CancelledError:
+            if not isinstance(audio, bytes):
+                audio.cancel()  # Tur başlamadan iptal edildiyse akan STT bölümleri de durdurulur
+            raise
+        except Exception as e:
+            print(f"❌ WebSocket Error: {e}")
+            await self.send_json({"type": "done", "text": f"⚠️ Hata: {e}"})
+
+    async def _cancel_turn(self) -> bool:
+        turn, self._turn = self._turn, None
+        if not turn or turn.done():
+            return False
+        turn.cancel()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            pass
+        return True